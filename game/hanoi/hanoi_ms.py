@@ -1,14 +1,11 @@
-import pygame
 import sys
 import json
 import os
 import re
 import copy
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS, read_records
+from game.render import FRAMES, frame_key, background
 
 # Constants
 BACKGROUND_COLOR = (255, 255, 255)
@@ -29,43 +26,45 @@ TOWER_POSITIONS = {
     "C": (500, 100),
     "D": (700, 100)
 }
+COLUMN_WIDTH = 200  # Screen width around each tower that its disks can cover
 
 def create_game_state(level, current_state=None):
     if current_state:
         return current_state
 
-    position = level['position']
-    state = {rod: position[rod] for rod in 'ABCD'}
+    state = {rod: list(level.position[rod]) for rod in 'ABCD'}
     return state
 
-def draw_game_state(state, output_path):
-    screen = pygame.Surface((WIDTH, HEIGHT))
-    screen.fill(BACKGROUND_COLOR)
+# Towers and their labels, drawn once; each rod is redrawn on a copy of its column
+def tower_background():
+    return background('hanoi_towers', (WIDTH, HEIGHT), draw_towers)
 
-    font = pygame.font.Font(None, 72)
-    disk_font = pygame.font.Font(None, 36)
-    
+def draw_towers(screen):
+    screen.fill(BACKGROUND_COLOR)
     for rod, (x, _) in TOWER_POSITIONS.items():
-        pygame.draw.line(screen, TOWER_COLOR, (x, TOWER_BASE), (x, 100), TOWER_WIDTH)
+        screen.line(TOWER_COLOR, (x, TOWER_BASE), (x, 100), TOWER_WIDTH)
 
         # Add labels to towers
-        text = font.render(rod, True, TEXT_COLOR)
-        text_rect = text.get_rect(center=(x, HEIGHT - 50))
-        screen.blit(text, text_rect)
-        
-        for j, disk in enumerate(state[rod]):
-            disk_index = ord(disk) - ord('a')
-            disk_size = DISK_WIDTHS[disk_index]
-            disk_y = TOWER_BASE - (j + 1) * (DISK_HEIGHT + 5)
-            disk_color = DISK_COLORS[disk_index]
-            pygame.draw.rect(screen, disk_color, (x - disk_size // 2, disk_y, disk_size, DISK_HEIGHT))
-    
-            # Add letters on disks
-            disk_text = disk_font.render(disk, True, DISK_TEXT_COLOR)
-            disk_text_rect = disk_text.get_rect(center=(x, disk_y + DISK_HEIGHT // 2))
-            screen.blit(disk_text, disk_text_rect)
-
-    pygame.image.save(screen, output_path)
+        screen.text(rod, 72, TEXT_COLOR, center=(x, HEIGHT - 50))
+
+def draw_rod(screen, rod, disks):
+    x, _ = TOWER_POSITIONS[rod]
+    screen.copy_from(tower_background(), (x - COLUMN_WIDTH // 2, 0, COLUMN_WIDTH, HEIGHT))
+    for j, disk in enumerate(disks):
+        disk_index = ord(disk) - ord('a')
+        disk_size = DISK_WIDTHS[disk_index]
+        disk_y = TOWER_BASE - (j + 1) * (DISK_HEIGHT + 5)
+        disk_color = DISK_COLORS[disk_index]
+        screen.fill(disk_color, (x - disk_size // 2, disk_y, disk_size, DISK_HEIGHT))
+
+        # Add letters on disks
+        screen.text(disk, 36, DISK_TEXT_COLOR, center=(x, disk_y + DISK_HEIGHT // 2))
+
+def draw_game_state(state, output_path):
+    rods = {rod: tuple(state[rod]) for rod in TOWER_POSITIONS}
+    screen = FRAMES.draw(frame_key('hanoi', output_path), (WIDTH, HEIGHT), rods,
+                         lambda surface: surface.copy_from(tower_background()), draw_rod)
+    return screen
 
 def is_valid_move(state, source, destination):
     if not source in state or not destination in state:                    # if not A, B, C, D
@@ -102,16 +101,12 @@ def save_game_state_to_file(state, output_path, level, step):
         "step": step,
         "position": {rod: state[rod] for rod in 'ABCD'}
     }
-    
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    ARTIFACTS.append_jsonl(output_path, data)
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_state):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_state):
     results = []
 
     level_num = last_move['level']
-    level = json.loads(levels[0][level_num-1])
     if step == 1:
         # For the first step, get the correct level data from the loaded levels
         state = create_game_state(level)
@@ -140,7 +135,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"level_{level_num}.jsonl")
 
-    draw_game_state(state, image_path)
+    ARTIFACTS.draw(image_path, draw_game_state, copy.deepcopy(state), image_path)
     save_game_state_to_file(state, level_path, level_num, step)
 
     is_valid = validate_solution(state)
@@ -157,19 +152,17 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     return results, is_valid, state
 
 # Main function (placeholder for now)
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):
     if step > 1 and current_level is None:
         # Load the previous state from the process_levels file
         level_num = last_move['level']
         level_path = os.path.join(output_dir_base, "process_levels",  model_name, "hanoi", f"level_{level_num}.jsonl")
-        with open(level_path, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                if data['step'] == step - 1:
-                    current_level = {'position': data['position']}
-                    break
+        for data in read_records(level_path):
+            if data['step'] == step - 1:
+                current_level = {'position': data['position']}
+                break
 
-    results, is_valid, updated_state = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level)
+    results, is_valid, updated_state = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level)
 
     if not results:
         print("No valid results found.")
@@ -179,10 +172,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_state
 
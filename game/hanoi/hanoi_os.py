@@ -1,13 +1,9 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key, background
+from src.output_sink import OUTPUTS
 
 # Constants
 BACKGROUND_COLOR = (255, 255, 255)
@@ -28,10 +24,10 @@ TOWER_POSITIONS = {
     "C": (500, 100),
     "D": (700, 100)
 }
+COLUMN_WIDTH = 200  # Screen width around each tower that its disks can cover
 
 def create_game_state(level):
-    position = level['position']
-    state = {rod: position[rod] for rod in 'ABCD'}
+    state = {rod: list(level.position[rod]) for rod in 'ABCD'}
     return state
 
 def extract_move(input_string):
@@ -56,34 +52,36 @@ def is_valid_move(state, source, destination):
         return False
     return True
 
-def draw_game_state(state, output_path):
-    screen = pygame.Surface((WIDTH, HEIGHT))
-    screen.fill(BACKGROUND_COLOR)
+# Towers and their labels, drawn once; each rod is redrawn on a copy of its column
+def tower_background():
+    return background('hanoi_towers', (WIDTH, HEIGHT), draw_towers)
 
-    font = pygame.font.Font(None, 72)
-    disk_font = pygame.font.Font(None, 36)
-    
+def draw_towers(screen):
+    screen.fill(BACKGROUND_COLOR)
     for rod, (x, _) in TOWER_POSITIONS.items():
-        pygame.draw.line(screen, TOWER_COLOR, (x, TOWER_BASE), (x, 100), TOWER_WIDTH)
+        screen.line(TOWER_COLOR, (x, TOWER_BASE), (x, 100), TOWER_WIDTH)
 
         # Add labels to towers
-        text = font.render(rod, True, TEXT_COLOR)
-        text_rect = text.get_rect(center=(x, HEIGHT - 50))
-        screen.blit(text, text_rect)
-        
-        for j, disk in enumerate(state[rod]):
-            disk_index = ord(disk) - ord('a')
-            disk_size = DISK_WIDTHS[disk_index]
-            disk_y = TOWER_BASE - (j + 1) * (DISK_HEIGHT + 5)
-            disk_color = DISK_COLORS[disk_index]
-            pygame.draw.rect(screen, disk_color, (x - disk_size // 2, disk_y, disk_size, DISK_HEIGHT))
-    
-            # Add letters on disks
-            disk_text = disk_font.render(disk, True, DISK_TEXT_COLOR)
-            disk_text_rect = disk_text.get_rect(center=(x, disk_y + DISK_HEIGHT // 2))
-            screen.blit(disk_text, disk_text_rect)
+        screen.text(rod, 72, TEXT_COLOR, center=(x, HEIGHT - 50))
+
+def draw_rod(screen, rod, disks):
+    x, _ = TOWER_POSITIONS[rod]
+    screen.copy_from(tower_background(), (x - COLUMN_WIDTH // 2, 0, COLUMN_WIDTH, HEIGHT))
+    for j, disk in enumerate(disks):
+        disk_index = ord(disk) - ord('a')
+        disk_size = DISK_WIDTHS[disk_index]
+        disk_y = TOWER_BASE - (j + 1) * (DISK_HEIGHT + 5)
+        disk_color = DISK_COLORS[disk_index]
+        screen.fill(disk_color, (x - disk_size // 2, disk_y, disk_size, DISK_HEIGHT))
 
-    pygame.image.save(screen, output_path)
+        # Add letters on disks
+        screen.text(disk, 36, DISK_TEXT_COLOR, center=(x, disk_y + DISK_HEIGHT // 2))
+
+def draw_game_state(state, output_path):
+    rods = {rod: tuple(state[rod]) for rod in TOWER_POSITIONS}
+    screen = FRAMES.draw(frame_key('hanoi', output_path), (WIDTH, HEIGHT), rods,
+                         lambda surface: surface.copy_from(tower_background()), draw_rod)
+    screen.save(output_path)
 
 def save_game_state_to_file(state, output_path, level):
     data = {
@@ -92,16 +90,13 @@ def save_game_state_to_file(state, output_path, level):
         "position": {rod: state[rod] for rod in 'ABCD'}
     }
     
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    OUTPUTS.append(output_path, data)
 
 def validate_solution(state):
     return len(state['D']) == 5 and state['D'] == ['a', 'b', 'c', 'd', 'e']
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir):
+def evaluate_moves(level, last_move, model_name, output_base_dir):
     level_num = last_move['level']
-    level = json.loads(levels[0][level_num-1])
 
     print(f"Processing model {model_name}, hanoi, level {level_num}")
 
@@ -150,13 +145,12 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir):
 
     return result
 
-def main(move, output_dir_base, model_name, levels):
-    result = evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result = evaluate_moves(level, move, model_name, output_dir_base)
 
     eval_dir = os.path.join(output_dir_base, "eval",  model_name)
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "hanoi.jsonl")
 
-    with open(eval_path, 'a') as f:
-        json.dump(result, f)
-        f.write('\n')
\ No newline at end of file
+    OUTPUTS.append(eval_path, result)
+    return result
\ No newline at end of file
@@ -1,18 +1,18 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+import copy
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS
+from game.render import FRAMES, frame_key
 
 # Color definitions
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
+CELL_COLORS = {'+': BLACK, 'S': RED, 'X': GREEN}
 
 # Cell size for the maze
 CELL_SIZE = 30
@@ -80,27 +80,23 @@ def update_maze(maze, old_pos, new_pos, end_pos):
 
     return maze
 
-# Function to draw the maze and save it as an image
+def draw_cell(screen, position, cell):
+    x, y = position
+    screen.fill(CELL_COLORS.get(cell, WHITE), (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+
+# Function to draw the maze; ARTIFACTS encodes and saves the returned canvas
 def draw_maze(maze, output_path):
     height = len(maze)
     width = len(maze[0])
-    screen = pygame.Surface((width * CELL_SIZE, height * CELL_SIZE))
-    screen.fill(WHITE)  # Fill the background with white
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            if cell == '+':
-                pygame.draw.rect(screen, BLACK, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-            elif cell == 'S':
-                pygame.draw.rect(screen, RED, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-            elif cell == 'X':
-                pygame.draw.rect(screen, GREEN, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-    pygame.image.save(screen, output_path)
+    cells = {(x, y): cell for y, row in enumerate(maze) for x, cell in enumerate(row)}
+    # Only the cells that changed since the last step of this level are redrawn
+    screen = FRAMES.draw(frame_key('maze', output_path), (width * CELL_SIZE, height * CELL_SIZE), cells,
+                         lambda surface: surface.fill(WHITE), draw_cell)
+    return screen
 
 # Function to save level to a text file
 def save_maze_to_file(maze, output_path):
-    with open(output_path, 'w') as f:
-        for row in maze:
-            f.write(''.join(row) + '\n')
+    ARTIFACTS.write_text(output_path, ''.join(''.join(row) + '\n' for row in maze))
 
 def extract_moves(input_string):
     if input_string:
@@ -116,13 +112,13 @@ def extract_moves(input_string):
     return None
 
 # Function to evaluate moves, calculate results, and manage output
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_maze):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_maze):
     results = []
     is_valid = False  # Initialize is_valid
     is_active = False
 
     level_num = last_move['level']
-    level = levels[level_num - 1]
+    level = list(level.rows)
     print(f"Processing model {model_name}, maze, level {level_num}, step {step}")
 
     if step == 1 or current_maze is None:
@@ -148,7 +144,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"step_{step}.txt")
 
-    draw_maze(maze, image_path)
+    ARTIFACTS.draw(image_path, draw_maze, copy.deepcopy(maze), image_path)
     save_maze_to_file(maze, level_path)
 
     if new_pos != start_pos:
@@ -168,8 +164,8 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
 
     return results, is_valid, maze
 
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):
-    results, is_valid, updated_maze = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level)
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):
+    results, is_valid, updated_maze = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level)
 
     if not results:
         print("No valid results found.")
@@ -179,10 +175,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:  # Append to the file
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_maze
 
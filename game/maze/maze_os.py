@@ -1,18 +1,16 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key
+from src.output_sink import OUTPUTS
 
 # Color definitions
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
+CELL_COLORS = {'+': BLACK, 'S': RED, 'X': GREEN}
 
 # Cell size for the maze
 CELL_SIZE = 30
@@ -97,21 +95,19 @@ def update_maze(maze, path, end_pos, reached_end):
 
     return maze
 
+def draw_cell(screen, position, cell):
+    x, y = position
+    screen.fill(CELL_COLORS.get(cell, WHITE), (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+
 # Function to draw the maze and save it as an image
 def draw_maze(maze, output_path):
     height = len(maze)
     width = len(maze[0])
-    screen = pygame.Surface((width * CELL_SIZE, height * CELL_SIZE))
-    screen.fill(WHITE)  # Fill the background with white
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            if cell == '+':
-                pygame.draw.rect(screen, BLACK, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-            elif cell == 'S':
-                pygame.draw.rect(screen, RED, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-            elif cell == 'X':
-                pygame.draw.rect(screen, GREEN, pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-    pygame.image.save(screen, output_path)
+    cells = {(x, y): cell for y, row in enumerate(maze) for x, cell in enumerate(row)}
+    # Only the cells that changed since the last step of this level are redrawn
+    screen = FRAMES.draw(frame_key('maze', output_path), (width * CELL_SIZE, height * CELL_SIZE), cells,
+                         lambda surface: surface.fill(WHITE), draw_cell)
+    screen.save(output_path)
 
 # Function to save level to a text file
 def save_maze_to_file(maze, output_path):
@@ -120,11 +116,11 @@ def save_maze_to_file(maze, output_path):
             f.write(''.join(row) + '\n')
 
 # Function to evaluate moves, calculate results, and manage output
-def evaluate_moves(levels, moves, model_name, output_base_dir):
+def evaluate_moves(level, moves, model_name, output_base_dir):
     is_valid = False
     is_active = 0.0
     level_num = moves['level']
-    level = levels[level_num - 1]
+    level = list(level.rows)
 
     print(f"Processing model {model_name}, maze, level {level_num}")
     
@@ -165,13 +161,12 @@ def evaluate_moves(levels, moves, model_name, output_base_dir):
 
     return result
 
-def main(move, output_dir_base, model_name, levels):
-    result = evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result = evaluate_moves(level, move, model_name, output_dir_base)
 
     eval_dir = os.path.join(output_dir_base, "eval",  model_name)
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "maze.jsonl")
 
-    with open(eval_path, 'a') as f:  # Append to the file
-        json.dump(result, f)
-        f.write('\n')
+    OUTPUTS.append(eval_path, result)
+    return result
@@ -1,14 +1,11 @@
-import pygame
 import sys
 import json
 import os
 import re
 import copy
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS, read_records
+from game.render import FRAMES, frame_key
 
 # Constants
 BACKGROUND = (240, 248, 255)  # Light blue background
@@ -18,18 +15,16 @@ WINDOW_SIZE = (400, 400)
 TILE_SIZE = 80
 PADDING = 20
 
-# Create font object
-FONT = pygame.font.Font(None, 36)
+# Font size for the tile numbers
+FONT_SIZE = 36
 
 def create_game_state(level, current_state=None):
     if current_state:
         return current_state
 
-    n = level['n']
-    position = level['position']
     state = {
-        'n': n,
-        'position': position
+        'n': level.n,
+        'position': [list(row) for row in level.position]
     }
     return state
 
@@ -88,29 +83,22 @@ def apply_move(state, tile):
     position[zero_row][zero_col], position[tile_row][tile_col] = position[tile_row][tile_col], position[zero_row][zero_col]
     
     return {'n': n, 'position': position}
-def draw_tile(surface, value, x, y):
-    pygame.draw.rect(surface, TILE_COLOR, (x, y, TILE_SIZE, TILE_SIZE))
-    pygame.draw.rect(surface, (0, 0, 0), (x, y, TILE_SIZE, TILE_SIZE), 2)
+def draw_tile(surface, position, value):
+    row, col = position
+    x = PADDING + col * (TILE_SIZE + 5)
+    y = PADDING + row * (TILE_SIZE + 5)
+    surface.rect(TILE_COLOR, (x, y, TILE_SIZE, TILE_SIZE))
+    surface.rect((0, 0, 0), (x, y, TILE_SIZE, TILE_SIZE), 2)
     if value != 0:
-        text = FONT.render(str(value), True, TEXT_COLOR)
-        text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
-        surface.blit(text, text_rect)
+        surface.text(str(value), FONT_SIZE, TEXT_COLOR, center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
 
 def draw_game_state(state, output_path):
-    surface = pygame.Surface(WINDOW_SIZE)
-    surface.fill(BACKGROUND)
-
     n = state['n']
     position = state['position']
-
-    for row in range(n):
-        for col in range(n):
-            value = position[row][col]
-            x = PADDING + col * (TILE_SIZE + 5)
-            y = PADDING + row * (TILE_SIZE + 5)
-            draw_tile(surface, value, x, y)
-
-    pygame.image.save(surface, output_path)
+    tiles = {(row, col): position[row][col] for row in range(n) for col in range(n)}
+    surface = FRAMES.draw(frame_key('n_puzzle', output_path), WINDOW_SIZE, tiles,
+                          lambda surface: surface.fill(BACKGROUND), draw_tile)
+    return surface
 
 def save_game_state_to_file(state, output_path, level, step, model):
     data = {
@@ -121,10 +109,7 @@ def save_game_state_to_file(state, output_path, level, step, model):
         "step": step,
         "model": model
     }
-    
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    ARTIFACTS.append_jsonl(output_path, data)
 
 
 
@@ -138,11 +123,10 @@ def validate_solution(state):
     flattened = [num for row in position for num in row]
     return flattened == expected
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_state):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_state):
     results = []
 
     level_num = last_move['level']
-    level = json.loads(levels[0][level_num-1])
     if step == 1:
         # For the first step, get the correct level data from the loaded levels
         state = create_game_state(level)
@@ -167,7 +151,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"level_{level_num}.jsonl")
 
-    draw_game_state(state, image_path)
+    ARTIFACTS.draw(image_path, draw_game_state, copy.deepcopy(state), image_path)
     save_game_state_to_file(state, level_path, level_num, step, model_name)
 
     is_active = active_move(previous_state, state)
@@ -185,19 +169,17 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     return results, is_valid, state
 
 # Main function (placeholder for now)
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):    
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):    
     if step > 1 and current_level is None:
         # Load the previous state from the process_levels file
         level_num = last_move['level']
         level_path = os.path.join(output_dir_base, "process_levels",  model_name, "n_puzzle", f"level_{level_num}.jsonl")
-        with open(level_path, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                if data['step'] == step - 1:
-                    current_level = {'n': data['n'], 'position': data['position']}
-                    break
+        for data in read_records(level_path):
+            if data['step'] == step - 1:
+                current_level = {'n': data['n'], 'position': data['position']}
+                break
 
-    results, is_valid, updated_state = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level)
+    results, is_valid, updated_state = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level)
 
     if not results:
         print("No valid results found.")
@@ -207,10 +189,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_state
 
@@ -1,13 +1,9 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key
+from src.output_sink import OUTPUTS
 
 # Constants
 BACKGROUND = (240, 248, 255)  # Light blue background
@@ -17,15 +13,13 @@ WINDOW_SIZE = (400, 400)
 TILE_SIZE = 80
 PADDING = 20
 
-# Create font object
-FONT = pygame.font.Font(None, 36)
+# Font size for the tile numbers
+FONT_SIZE = 36
 
 def create_game_state(level):
-    n = level['n']
-    position = level['position']
     state = {
-        'n': n,
-        'position': position
+        'n': level.n,
+        'position': [list(row) for row in level.position]
     }
     return state
 
@@ -90,29 +84,22 @@ def apply_move(state, tile):
     
     return {'n': n, 'position': position}
 
-def draw_tile(surface, value, x, y):
-    pygame.draw.rect(surface, TILE_COLOR, (x, y, TILE_SIZE, TILE_SIZE))
-    pygame.draw.rect(surface, (0, 0, 0), (x, y, TILE_SIZE, TILE_SIZE), 2)
+def draw_tile(surface, position, value):
+    row, col = position
+    x = PADDING + col * (TILE_SIZE + 5)
+    y = PADDING + row * (TILE_SIZE + 5)
+    surface.rect(TILE_COLOR, (x, y, TILE_SIZE, TILE_SIZE))
+    surface.rect((0, 0, 0), (x, y, TILE_SIZE, TILE_SIZE), 2)
     if value != 0:
-        text = FONT.render(str(value), True, TEXT_COLOR)
-        text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
-        surface.blit(text, text_rect)
+        surface.text(str(value), FONT_SIZE, TEXT_COLOR, center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
 
 def draw_game_state(state, output_path):
-    surface = pygame.Surface(WINDOW_SIZE)
-    surface.fill(BACKGROUND)
-
     n = state['n']
     position = state['position']
-
-    for row in range(n):
-        for col in range(n):
-            value = position[row][col]
-            x = PADDING + col * (TILE_SIZE + 5)
-            y = PADDING + row * (TILE_SIZE + 5)
-            draw_tile(surface, value, x, y)
-
-    pygame.image.save(surface, output_path)
+    tiles = {(row, col): position[row][col] for row in range(n) for col in range(n)}
+    surface = FRAMES.draw(frame_key('n_puzzle', output_path), WINDOW_SIZE, tiles,
+                          lambda surface: surface.fill(BACKGROUND), draw_tile)
+    surface.save(output_path)
 
 def save_game_state_to_file(state, output_path, level, model):
     data = {
@@ -123,9 +110,7 @@ def save_game_state_to_file(state, output_path, level, model):
         "model": model
     }
     
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    OUTPUTS.append(output_path, data)
 
 def validate_solution(state):
     n = state['n']
@@ -134,9 +119,8 @@ def validate_solution(state):
     flattened = [num for row in position for num in row]
     return flattened == expected
 
-def evaluate_moves(levels, moves, model_name, output_base_dir):
+def evaluate_moves(level, moves, model_name, output_base_dir):
     level_num = moves['level']
-    level = json.loads(levels[0][level_num-1])
     print(f"Processing model {model_name}, n-puzzle, level {level_num}")
     state = create_game_state(level)
 
@@ -177,13 +161,12 @@ def evaluate_moves(levels, moves, model_name, output_base_dir):
 
     return result
 
-def main(move, output_dir_base, model_name, levels):
-    result = evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result = evaluate_moves(level, move, model_name, output_dir_base)
 
     eval_dir = os.path.join(output_dir_base, "eval",  model_name)
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "n_puzzle.jsonl")
 
-    with open(eval_path, 'a') as f:
-        json.dump(result, f)
-        f.write('\n')
\ No newline at end of file
+    OUTPUTS.append(eval_path, result)
+    return result
\ No newline at end of file
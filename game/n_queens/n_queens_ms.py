@@ -1,14 +1,11 @@
-import pygame
 import sys
 import json
 import os
 import re
 import copy
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS, read_records
+from game.render import FRAMES, frame_key
 
 # Constants
 SCREEN_SIZE = 800
@@ -22,32 +19,40 @@ def create_game_state(level, current_state=None):
     if current_state:
         return current_state
 
-    board_size = level['board_size']
-    first_queen = level['position']
     state = {
-        'board_size': board_size,
-        'queens': [first_queen]
+        'board_size': level.board_size,
+        'queens': [list(level.position)]
     }
     return state
 
-def draw_chessboard(screen, board_size):
-    for row in range(board_size):
-        for col in range(board_size):
-            color = WHITE if (row + col) % 2 == 0 else BLACK
-            pygame.draw.rect(screen, color, pygame.Rect(col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
 def draw_queen(screen, row, col, color):
-    pygame.draw.circle(screen, color, (col * CELL_SIZE + CELL_SIZE // 2, row * CELL_SIZE + CELL_SIZE // 2), CELL_SIZE // 3)
+    screen.circle(color, (col * CELL_SIZE + CELL_SIZE // 2, row * CELL_SIZE + CELL_SIZE // 2), CELL_SIZE // 3)
+
+def draw_square(screen, position, square):
+    row, col = position
+    color, queen_color = square
+    screen.fill(color, (col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    if queen_color:
+        draw_queen(screen, row, col, queen_color)
 
 def draw_game_state(state, output_path):
-    screen = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
-    draw_chessboard(screen, state['board_size'])
-    
+    board_size = state['board_size']
+    cells = SCREEN_SIZE // CELL_SIZE
+    squares = {}
+    for row in range(cells):
+        for col in range(cells):
+            # Squares past the board stay black
+            on_board = row < board_size and col < board_size
+            squares[(row, col)] = [WHITE if on_board and (row + col) % 2 == 0 else BLACK, None]
+    # The first queen is red; a later queen on the same square is drawn over it
     for i, queen in enumerate(state['queens']):
-        color = RED if i == 0 else SKY_BLUE
-        draw_queen(screen, queen[0], queen[1], color)
-    
-    pygame.image.save(screen, output_path)
+        square = squares.get((queen[0], queen[1]))
+        if square:
+            square[1] = RED if i == 0 else SKY_BLUE
+    squares = {position: tuple(square) for position, square in squares.items()}
+    screen = FRAMES.draw(frame_key('n_queens', output_path), (SCREEN_SIZE, SCREEN_SIZE), squares,
+                         lambda surface: None, draw_square)
+    return screen
 
 def is_valid_move(queens, new_queen):
     if not isinstance(new_queen[0], int) or not isinstance(new_queen[1], int):
@@ -92,11 +97,9 @@ def back_to_step(extracted_move, step_states, state):
     else:
         return state
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_state, step_states):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_state, step_states):
     results = []
     level_num = last_move['level']
-    levels = [json.loads(json_str) for json_str in levels[0]]  # convert string to dict
-    level = next(l for l in levels if l['level'] == level_num)
     print(f"Processing model {model_name}, n_queens, level {level_num}, step {step}")
 
     state = create_game_state(level, current_state)
@@ -117,7 +120,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"level_{level_num}.jsonl")
 
-    draw_game_state(state, image_path)
+    ARTIFACTS.draw(image_path, draw_game_state, copy.deepcopy(state), image_path)
     save_game_state_to_file(state, level_path, level_num, step)
 
     is_active = active_move(previous_state, state['queens'])
@@ -156,29 +159,24 @@ def save_game_state_to_file(state, output_path, level, step):
         "step": step,
         "output": state['queens'][1:]
     }
-    
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    ARTIFACTS.append_jsonl(output_path, data)
 
 
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):
     if step > 1 and current_level is None:
         # Load the previous state from the process_levels file
         level_num = last_move['level']
         level_path = os.path.join(output_dir_base, "process_levels",  model_name, "n_queens", f"level_{level_num}.jsonl")
-        with open(level_path, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                if data['step'] == step - 1:
-                    current_level = {
-                        'board_size': data['board_size'],
-                        'position': data['position'],
-                        'queens': [data['position']] + data['output']
-                    }
-                    break
-
-    results, is_valid, updated_state = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level, step_states)
+        for data in read_records(level_path):
+            if data['step'] == step - 1:
+                current_level = {
+                    'board_size': data['board_size'],
+                    'position': data['position'],
+                    'queens': [data['position']] + data['output']
+                }
+                break
+
+    results, is_valid, updated_state = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level, step_states)
 
     if not results:
         print("No valid results found.")
@@ -188,10 +186,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_state
 
@@ -1,13 +1,9 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key
+from src.output_sink import OUTPUTS
 
 # Constants
 SCREEN_SIZE = 800
@@ -18,11 +14,9 @@ RED = (255, 0, 0)
 CELL_SIZE = SCREEN_SIZE // 8
 
 def create_game_state(level):
-    board_size = level['board_size']
-    first_queen = level['position']
     state = {
-        'board_size': board_size,
-        'queens': [first_queen]
+        'board_size': level.board_size,
+        'queens': [list(level.position)]
     }
     return state
 
@@ -75,24 +69,34 @@ def is_valid_move(queens, new_queens):
     is_active = round(active_moves / total_moves * 100, 2) if total_moves > 0 else 0.0
     return valid_moves, is_active
 
-def draw_chessboard(screen, board_size):
-    for row in range(board_size):
-        for col in range(board_size):
-            color = WHITE if (row + col) % 2 == 0 else BLACK
-            pygame.draw.rect(screen, color, pygame.Rect(col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
 def draw_queen(screen, row, col, color):
-    pygame.draw.circle(screen, color, (col * CELL_SIZE + CELL_SIZE // 2, row * CELL_SIZE + CELL_SIZE // 2), CELL_SIZE // 3)
+    screen.circle(color, (col * CELL_SIZE + CELL_SIZE // 2, row * CELL_SIZE + CELL_SIZE // 2), CELL_SIZE // 3)
+
+def draw_square(screen, position, square):
+    row, col = position
+    color, queen_color = square
+    screen.fill(color, (col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    if queen_color:
+        draw_queen(screen, row, col, queen_color)
 
 def draw_game_state(state, output_path):
-    screen = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
-    draw_chessboard(screen, state['board_size'])
-    
+    board_size = state['board_size']
+    cells = SCREEN_SIZE // CELL_SIZE
+    squares = {}
+    for row in range(cells):
+        for col in range(cells):
+            # Squares past the board stay black
+            on_board = row < board_size and col < board_size
+            squares[(row, col)] = [WHITE if on_board and (row + col) % 2 == 0 else BLACK, None]
+    # The first queen is red; a later queen on the same square is drawn over it
     for i, queen in enumerate(state['queens']):
-        color = RED if i == 0 else SKY_BLUE
-        draw_queen(screen, queen[0], queen[1], color)
-    
-    pygame.image.save(screen, output_path)
+        square = squares.get((queen[0], queen[1]))
+        if square:
+            square[1] = RED if i == 0 else SKY_BLUE
+    squares = {position: tuple(square) for position, square in squares.items()}
+    screen = FRAMES.draw(frame_key('n_queens', output_path), (SCREEN_SIZE, SCREEN_SIZE), squares,
+                         lambda surface: None, draw_square)
+    screen.save(output_path)
 
 def save_game_state_to_file(state, output_path, level):
     data = {
@@ -103,9 +107,7 @@ def save_game_state_to_file(state, output_path, level):
         "output": state['queens'][1:]
     }
     
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    OUTPUTS.append(output_path, data)
 
 def validate_solution(queens):
     if len(queens) != 8:
@@ -120,12 +122,10 @@ def validate_solution(queens):
 
     return True
 
-def evaluate_moves(levels, moves, model_name, output_base_dir):
+def evaluate_moves(level, moves, model_name, output_base_dir):
     is_active = 0.0
     level_num = moves['level']
     print(f"Processing model {model_name}, n-queens, level {level_num}")
-    levels = [json.loads(json_str) for json_str in levels[0]]  # convert string to dict
-    level = next(l for l in levels if l['level'] == level_num)
     
     state = create_game_state(level)
     extract_move = extract_coordinates(moves['output'])
@@ -157,12 +157,11 @@ def evaluate_moves(levels, moves, model_name, output_base_dir):
 
     return result
 
-def main(move, output_dir_base, model_name, levels):
-    result= evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result= evaluate_moves(level, move, model_name, output_dir_base)
     eval_dir = os.path.join(output_dir_base, "eval",  model_name)
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "n_queens.jsonl")
 
-    with open(eval_path, 'a') as f:
-        json.dump(result, f)
-        f.write('\n')
\ No newline at end of file
+    OUTPUTS.append(eval_path, result)
+    return result
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import sys
+import atexit
+import importlib
+import threading
+from collections import OrderedDict
+
+from src.config import RENDER_BACKEND
+from src.artifacts import ARTIFACTS
+
+# Frames kept for incremental redraws; one per level being played (about 2.5 MB for the largest board)
+MAX_CACHED_FRAMES = 64
+
+# Drawing backends; both produce the same pixels
+BACKENDS = {
+    'numpy': 'game.render_numpy',
+    'pygame': 'game.render_pygame',
+}
+
+_backend = None
+
+
+def set_backend(name):
+    """Select the drawing backend for this process; forked workers inherit it."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown render backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    first_import = BACKENDS[name] not in sys.modules
+    _backend = importlib.import_module(BACKENDS[name])
+    if first_import:
+        # Backends may register exit hooks of their own (pygame.quit); queued draws must run before them
+        atexit.register(ARTIFACTS.flush)
+    return _backend
+
+
+def get_backend():
+    return _backend or set_backend(RENDER_BACKEND)
+
+
+def load_sprites(directory, names):
+    """Sprites ``directory/<name>.png``, decoded once per process."""
+    return get_backend().load_sprites(directory, tuple(names))
+
+
+_backgrounds = {}
+_backgrounds_lock = threading.Lock()
+
+
+def background(name, size, draw):
+    """A canvas that ``draw(canvas)`` paints once per backend and that is then reused, e.g. an empty board."""
+    backend = get_backend()
+    key = (backend.NAME, name, size)
+    with _backgrounds_lock:
+        canvas = _backgrounds.get(key)
+    if canvas is None:
+        canvas = backend.new_canvas(size)
+        draw(canvas)
+        with _backgrounds_lock:
+            _backgrounds[key] = canvas
+    return canvas
+
+
+class FrameCache:
+    """The last frame drawn under each key, so the next one only redraws the tiles that changed.
+
+    A frame is described by ``tiles``, a dict from tile position to whatever decides how
+    that tile looks. ``draw_tile(canvas, position, value)`` must repaint the whole tile
+    area, so that updating a cached frame gives exactly the pixels of a full redraw.
+    """
+
+    def __init__(self, max_frames=MAX_CACHED_FRAMES):
+        self.max_frames = max_frames
+        self.frames = OrderedDict()   # key -> (canvas, tiles)
+        self.lock = threading.Lock()
+
+    def draw(self, key, size, tiles, draw_background, draw_tile):
+        backend = get_backend()
+        key = (backend.NAME, key)
+        with self.lock:
+            cached = self.frames.pop(key, None)
+        if cached is None or cached[0].size != size or cached[1].keys() != tiles.keys():
+            canvas = backend.new_canvas(size)
+            draw_background(canvas)
+            changed = list(tiles.items())
+        else:
+            canvas, previous = cached
+            changed = [(position, value) for position, value in tiles.items() if previous[position] != value]
+        for position, value in changed:
+            draw_tile(canvas, position, value)
+        with self.lock:
+            self.frames[key] = (canvas, tiles)
+            while len(self.frames) > self.max_frames:
+                self.frames.popitem(last=False)
+        return canvas
+
+
+# Shared by every game module in the process
+FRAMES = FrameCache()
+
+
+# Frames for the same level land in the same directory, so it is a natural cache key
+def frame_key(game_name, output_path):
+    return (game_name, os.path.dirname(output_path))
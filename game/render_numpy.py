@@ -0,0 +1,269 @@
+import os
+import json
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from src.config import GLYPH_ATLAS_DIR
+
+NAME = 'numpy'
+
+
+class Sprite:
+    """An RGBA image, kept as int32 planes ready for blending."""
+
+    def __init__(self, pixels):
+        self.rgb = pixels[:, :, :3].astype(np.int32)
+        self.alpha = pixels[:, :, 3:].astype(np.int32)
+        self.size = (pixels.shape[1], pixels.shape[0])
+
+
+@lru_cache(maxsize=None)
+def load_sprites(directory, names):
+    sprites = {}
+    for name in names:
+        with Image.open(os.path.join(directory, f"{name}.png")) as image:
+            sprites[name] = Sprite(np.asarray(image.convert('RGBA')))
+    return sprites
+
+
+# Antialiased text coverage, pre-rendered from pygame's default font (see render_pygame.build_glyph_atlas)
+@lru_cache(maxsize=None)
+def load_glyph_atlas():
+    with Image.open(os.path.join(GLYPH_ATLAS_DIR, 'glyphs.png')) as image:
+        sheet = np.asarray(image.convert('L')).astype(np.int32)
+    with open(os.path.join(GLYPH_ATLAS_DIR, 'glyphs.json'), 'r') as f:
+        index = json.load(f)
+    return {(text, int(size)): sheet[y:y + h, x:x + w, None]
+            for size, glyphs in index.items() for text, (x, y, w, h) in glyphs.items()}
+
+
+def glyph_mask(text, size):
+    mask = load_glyph_atlas().get((text, size))
+    if mask is None:
+        raise KeyError(f"No glyph for {text!r} at size {size} in {GLYPH_ATLAS_DIR}; "
+                       f"add it to render_pygame.ATLAS_GLYPHS and rebuild the atlas")
+    return mask
+
+
+# Row spans of pygame.draw.circle (midpoint algorithm), as a mask centred at (radius, radius)
+@lru_cache(maxsize=None)
+def circle_mask(radius):
+    mask = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=bool)
+    f = 1 - radius
+    ddf_x = 0
+    ddf_y = -2 * radius
+    x = 0
+    y = radius
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddf_y += 2
+            f += ddf_y
+        x += 1
+        ddf_x += 2
+        f += ddf_x + 1
+        if f >= 0:
+            mask[radius + y - 1, radius - x:radius + x] = True
+            mask[radius - y, radius - x:radius + x] = True
+        mask[radius + x - 1, radius - y:radius + y] = True
+        mask[radius - x, radius - y:radius + y] = True
+    return mask
+
+
+# Bresenham steps of pygame.draw.line, both ends included
+def line_points(x1, y1, x2, y2):
+    dx, dy = abs(x2 - x1), abs(y2 - y1)
+    sx = 1 if x2 > x1 else -1
+    sy = 1 if y2 > y1 else -1
+    err = int((dx if dx > dy else -dy) / 2)   # C division, rounding toward zero
+    points = [(x1, y1)]
+    while (x1, y1) != (x2, y2):
+        e2 = err
+        if e2 > -dx:
+            err -= dy
+            x1 += sx
+        if e2 < dy:
+            err += dx
+            y1 += sy
+        points.append((x1, y1))
+    return points
+
+
+def _round(value):
+    # C's (int)(v +/- 0.5): halves round away from zero
+    return int(value - 0.5) if value < 0 else int(value + 0.5)
+
+
+def clip_line(x1, y1, x2, y2, size):
+    """The line's endpoints clipped to a canvas of ``size`` the way pygame.draw.line clips them
+    (Liang-Barsky, against [0, w] x [0, h]), or None if it misses the canvas."""
+    w, h = size
+    p1, p3 = x1 - x2, y1 - y2
+    q1, q2, q3, q4 = x1, w - x1, y1, h - y1
+    if (p1 == 0 and (q1 < 0 or q2 < 0)) or (p3 == 0 and (q3 < 0 or q4 < 0)):
+        return None
+    nmax, pmin = 0.0, 1.0
+    for p, q_low, q_high in ((p1, q1, q2), (p3, q3, q4)):
+        if p:
+            r1, r2 = q_low / p, q_high / -p
+            if p < 0:
+                nmax, pmin = max(nmax, r1), min(pmin, r2)
+            else:
+                nmax, pmin = max(nmax, r2), min(pmin, r1)
+    if nmax > pmin:
+        return None
+    return x1 + _round(-p1 * nmax), y1 + _round(-p3 * nmax), x1 + _round(-p1 * pmin), y1 + _round(-p3 * pmin)
+
+
+def line_spans(x1, y1, x2, y2, width, size):
+    """The (x, y, w, h) rects pygame.draw.line fills for a diagonal line of ``width`` > 1 on a canvas
+    of ``size``: one run across the minor axis per Bresenham step (rows for steep lines, columns
+    for shallow ones), continued past the clipped end while the run is still on the canvas."""
+    inside = lambda x, y: 0 <= x < size[0] and 0 <= y < size[1]
+    steep = abs(x1 - x2) <= abs(y1 - y2)
+    dx, sx = abs(x2 - x1), 1 if x1 < x2 else -1
+    dy, sy = abs(y2 - y1), 1 if y1 < y2 else -1
+    err = int((dx if dx > dy else -dy) / 2)
+    end_x, end_y = x2, y2
+    x1, y1, x2, y2 = clip_line(x1, y1, x2, y2, size)
+    low = (x1 if steep else y1) - (width - 1) // 2
+    spans = []
+
+    def step():
+        nonlocal err, x1, y1, low
+        e2 = err
+        if e2 > -dx:
+            err -= dy
+            x1 += sx
+            low += sx if steep else 0
+        if e2 < dy:
+            err += dx
+            y1 += sy
+            low += 0 if steep else sy
+
+    def reached(a, b, direction):
+        return (1 if a > b else -1 if a < b else direction) == direction
+
+    while not (reached(x1, x2, sx) and reached(y1, y2, sy)):
+        spans.append((low, y1, width, 1) if steep else (x1, low, 1, width))
+        step()
+    if steep:
+        while y1 != end_y and (inside(low, y1) or inside(low + width - 1, y1)):
+            spans.append((low, y1, width, 1))
+            step()
+        spans.append((low, y1, width, 1))
+    else:
+        while x1 != end_x and (inside(x1, low) or inside(x1, low + width - 1)):
+            spans.append((x1, low, 1, width))
+            step()
+        spans.append((x1, low, 1, width))
+    return spans
+
+
+# pygame's per-pixel alpha blend, so blended pixels match its output exactly
+def blend(dst, rgb, alpha):
+    d = dst.astype(np.int32)
+    dst[...] = (((rgb - d) * alpha + rgb) >> 8) + d
+
+
+class Canvas:
+    """An off-screen RGB image held in a (height, width, 3) uint8 array."""
+
+    def __init__(self, size, color=(0, 0, 0)):
+        self.size = tuple(size)
+        self.pixels = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        self.pixels[...] = color
+
+    def _clip(self, x, y, w, h):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.size[0]), min(y + h, self.size[1])
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def fill(self, color, rect=None):
+        if rect is None:
+            self.pixels[...] = color
+            return
+        clipped = self._clip(*rect)
+        if clipped:
+            x0, y0, x1, y1 = clipped
+            self.pixels[y0:y1, x0:x1] = color
+
+    def rect(self, color, rect, width=0):
+        if width <= 0:
+            self.fill(color, rect)
+            return
+        # An outline is drawn inside the rect
+        x, y, w, h = rect
+        self.fill(color, (x, y, w, width))
+        self.fill(color, (x, y + h - width, w, width))
+        self.fill(color, (x, y, width, h))
+        self.fill(color, (x + w - width, y, width, h))
+
+    def line(self, color, start, end, width=1):
+        """Same pixels as pygame.draw.line, clipping included."""
+        (x1, y1), (x2, y2) = start, end
+        if width < 1 or clip_line(x1, y1, x2, y2, self.size) is None:
+            return
+        # Thick lines spread (width - 1) // 2 pixels to the left of / above the given coordinate
+        spread = (width - 1) // 2
+        if x1 == x2:
+            self.fill(color, (x1 - spread, min(y1, y2), width, abs(y2 - y1) + 1))
+        elif y1 == y2:
+            self.fill(color, (min(x1, x2), y1 - spread, abs(x2 - x1) + 1, width))
+        elif width == 1:
+            xs, ys = np.array(line_points(*clip_line(x1, y1, x2, y2, self.size))).T
+            on_canvas = (xs >= 0) & (xs < self.size[0]) & (ys >= 0) & (ys < self.size[1])
+            self.pixels[ys[on_canvas], xs[on_canvas]] = color
+        else:
+            for rect in line_spans(x1, y1, x2, y2, width, self.size):
+                self.fill(color, rect)
+
+    def _region(self, x, y, w, h):
+        # The part of a w x h image at (x, y) that lands on the canvas, as (canvas view, image slices)
+        clipped = self._clip(x, y, w, h)
+        if clipped is None:
+            return None, None
+        x0, y0, x1, y1 = clipped
+        return self.pixels[y0:y1, x0:x1], (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+    def circle(self, color, center, radius):
+        mask = circle_mask(radius)
+        view, (rows, cols) = self._region(center[0] - radius, center[1] - radius, mask.shape[1], mask.shape[0])
+        if view is not None:
+            view[mask[rows, cols]] = color
+
+    def blit(self, sprite, topleft):
+        view, (rows, cols) = self._region(topleft[0], topleft[1], *sprite.size)
+        if view is not None:
+            blend(view, sprite.rgb[rows, cols], sprite.alpha[rows, cols])
+
+    def text(self, text, size, color, topleft=None, center=None):
+        mask = glyph_mask(text, size)
+        h, w = mask.shape[:2]
+        x, y = (center[0] - w // 2, center[1] - h // 2) if center else topleft
+        view, (rows, cols) = self._region(x, y, w, h)
+        if view is not None:
+            blend(view, np.array(color, dtype=np.int32), mask[rows, cols])
+
+    def copy_from(self, canvas, rect=None):
+        if rect is None:
+            self.pixels[...] = canvas.pixels
+            return
+        clipped = self._clip(*rect)
+        if clipped:
+            x0, y0, x1, y1 = clipped
+            self.pixels[y0:y1, x0:x1] = canvas.pixels[y0:y1, x0:x1]
+
+    def to_image(self):
+        return Image.fromarray(self.pixels)
+
+    def save(self, path):
+        self.to_image().save(path)
+
+
+def new_canvas(size, color=(0, 0, 0)):
+    return Canvas(size, color)
@@ -0,0 +1,116 @@
+import os
+import json
+from functools import lru_cache
+from PIL import Image
+
+# Draw off-screen; no window system needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+
+pygame.init()
+pygame.display.init()
+pygame.display.set_mode((1, 1))
+
+NAME = 'pygame'
+
+
+@lru_cache(maxsize=None)
+def load_sprites(directory, names):
+    return {name: pygame.image.load(os.path.join(directory, f"{name}.png")) for name in names}
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    return pygame.font.Font(None, size)
+
+
+# Rendered text, e.g. the digits of sudoku and n_puzzle or the hanoi labels
+@lru_cache(maxsize=4096)
+def glyph(text, size, color):
+    return get_font(size).render(text, True, color)
+
+
+class Canvas:
+    """An off-screen pygame surface."""
+
+    def __init__(self, size, color=(0, 0, 0)):
+        self.size = tuple(size)
+        self.surface = pygame.Surface(self.size)
+        if color != (0, 0, 0):
+            self.surface.fill(color)
+
+    def fill(self, color, rect=None):
+        self.surface.fill(color, rect)
+
+    def rect(self, color, rect, width=0):
+        pygame.draw.rect(self.surface, color, rect, width)
+
+    def line(self, color, start, end, width=1):
+        pygame.draw.line(self.surface, color, start, end, width)
+
+    def circle(self, color, center, radius):
+        pygame.draw.circle(self.surface, color, center, radius)
+
+    def blit(self, sprite, topleft):
+        self.surface.blit(sprite, topleft)
+
+    def text(self, text, size, color, topleft=None, center=None):
+        image = glyph(text, size, color)
+        self.surface.blit(image, image.get_rect(center=center) if center else topleft)
+
+    def copy_from(self, canvas, rect=None):
+        rect = pygame.Rect(rect) if rect else self.surface.get_rect()
+        self.surface.blit(canvas.surface, rect, rect)
+
+    def to_image(self):
+        return Image.frombytes('RGB', self.size, pygame.image.tobytes(self.surface, 'RGB'))
+
+    def save(self, path):
+        pygame.image.save(self.surface, path)
+
+
+def new_canvas(size, color=(0, 0, 0)):
+    return Canvas(size, color)
+
+
+# Text drawn by the game modules, as (size, strings)
+ATLAS_GLYPHS = [
+    (36, [str(n) for n in range(100)] + [chr(c) for c in range(ord('a'), ord('z') + 1)]),
+    (72, [chr(c) for c in range(ord('A'), ord('Z') + 1)]),
+]
+
+
+def build_glyph_atlas(atlas_dir):
+    """Write the antialiased coverage of every ATLAS_GLYPHS entry as one grayscale sheet plus an index.
+
+    The numpy backend blends these masks itself, so it draws text without pygame or its font.
+    """
+    rows = []
+    for size, strings in ATLAS_GLYPHS:
+        rows.append((size, [(text, pygame.surfarray.array_alpha(glyph(text, size, (255, 255, 255)))) for text in strings]))
+    width = max(sum(mask.shape[0] for _, mask in masks) for _, masks in rows)
+    height = sum(max(mask.shape[1] for _, mask in masks) for _, masks in rows)
+    sheet = pygame.Surface((width, height))
+    index = {}
+    y = 0
+    for size, masks in rows:
+        x = 0
+        index[str(size)] = {}
+        for text, mask in masks:
+            w, h = mask.shape
+            pygame.surfarray.blit_array(sheet.subsurface((x, y, w, h)), mask[:, :, None].repeat(3, axis=2))
+            index[str(size)][text] = [x, y, w, h]
+            x += w
+        y += max(mask.shape[1] for _, mask in masks)
+    os.makedirs(atlas_dir, exist_ok=True)
+    pygame.image.save(sheet, os.path.join(atlas_dir, 'glyphs.png'))
+    with open(os.path.join(atlas_dir, 'glyphs.json'), 'w') as f:
+        json.dump(index, f)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from src.config import GLYPH_ATLAS_DIR
+    build_glyph_atlas(GLYPH_ATLAS_DIR)
+    print(f"Glyph atlas written to {GLYPH_ATLAS_DIR}")
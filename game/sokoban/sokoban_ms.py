@@ -1,30 +1,21 @@
-import pygame
 import sys
 import json
 import os
 import re
 import copy
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS
+from game.render import FRAMES, frame_key, load_sprites
 
 # Constants
 TILE_SIZE = 32
 
-# Load images
+# Sprite drawn for each level character; anything else is floor
+TILE_SPRITES = {'#': 'wall', '.': 'dock', '$': 'box', '*': 'box_docked', '@': 'worker', '+': 'worker_dock'}
+
+# Load images (decoded once per process)
 def load_images():
-    images = {
-        'box': pygame.image.load('game/sokoban/images/box.png'),
-        'box_docked': pygame.image.load('game/sokoban/images/box_docked.png'),
-        'dock': pygame.image.load('game/sokoban/images/dock.png'),
-        'floor': pygame.image.load('game/sokoban/images/floor.png'),
-        'wall': pygame.image.load('game/sokoban/images/wall.png'),
-        'worker': pygame.image.load('game/sokoban/images/worker.png'),
-        'worker_dock': pygame.image.load('game/sokoban/images/worker_dock.png')
-    }
-    return images
+    return load_sprites('game/sokoban/images', ('box', 'box_docked', 'dock', 'floor', 'wall', 'worker', 'worker_dock'))
 
 # Function to create game state
 def create_game_state(level, current_state=None):
@@ -65,40 +56,25 @@ def move_worker(state, direction):
 
     return state
 
-# Function to draw the game state and save it as an image
+def draw_tile(screen, position, tile):
+    x, y = position
+    # Sprites have transparent pixels, so clear the tile to the black background first
+    screen.fill((0, 0, 0), (x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+    screen.blit(load_images()[TILE_SPRITES.get(tile, 'floor')], (x * TILE_SIZE, y * TILE_SIZE))
+
+# Function to draw the game state; ARTIFACTS encodes and saves the returned canvas
 def draw_game_state(state, output_path):
-    images = load_images()
     height = len(state)
     width = max(len(row) for row in state)
-    screen = pygame.Surface((width * TILE_SIZE, height * TILE_SIZE))
-    
-    for y, row in enumerate(state):
-        for x, tile in enumerate(row):
-            if tile == '#':
-                screen.blit(images['wall'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '.':
-                screen.blit(images['dock'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '$':
-                screen.blit(images['box'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '*':
-                screen.blit(images['box_docked'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '@':
-                screen.blit(images['worker'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '+':
-                screen.blit(images['worker_dock'], (x * TILE_SIZE, y * TILE_SIZE))
-            else:
-                screen.blit(images['floor'], (x * TILE_SIZE, y * TILE_SIZE))
-        # Fill the rest of the row with floor tiles if it's shorter than the maximum width
-        for x in range(len(row), width):
-            screen.blit(images['floor'], (x * TILE_SIZE, y * TILE_SIZE))
-    
-    pygame.image.save(screen, output_path)
+    # Rows shorter than the widest one are padded with floor tiles
+    tiles = {(x, y): row[x] if x < len(row) else ' ' for y, row in enumerate(state) for x in range(width)}
+    screen = FRAMES.draw(frame_key('sokoban', output_path), (width * TILE_SIZE, height * TILE_SIZE), tiles,
+                         lambda surface: None, draw_tile)
+    return screen
 
 # Function to save game state to a text file
 def save_game_state_to_file(state, output_path):
-    with open(output_path, 'w') as f:
-        for row in state:
-            f.write(''.join(row) + '\n')
+    ARTIFACTS.write_text(output_path, ''.join(''.join(row) + '\n' for row in state))
 
 def extract_move(input_string):
     if input_string:
@@ -124,10 +100,10 @@ def back_to_step(direction, step_states, state):
         return state
 
 # Function to evaluate moves, calculate results, and manage output
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_state, step_states):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_state, step_states):
     results = []
     level_num = last_move['level']
-    level = levels[level_num - 1]
+    level = list(level.rows)
     print(f"Processing model {model_name}, sokoban, level {level_num}, step {step}")
 
     state = create_game_state(level, current_state)
@@ -148,7 +124,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"step_{step}.txt")
 
-    draw_game_state(state, image_path)
+    ARTIFACTS.draw(image_path, draw_game_state, copy.deepcopy(state), image_path)
     save_game_state_to_file(state, level_path)
 
     is_active = active_move(previous_state, state)
@@ -165,8 +141,8 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
 
     return results, is_valid, state
 
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):
-    results, is_valid, updated_state = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level, step_states)
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):
+    results, is_valid, updated_state = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level, step_states)
 
     if not results:
         print("No valid results found.")
@@ -176,10 +152,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:  # Append to the file
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_state
 
@@ -1,29 +1,19 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key, load_sprites
+from src.output_sink import OUTPUTS
 
 # Constants
 TILE_SIZE = 32
 
-# Load images
+# Sprite drawn for each level character; anything else is floor
+TILE_SPRITES = {'#': 'wall', '.': 'dock', '$': 'box', '*': 'box_docked', '@': 'worker', '+': 'worker_dock'}
+
+# Load images (decoded once per process)
 def load_images():
-    images = {
-        'box': pygame.image.load('game/sokoban/images/box.png'),
-        'box_docked': pygame.image.load('game/sokoban/images/box_docked.png'),
-        'dock': pygame.image.load('game/sokoban/images/dock.png'),
-        'floor': pygame.image.load('game/sokoban/images/floor.png'),
-        'wall': pygame.image.load('game/sokoban/images/wall.png'),
-        'worker': pygame.image.load('game/sokoban/images/worker.png'),
-        'worker_dock': pygame.image.load('game/sokoban/images/worker_dock.png')
-    }
-    return images
+    return load_sprites('game/sokoban/images', ('box', 'box_docked', 'dock', 'floor', 'wall', 'worker', 'worker_dock'))
 
 # Function to create game state
 def create_game_state(level):
@@ -84,34 +74,21 @@ def move_worker(state, directions):
 
     return state, is_active
 
+def draw_tile(screen, position, tile):
+    x, y = position
+    # Sprites have transparent pixels, so clear the tile to the black background first
+    screen.fill((0, 0, 0), (x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+    screen.blit(load_images()[TILE_SPRITES.get(tile, 'floor')], (x * TILE_SIZE, y * TILE_SIZE))
+
 # Function to draw the game state and save it as an image
 def draw_game_state(state, output_path):
-    images = load_images()
     height = len(state)
     width = max(len(row) for row in state)
-    screen = pygame.Surface((width * TILE_SIZE, height * TILE_SIZE))
-    
-    for y, row in enumerate(state):
-        for x, tile in enumerate(row):
-            if tile == '#':
-                screen.blit(images['wall'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '.':
-                screen.blit(images['dock'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '$':
-                screen.blit(images['box'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '*':
-                screen.blit(images['box_docked'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '@':
-                screen.blit(images['worker'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif tile == '+':
-                screen.blit(images['worker_dock'], (x * TILE_SIZE, y * TILE_SIZE))
-            else:
-                screen.blit(images['floor'], (x * TILE_SIZE, y * TILE_SIZE))
-        # Fill the rest of the row with floor tiles if it's shorter than the maximum width
-        for x in range(len(row), width):
-            screen.blit(images['floor'], (x * TILE_SIZE, y * TILE_SIZE))
-    
-    pygame.image.save(screen, output_path)
+    # Rows shorter than the widest one are padded with floor tiles
+    tiles = {(x, y): row[x] if x < len(row) else ' ' for y, row in enumerate(state) for x in range(width)}
+    screen = FRAMES.draw(frame_key('sokoban', output_path), (width * TILE_SIZE, height * TILE_SIZE), tiles,
+                         lambda surface: None, draw_tile)
+    screen.save(output_path)
 
 # Function to save game state to a text file
 def save_game_state_to_file(state, output_path):
@@ -120,11 +97,11 @@ def save_game_state_to_file(state, output_path):
             f.write(''.join(row) + '\n')
 
 # Function to evaluate moves, calculate results, and manage output
-def evaluate_moves(levels, moves, model_name, output_base_dir):
+def evaluate_moves(level, moves, model_name, output_base_dir):
     is_active = 0.0
 
     level_num = moves['level']
-    level = levels[level_num - 1]
+    level = list(level.rows)
     print(f"Processing model {model_name}, sokoban, level {level_num}")
 
     state = create_game_state(level)
@@ -155,13 +132,12 @@ def evaluate_moves(levels, moves, model_name, output_base_dir):
 
     return result
 
-def main(move, output_dir_base, model_name, levels):
-    result = evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result = evaluate_moves(level, move, model_name, output_dir_base)
 
     eval_dir = os.path.join(output_dir_base, "eval",  model_name)
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "sokoban.jsonl")
 
-    with open(eval_path, 'a') as f:  # Append to the file
-        json.dump(result, f)
-        f.write('\n')
+    OUTPUTS.append(eval_path, result)
+    return result
@@ -1,14 +1,12 @@
-import pygame
 import sys
 import json
 import os
 import re
 import copy
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS, read_records
+from game.render import FRAMES, frame_key, background
+from src.solver.sudoku_solver import solve
 
 # Constants
 SCREEN_SIZE = 450
@@ -24,20 +22,35 @@ def create_game_state(level, current_state=None):
         return current_state
 
     return {
-        'position': level['position'],
-        'solution': level['solutions'],
-        'clue_numbers': level['clue_numbers'],
-        'current_board': level['position']
+        'position': level.position,
+        'solution': level.solutions or solve(level.position),
+        'clue_numbers': level.clue_numbers,
+        'current_board': level.position
     }
 
 def draw_grid(screen):
     for i in range(GRID_SIZE + 1):
         thickness = 3 if i % 3 == 0 else 1
-        pygame.draw.line(screen, BLACK, (i * CELL_SIZE, 0), (i * CELL_SIZE, SCREEN_SIZE), thickness)
-        pygame.draw.line(screen, BLACK, (0, i * CELL_SIZE), (SCREEN_SIZE, i * CELL_SIZE), thickness)
+        screen.line(BLACK, (i * CELL_SIZE, 0), (i * CELL_SIZE, SCREEN_SIZE), thickness)
+        screen.line(BLACK, (0, i * CELL_SIZE), (SCREEN_SIZE, i * CELL_SIZE), thickness)
+
+# The empty grid, drawn once and copied under every cell that changes
+def blank_grid():
+    return background('sudoku_grid', (SCREEN_SIZE, SCREEN_SIZE), draw_blank_grid)
+
+def draw_blank_grid(screen):
+    screen.fill(WHITE)
+    draw_grid(screen)
 
-def draw_numbers(screen, board, solution, added_positions):
-    font = pygame.font.Font(None, 36)
+def draw_cell(screen, position, cell):
+    row, col = position
+    screen.copy_from(blank_grid(), (col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    if cell:
+        num, color = cell
+        screen.text(num, 36, color, topleft=(col * CELL_SIZE + CELL_SIZE // 3, row * CELL_SIZE + CELL_SIZE // 4))
+
+def number_cells(board, solution, added_positions):
+    cells = {}
     for row in range(GRID_SIZE):
         for col in range(GRID_SIZE):
             num = board[row * GRID_SIZE + col]
@@ -46,15 +59,16 @@ def draw_numbers(screen, board, solution, added_positions):
                     color = BLUE if num == solution[row * GRID_SIZE + col] else RED
                 else:
                     color = BLACK
-                text = font.render(num, True, color)
-                screen.blit(text, (col * CELL_SIZE + CELL_SIZE // 3, row * CELL_SIZE + CELL_SIZE // 4))
+                cells[(row, col)] = (num, color)
+            else:
+                cells[(row, col)] = None
+    return cells
 
 def draw_game_state(state, output_path, added_positions):
-    screen = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
-    screen.fill(WHITE)
-    draw_grid(screen)
-    draw_numbers(screen, state['current_board'], state['solution'], added_positions)
-    pygame.image.save(screen, output_path)
+    cells = number_cells(state['current_board'], state['solution'], added_positions)
+    screen = FRAMES.draw(frame_key('sudoku', output_path), (SCREEN_SIZE, SCREEN_SIZE), cells,
+                         lambda surface: surface.copy_from(blank_grid()), draw_cell)
+    return screen
 
 def extract_move(input_string):
     if input_string:
@@ -104,11 +118,10 @@ def is_valid_move(extracted_move):
 def active_move(previous_state, state):
     return previous_state != state
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current_state, step_states):
+def evaluate_moves(level, last_move, model_name, output_base_dir, step, current_state, step_states):
     results = []
 
     level_num = last_move['level']
-    level = json.loads(levels[0][level_num-1])
     # level = next(l for l in json.loads(levels[0]) if l['level'] == level_num)
     print(f"Processing model {model_name}, sudoku, level {level_num}, step {step}")
 
@@ -136,7 +149,7 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir, step, current
     image_path = os.path.join(image_dir, f"step_{step}.png")
     level_path = os.path.join(level_dir, f"level_{level_num}.jsonl")
 
-    draw_game_state(state, image_path, added_positions)
+    ARTIFACTS.draw(image_path, draw_game_state, copy.deepcopy(state), image_path, added_positions)
     save_game_state_to_file(state, level_path, level_num, step, extracted_move)
 
     is_active = active_move(previous_state, state)
@@ -165,29 +178,24 @@ def save_game_state_to_file(state, output_path, level, step, output):
         "step": step,
         "output": output
     }
-    
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    ARTIFACTS.append_jsonl(output_path, data)
 
-def main(last_move, output_dir_base, model_name, step, levels, current_level, step_states):    
+def main(last_move, output_dir_base, model_name, step, level, current_level, step_states):    
     if step > 1 and current_level is None:
         # Load the previous state from the process_levels file
         level_num = last_move['level']
         level_path = os.path.join(output_dir_base, "process_levels",  model_name, "sudoku", f"level_{level_num}.jsonl")
-        with open(level_path, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                if data['step'] == step - 1:
-                    current_level = {
-                        'position': data['position'],
-                        'solutions': data['solutions'],
-                        'clue_numbers': data['clue_numbers'],
-                        'current_board': data['current_board']
-                    }
-                    break
-
-    results, is_valid, updated_state = evaluate_moves(levels, last_move, model_name, output_dir_base, step, current_level, step_states)
+        for data in read_records(level_path):
+            if data['step'] == step - 1:
+                current_level = {
+                    'position': data['position'],
+                    'solutions': data['solutions'],
+                    'clue_numbers': data['clue_numbers'],
+                    'current_board': data['current_board']
+                }
+                break
+
+    results, is_valid, updated_state = evaluate_moves(level, last_move, model_name, output_dir_base, step, current_level, step_states)
 
     if not results:
         print("No valid results found.")
@@ -197,10 +205,8 @@ def main(last_move, output_dir_base, model_name, step, levels, current_level, st
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, f'level_{results[0]["level"]}.jsonl')
 
-    with open(eval_path, 'a') as f:
-        for result in results:
-            json.dump(result, f)
-            f.write('\n')
+    for result in results:
+        OUTPUTS.append(eval_path, result)
 
     return is_valid, updated_state
 
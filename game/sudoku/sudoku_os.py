@@ -1,13 +1,10 @@
-import pygame
 import sys
 import json
 import os
 import re
-
-# Initialize Pygame without display
-pygame.init()
-pygame.display.init()
-pygame.display.set_mode((1, 1))
+from game.render import FRAMES, frame_key, background
+from src.output_sink import OUTPUTS
+from src.solver.sudoku_solver import solve
 
 # Constants
 SCREEN_SIZE = 450
@@ -18,6 +15,13 @@ BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 RED = (255, 0, 0)
 
+def create_game_state(level):
+    return {
+        'position': level.position,
+        'solutions': level.solutions or solve(level.position),
+        'clue_numbers': level.clue_numbers,
+    }
+
 def extract_move(input_string):
     if input_string:
         # pattern = r'\{((?:[^{}]|\{[^{}]*\})*)\}'
@@ -61,11 +65,26 @@ def update_game_state(state, moves):
 def draw_grid(screen):
     for i in range(GRID_SIZE + 1):
         thickness = 3 if i % 3 == 0 else 1
-        pygame.draw.line(screen, BLACK, (i * CELL_SIZE, 0), (i * CELL_SIZE, SCREEN_SIZE), thickness)
-        pygame.draw.line(screen, BLACK, (0, i * CELL_SIZE), (SCREEN_SIZE, i * CELL_SIZE), thickness)
+        screen.line(BLACK, (i * CELL_SIZE, 0), (i * CELL_SIZE, SCREEN_SIZE), thickness)
+        screen.line(BLACK, (0, i * CELL_SIZE), (SCREEN_SIZE, i * CELL_SIZE), thickness)
+
+# The empty grid, drawn once and copied under every cell that changes
+def blank_grid():
+    return background('sudoku_grid', (SCREEN_SIZE, SCREEN_SIZE), draw_blank_grid)
+
+def draw_blank_grid(screen):
+    screen.fill(WHITE)
+    draw_grid(screen)
+
+def draw_cell(screen, position, cell):
+    row, col = position
+    screen.copy_from(blank_grid(), (col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    if cell:
+        num, color = cell
+        screen.text(num, 36, color, topleft=(col * CELL_SIZE + CELL_SIZE // 3, row * CELL_SIZE + CELL_SIZE // 4))
 
-def draw_numbers(screen, board, solution, added_positions):
-    font = pygame.font.Font(None, 36)
+def number_cells(board, solution, added_positions):
+    cells = {}
     for row in range(GRID_SIZE):
         for col in range(GRID_SIZE):
             num = board[row * GRID_SIZE + col]
@@ -74,15 +93,16 @@ def draw_numbers(screen, board, solution, added_positions):
                     color = BLUE if num == solution[row * GRID_SIZE + col] else RED
                 else:
                     color = BLACK
-                text = font.render(num, True, color)
-                screen.blit(text, (col * CELL_SIZE + CELL_SIZE // 3, row * CELL_SIZE + CELL_SIZE // 4))
+                cells[(row, col)] = (num, color)
+            else:
+                cells[(row, col)] = None
+    return cells
 
 def draw_game_state(state, output_path, added_positions):
-    screen = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
-    screen.fill(WHITE)
-    draw_grid(screen)
-    draw_numbers(screen, state['position'], state['solutions'], added_positions)
-    pygame.image.save(screen, output_path)
+    cells = number_cells(state['position'], state['solutions'], added_positions)
+    screen = FRAMES.draw(frame_key('sudoku', output_path), (SCREEN_SIZE, SCREEN_SIZE), cells,
+                         lambda surface: surface.copy_from(blank_grid()), draw_cell)
+    screen.save(output_path)
 
 def is_valid_move(extracted_moves):
     valid_moves = {}
@@ -108,19 +128,17 @@ def save_game_state_to_file(state, output_path, level, output):
         "output": output
     }
     
-    with open(output_path, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    OUTPUTS.append(output_path, data)
 
 def validate_solution(board, solution):
     return board == solution
 
-def evaluate_moves(levels, last_move, model_name, output_base_dir):
+def evaluate_moves(level, last_move, model_name, output_base_dir):
     is_active = 0.0
     level_num = last_move['level']
     print(f"Processing model {model_name}, sudoku, level {level_num}")
 
-    state = json.loads(levels[0][level_num-1])
+    state = create_game_state(level)
 
     extracted_move = extract_move(last_move['output'])
     if extracted_move:
@@ -153,13 +171,12 @@ def evaluate_moves(levels, last_move, model_name, output_base_dir):
     return result
 
 
-def main(move, output_dir_base, model_name, levels):
-    result = evaluate_moves(levels, move, model_name, output_dir_base)
+def main(move, output_dir_base, model_name, level):
+    result = evaluate_moves(level, move, model_name, output_dir_base)
 
     eval_dir = os.path.join(output_dir_base, "eval",  model_name, )
     os.makedirs(eval_dir, exist_ok=True)
     eval_path = os.path.join(eval_dir, "sudoku.jsonl")
 
-    with open(eval_path, 'a') as f:
-        json.dump(result, f)
-        f.write('\n')
\ No newline at end of file
+    OUTPUTS.append(eval_path, result)
+    return result
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os
+import atexit
+import queue
+import threading
+from collections import Counter, OrderedDict
+
+from src.config import WRITE_ARTIFACTS, ARTIFACT_BATCH_SIZE, MAX_BUFFERED_FRAMES, IMAGE_COMPRESS_LEVEL
+from src.images import EncodedImage, encode_png
+from src.output_sink import OUTPUTS
+
+
+class ArtifactWriter:
+    """Write the per-step process_images/process_levels files on a background thread.
+
+    Game modules hand over a finished snapshot of the state, so the step loop never
+    waits on drawing or the disk. JSONL records go to the run-wide OUTPUTS sink.
+
+    ``call_after`` queues work behind the files (e.g. a level's checkpoint, which must not get
+    ahead of the step images a resume reads).
+
+    Every step image is PNG-encoded once. In the image modes (``keep_images``) the bytes
+    stay in memory until the next step picks them up with ``take_image``; the file is only
+    written when artifacts are enabled or the model reads image files itself (``image_files``),
+    or when more than ``max_frames`` frames are waiting and the oldest is moved to disk.
+
+    enabled=False skips the process_levels files and images for throughput runs.
+    """
+
+    def __init__(self, enabled=WRITE_ARTIFACTS, batch_size=ARTIFACT_BATCH_SIZE, max_frames=MAX_BUFFERED_FRAMES):
+        self.enabled = enabled
+        self.keep_images = False
+        self.write_images = enabled
+        self.compress_level = IMAGE_COMPRESS_LEVEL
+        self.max_size = None
+        self.batch_size = batch_size
+        self.max_frames = max_frames
+        self.queue = queue.Queue()
+        self.pending = Counter()   # path -> writes still queued
+        self.frames = OrderedDict()   # path -> PNG bytes not yet taken
+        self.written = threading.Condition()
+        self.thread = None
+        self._pid = None
+
+    def configure(self, enabled, keep_images=False, compress_level=IMAGE_COMPRESS_LEVEL, max_size=None, image_files=False):
+        self.enabled = enabled
+        self.keep_images = keep_images
+        self.write_images = enabled or image_files
+        self.compress_level = compress_level
+        self.max_size = max_size
+
+    def _submit(self, path, kind, payload):
+        # Pool workers inherit the writer but not its thread; each process starts its own
+        if self.thread is None or self._pid != os.getpid():
+            self.queue = queue.Queue()
+            self.pending = Counter()
+            self.frames = OrderedDict()
+            self.written = threading.Condition()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self._pid = os.getpid()
+            self.thread.start()
+        with self.written:
+            self.pending[path] += 1
+        self.queue.put((path, kind, payload))
+
+    def draw(self, path, draw_func, *args):
+        """Run ``draw_func(*args)``, which returns the canvas of the image at ``path``; args must not change afterwards."""
+        if self.keep_images or self.write_images:
+            self._submit(path, 'draw', (draw_func, args))
+
+    def write_text(self, path, text):
+        if self.enabled:
+            self._submit(path, 'text', text)
+
+    def call_after(self, path, func, *args):
+        """Run ``func(*args)`` on the writer thread once everything submitted before it has been written."""
+        self._submit(path, 'call', (func, args))
+
+    def append_jsonl(self, path, record):
+        if self.enabled:
+            OUTPUTS.append(path, record)
+
+    def wait_for(self, path):
+        with self.written:
+            while path in self.pending:
+                self.written.wait()
+
+    def take_image(self, path):
+        """The image drawn for ``path`` as an EncodedImage, or just ``path`` if it isn't held in memory
+        (e.g. it was drawn before a resume)."""
+        self.wait_for(path)
+        with self.written:
+            data = self.frames.pop(path, None)
+        return path if data is None else EncodedImage(path, data)
+
+    def flush(self):
+        if self.thread is None or self._pid != os.getpid():
+            return
+        with self.written:
+            while self.pending:
+                self.written.wait()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            with self.written:
+                self.pending.subtract(path for path, _, _ in batch)
+                self.pending += Counter()  # drop paths with nothing left to write
+                self.written.notify_all()
+
+    def _write(self, batch):
+        for path, kind, payload in batch:
+            try:
+                if kind == 'draw':
+                    draw_func, args = payload
+                    self._store_image(path, draw_func(*args))
+                elif kind == 'call':
+                    func, args = payload
+                    func(*args)
+                else:
+                    with open(path, 'w') as f:
+                        f.write(payload)
+            except Exception as e:
+                print(f"Error writing {path}: {e!r}")
+
+    def _store_image(self, path, canvas):
+        data = encode_png(canvas.to_image(), self.compress_level, self.max_size)
+        evicted = []
+        if self.keep_images:
+            with self.written:
+                self.frames[path] = data
+                # Frames are usually taken right away. Past the limit the oldest go to disk (if they
+                # aren't written anyway), pending until then so take_image waits for the file.
+                while len(self.frames) > self.max_frames:
+                    evicted.append(self.frames.popitem(last=False))
+                    if not self.write_images:
+                        self.pending[evicted[-1][0]] += 1
+        if self.write_images:
+            self._write_image(path, data)
+            return
+        for old_path, old_data in evicted:
+            try:
+                self._write_image(old_path, old_data)
+            except Exception as e:
+                print(f"Error writing {old_path}: {e!r}")
+        if evicted:
+            with self.written:
+                self.pending.subtract(old_path for old_path, _ in evicted)
+                self.pending += Counter()
+                self.written.notify_all()
+
+    def _write_image(self, path, data):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+# Shared by the multi-step game modules
+ARTIFACTS = ArtifactWriter()
+# game.render registers it again after importing a drawing backend, so it runs before pygame shuts down
+atexit.register(ARTIFACTS.flush)
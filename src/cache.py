@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+from src.config import RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TOUCH_BATCH, COMPLETION_CACHE_PATH
+from src.images import image_bytes
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request was never answered before."""
+
+
+class ResponseCache:
+    """Model responses in a single SQLite file, keyed by a hash of every input.
+
+    Modes:
+        readwrite: serve hits, store new responses, evict least recently used
+                   entries once the store grows past ``max_bytes``. Access times of
+                   hits are written every ``touch_batch`` hits, with the next
+                   stored response, or on close (a pool worker's last few may be
+                   lost, which only shifts what is evicted first).
+        replay:    read-only; a miss raises ``CacheMiss`` instead of calling the model.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES, mode='readwrite', touch_batch=RESPONSE_CACHE_TOUCH_BATCH):
+        if mode not in ('readwrite', 'replay'):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.touch_batch = touch_batch
+        self._conn = None
+        self._pid = None
+        self._size = 0
+        self._touched = {}   # key -> access time not yet written
+
+    def __getstate__(self):
+        # Connections can't cross processes; each worker opens its own
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        state['_touched'] = {}
+        return state
+
+    def _connect(self):
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        # Hits recorded before a fork are written by the parent
+        self._touched = {}
+        if self.mode == 'replay':
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._conn.commit()
+            self._size = self._total_size()
+        self._pid = os.getpid()
+        return self._conn
+
+    def _total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name, system_prompt, prompt, image_path, temperature):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([model_name, system_prompt, prompt, float(temperature)]).encode('utf-8'))
+        if image_path and image_path != "Null":
+            digest.update(image_bytes(image_path))
+        return digest.hexdigest()
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            if self.mode == 'replay':
+                raise CacheMiss(key)
+            return None
+        if self.mode == 'readwrite':
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._write_touched()
+                conn.commit()
+        return row[0]
+
+    def _write_touched(self):
+        # Uncommitted; the caller commits them with its own writes
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                   [(last_access, key) for key, last_access in self._touched.items()])
+            self._touched = {}
+
+    def put(self, key, response):
+        if self.mode == 'replay':
+            return
+        conn = self._connect()
+        size = len(response.encode('utf-8'))
+        self._write_touched()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, response, size, time.time())
+        )
+        conn.commit()
+        self._size += size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # Other workers write too, so recount before deciding how much to drop
+        conn = self._conn
+        self._size = self._total_size()
+        target = int(self.max_bytes * 0.9)
+        if self._size <= target:
+            return
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._size - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        conn.commit()
+        self._size -= freed
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            if self.mode == 'readwrite':
+                self._write_touched()
+                self._conn.commit()
+            self._conn.close()
+        self._conn = None
+
+
+class CompletionCache:
+    """Completion degrees of final states in a SQLite file, keyed by a hash of the game, its solver version and the canonical state.
+
+    A solve that ran out of time is stored as unknown (NULL) with the time it was given, and is
+    only retried by a run that allows more.
+    """
+
+    def __init__(self, path=COMPLETION_CACHE_PATH):
+        self.path = path
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS degrees ("
+                "key TEXT PRIMARY KEY, game TEXT NOT NULL, degree REAL, timeout REAL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(game, version, state, settings=None):
+        # ``settings`` are the solver budgets the degree was computed under
+        return hashlib.sha256(json.dumps([game, version, state, settings]).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys, timeout):
+        """{key: degree, or None if unknown} for the keys with an entry a solve under ``timeout`` couldn't improve."""
+        conn = self._connect()
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, degree, timeout FROM degrees WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, degree, solved_timeout in rows:
+                if degree is not None or (timeout is not None and solved_timeout >= timeout):
+                    found[key] = degree
+        return found
+
+    def put_many(self, entries):
+        """Store (key, game, degree or None, timeout) entries."""
+        conn = self._connect()
+        conn.executemany("INSERT OR REPLACE INTO degrees (key, game, degree, timeout) VALUES (?, ?, ?, ?)", entries)
+        conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
@@ -83,4 +83,79 @@ OUTPUT_TEXT_OS_DIR = "outputs/one_step/text_only"
 OUTPUT_IMAGE_BASE_DIR = "outputs/multi_step/image_text/base"
 OUTPUT_IMAGE_HIS_DIR = "outputs/multi_step/image_text/history"
 OUTPUT_TEXT_BASE_DIR = "outputs/multi_step/text_only/base"
-OUTPUT_TEXT_HIS_DIR = "outputs/multi_step/text_only/history"
\ No newline at end of file
+OUTPUT_TEXT_HIS_DIR = "outputs/multi_step/text_only/history"
+
+# Retries and rate limiting for API models
+MAX_RETRIES = 8
+RETRY_BASE_DELAY = 1.0           # seconds, doubled on every retry
+RETRY_MAX_DELAY = 60.0           # seconds, cap for a single backoff
+CIRCUIT_FAILURE_THRESHOLD = 5    # consecutive failures before the breaker opens
+CIRCUIT_RESET_TIMEOUT = 30.0     # seconds the breaker stays open
+CIRCUIT_PROBE_POLL = 1.0         # seconds between checks while another request probes a half-open breaker
+
+# Response cache for model inference
+RESPONSE_CACHE_PATH = "outputs/cache/responses.sqlite"
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 ** 3   # least recently used entries are evicted past this size
+RESPONSE_CACHE_TOUCH_BATCH = 100   # hits whose access times are written in one commit
+
+# Batched inference for local models (qwen_vl_chat, blip2)
+LOCAL_MAX_BATCH_SIZE = 8         # requests per generate call, halved on out-of-memory
+LOCAL_BATCH_MAX_WAIT = 0.05      # seconds to wait for a batch to fill
+
+# Conversation history for the history modes (None = unlimited)
+HISTORY_MAX_TOKENS = None        # drop the oldest steps past this budget
+HISTORY_WINDOW = None            # steps kept verbatim; older ones are summarized in one line
+
+# Prompt templates
+PROMPTS_DIR = "prompts"
+PROMPT_TOKEN_ENCODING = "o200k_base"   # tiktoken encoding used to count prompt tokens, if installed
+
+# Parsed levels are pickled here and reused while the levels files are unchanged (None to disable)
+LEVEL_SNAPSHOT_DIR = "outputs/cache/levels"
+
+# Base64 payloads of the level images sent in one-step and first multi-step prompts, memory-mapped
+# and rebuilt when an image's content hash changes (None to encode the files on every call)
+LEVEL_IMAGE_CACHE_DIR = "outputs/cache/level_images"
+
+# process_images/process_levels files written by the multi-step game modules
+WRITE_ARTIFACTS = True           # False skips them (images are still drawn for the image modes)
+ARTIFACT_BATCH_SIZE = 64         # queued writes handled per batch by the writer thread
+MAX_BUFFERED_FRAMES = 256        # encoded step images held in memory for the next step of image modes
+
+# JSONL streams under outputs/ (models/, eval/, process_levels/), written by one run-wide writer
+OUTPUT_COMPRESSION = None        # None (.jsonl), "gzip" (.jsonl.gz) or "zstd" (.jsonl.zst, needs zstandard)
+OUTPUT_BATCH_SIZE = 256          # queued records handled per batch by the writer thread
+OUTPUT_FSYNC_INTERVAL = 5.0      # seconds between fsyncs of the open streams
+MAX_OPEN_STREAMS = 512           # file handles the writer keeps open
+
+# Drawing backend for the game images: "numpy" (NumPy/Pillow) or "pygame"; both give the same pixels
+RENDER_BACKEND = "numpy"
+GLYPH_ATLAS_DIR = "game/assets"  # pre-rendered text for the numpy backend, built by game/render_pygame.py
+
+# PNG encoding of the images sent to the models; inferencers may override these per model
+IMAGE_COMPRESS_LEVEL = 6         # zlib level 0-9
+IMAGE_MAX_SIZE = None            # (width, height) to shrink larger images to, or None
+
+# Sokoban completion search; past either budget the solver reports its best lower bound on the moves left
+SOKOBAN_MAX_NODES = 200000       # pushes expanded per state
+SOKOBAN_TIME_LIMIT = 5.0         # seconds per state
+
+# n_puzzle completion search (IDA*), with the same lower-bound fallback
+N_PUZZLE_MAX_NODES = 2000000     # nodes expanded per state
+N_PUZZLE_TIME_LIMIT = 5.0        # seconds per state
+N_PUZZLE_PDB_DIR = "outputs/cache/n_puzzle_pdb"   # optional 4x4 pattern databases, built by python -m src.solver.n_puzzle_solver
+
+# Version of each game's solver; bump it when the solver's answers change, so cached degrees are solved again
+SOLVER_VERSIONS = {
+    'maze': 2,
+    'sokoban': 2,
+    'n_queens': 2,
+    'n_puzzle': 1,
+    'hanoi': 2,
+    'sudoku': 1,
+}
+
+# Completion degrees: each distinct final state is solved once, over a process pool, and cached by game, solver version and state
+COMPLETION_CACHE_PATH = "outputs/cache/completion.sqlite"   # None to solve every state on every run
+COMPLETION_PROCESSES = None      # solver processes, None for one per CPU
+COMPLETION_TIMEOUT = 60.0        # seconds per state before its degree is reported unknown (None = no limit)
@@ -0,0 +1,36 @@
+import asyncio
+
+
+class AsyncEngine:
+    """Drive many level coroutines from one process with a bounded number in flight.
+
+    Mirrors ``Pool.starmap``: ``engine.starmap(process_level_async, args_list)``
+    returns the results in the order of ``args_list``. If ``callback`` is given it
+    is called as ``callback(args, result)`` as soon as each item finishes.
+    """
+
+    def __init__(self, concurrency: int = 64):
+        self.concurrency = concurrency
+        # A single loop for the engine's lifetime keeps the inferencer's shared
+        # async client (and its connection pool) bound to one loop.
+        self.loop = asyncio.new_event_loop()
+
+    def starmap(self, func, args_list, callback=None):
+        return self.loop.run_until_complete(self._gather(func, args_list, callback))
+
+    async def _gather(self, func, args_list, callback):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(args):
+            async with semaphore:
+                result = await func(*args)
+            if callback:
+                callback(args, result)
+            return result
+
+        return await asyncio.gather(*(run(args) for args in args_list))
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
@@ -0,0 +1,40 @@
+import io
+import base64
+from functools import cached_property
+
+from src.config import IMAGE_COMPRESS_LEVEL
+
+
+class EncodedImage(str):
+    """An image path that also carries the PNG bytes, so the image never has to be read back from disk.
+
+    It compares and prints as the path, so code that only needs the path (logs, local models
+    reading the file) is unaffected; the file itself may not exist when artifacts are disabled.
+    """
+
+    def __new__(cls, path, data):
+        image = super().__new__(cls, path)
+        image.data = data
+        return image
+
+    @cached_property
+    def base64(self):
+        return base64.b64encode(self.data).decode('utf-8')
+
+
+def encode_png(image, compress_level=IMAGE_COMPRESS_LEVEL, max_size=None):
+    """PNG bytes for a PIL image, shrunk to fit within ``max_size`` (width, height) if given."""
+    if max_size and (image.width > max_size[0] or image.height > max_size[1]):
+        image = image.copy()
+        image.thumbnail(max_size)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def image_bytes(image_path):
+    """The encoded bytes of an image given as a path or an EncodedImage."""
+    if isinstance(image_path, EncodedImage):
+        return image_path.data
+    with open(image_path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,158 @@
+import os
+import glob
+import json
+import mmap
+import base64
+import hashlib
+import threading
+from functools import cached_property
+
+from PIL import Image
+
+from src.config import GAMES, LEVEL_IMAGE_CACHE_DIR
+from src.images import EncodedImage
+
+INDEX_FILE = 'index.json'
+
+
+class LevelImage(EncodedImage):
+    """A level image whose base64 payload comes from the cache; the PNG bytes are only decoded if asked for."""
+
+    def __new__(cls, path, payload, size):
+        image = str.__new__(cls, path)
+        image.base64 = payload
+        image.size = size   # (width, height) of the original file, which is sent unchanged
+        return image
+
+    @cached_property
+    def data(self):
+        return base64.b64decode(self.base64)
+
+
+def level_image_paths():
+    paths = []
+    for game in GAMES:
+        paths += glob.glob(game["level_image_path"].format('*'))
+    return sorted(paths)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class LevelImageCache:
+    """Base64 payloads of every level image, in one memory-mapped file with a JSON index.
+
+    Each index entry records the content hash of its image. On load, an image whose
+    mtime or size changed is hashed again, and any changed, new or removed image
+    rebuilds the cache, so the payloads always match the files. Load the cache before
+    forking workers and they share both the pages and the index.
+    """
+
+    def __init__(self, cache_dir=LEVEL_IMAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index = None     # path -> {"sha256", "signature", "offset", "length", "size"}
+        self.payloads = None  # mmap of the payload file
+        self.images = {}      # path -> LevelImage
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """The level image at ``path`` as a LevelImage, or ``path`` itself if it isn't cached."""
+        if not self.cache_dir:
+            return path
+        image = self.images.get(path)
+        if image is not None:
+            return image
+        self.load()
+        entry = self.index.get(path)
+        if entry is None:
+            return path
+        offset, length = entry["offset"], entry["length"]
+        image = LevelImage(path, self.payloads[offset:offset + length].decode('ascii'), tuple(entry["size"]))
+        self.images[path] = image
+        return image
+
+    def load(self):
+        with self.lock:
+            if self.index is not None:
+                return
+            index, payload_file = self._read_index()
+            if index is None:
+                index, payload_file = self._build()
+            with open(os.path.join(self.cache_dir, payload_file), 'rb') as f:
+                self.payloads = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if index else b''
+            self.index = index
+
+    # The stored index, if it still describes every level image on disk
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), 'r') as f:
+                stored = json.load(f)
+            index, payload_file = stored["images"], stored["payloads"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+        if sorted(index) != level_image_paths() or not os.path.exists(os.path.join(self.cache_dir, payload_file)):
+            return None, None
+        touched = False
+        for path, entry in index.items():
+            signature = _file_signature(path)
+            if signature == entry["signature"]:
+                continue
+            # e.g. a fresh checkout; only the content decides
+            if _file_hash(path) != entry["sha256"]:
+                return None, None
+            entry["signature"] = signature
+            touched = True
+        if touched:
+            self._write_index(index, payload_file)
+        return index, payload_file
+
+    def _build(self):
+        index = {}
+        chunks = []
+        offset = 0
+        for path in level_image_paths():
+            with open(path, 'rb') as f:
+                data = f.read()
+            with Image.open(path) as image:
+                size = list(image.size)
+            payload = base64.b64encode(data)
+            index[path] = {"sha256": hashlib.sha256(data).hexdigest(), "signature": _file_signature(path),
+                           "offset": offset, "length": len(payload), "size": size}
+            chunks.append(payload)
+            offset += len(payload)
+        content = b''.join(chunks)
+        # Named by content, so processes still mapping an older file are unaffected by a rebuild
+        payload_file = f"payloads-{hashlib.sha256(content).hexdigest()[:16]}.b64"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload_path = os.path.join(self.cache_dir, payload_file)
+        if not os.path.exists(payload_path):
+            tmp_path = f"{payload_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, payload_path)
+        self._write_index(index, payload_file)
+        for stale in glob.glob(os.path.join(self.cache_dir, 'payloads-*.b64')):
+            if stale != payload_path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        return index, payload_file
+
+    def _write_index(self, index, payload_file):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"payloads": payload_file, "images": index}, f)
+        os.replace(tmp_path, index_path)
+
+
+# Shared by the one-step and multi-step inference code
+LEVEL_IMAGES = LevelImageCache()
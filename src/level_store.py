@@ -0,0 +1,180 @@
+import os
+import json
+import pickle
+from dataclasses import dataclass
+
+from src.config import GAMES, LEVEL_SNAPSHOT_DIR
+
+
+@dataclass(frozen=True, slots=True)
+class GridLevel:
+    """A maze or sokoban level."""
+    level: int
+    rows: tuple     # non-empty lines of the level, as the game modules draw them
+    text: str       # the level as shown in text prompts
+
+
+# The JSON games' levels, decoded once; records are shared by every step and worker, so game
+# modules copy what they change (create_game_state)
+@dataclass(frozen=True, slots=True)
+class HanoiLevel:
+    level: int
+    disks: int
+    position: dict  # rod -> tuple of disks, bottom to top
+    text: str
+
+    @classmethod
+    def from_record(cls, data):
+        position = {rod: tuple(disks) for rod, disks in data["position"].items()}
+        return cls(data["level"], data["disks"], position, json.dumps(data["position"]))
+
+
+@dataclass(frozen=True, slots=True)
+class NPuzzleLevel:
+    level: int
+    n: int
+    position: tuple  # rows of tiles, 0 for the blank
+    text: str
+
+    @classmethod
+    def from_record(cls, data):
+        return cls(data["level"], data["n"], tuple(tuple(row) for row in data["position"]), json.dumps(data["position"]))
+
+
+@dataclass(frozen=True, slots=True)
+class NQueensLevel:
+    level: int
+    board_size: int
+    position: tuple  # (row, col) of the first queen
+    text: str
+
+    @classmethod
+    def from_record(cls, data):
+        return cls(data["level"], data["board_size"], tuple(data["position"]), json.dumps(data["position"]))
+
+
+@dataclass(frozen=True, slots=True)
+class SudokuLevel:
+    level: int
+    position: str       # 81 digits, 0 for an empty cell
+    solutions: str      # None if the file has none; the sudoku solver fills it in
+    clue_numbers: int
+    text: str
+
+    @classmethod
+    def from_record(cls, data):
+        return cls(data["level"], data["position"], data.get("solutions"), data.get("clue_numbers"), json.dumps(data["position"]))
+
+
+JSON_LEVELS = {
+    'hanoi': HanoiLevel,
+    'n_puzzle': NPuzzleLevel,
+    'n_queens': NQueensLevel,
+    'sudoku': SudokuLevel,
+}
+
+
+class LevelStore:
+    """Every level of one game, parsed once and indexed by level number."""
+
+    def __init__(self, game_name, path, records):
+        self.game_name = game_name
+        self.path = path
+        self.records = records
+
+    def get(self, level):
+        return self.records[level]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    # Pickled by name, so Pool tasks carry no records and workers use the store they inherited
+    def __reduce__(self):
+        return level_store, (self.game_name,)
+
+
+def parse_grid_levels(path):
+    with open(path, 'r') as f:
+        data = f.read()
+    records = {}
+    for block in data.split(';'):
+        # The first line of a block is the level number, the rest is the level
+        level_info = block.strip().split('\n')
+        if not level_info[0].strip():
+            continue
+        level = int(level_info[0])
+        rows = tuple(line for line in block.split('\n')[1:] if line)
+        records[level] = GridLevel(level, rows, '\n'.join(level_info[1:]))
+    return records
+
+
+def parse_json_levels(path, game_name):
+    level_type = JSON_LEVELS[game_name]
+    records = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            records[data["level"]] = level_type.from_record(data)
+    return records
+
+
+def _snapshot_path(game_name):
+    return os.path.join(LEVEL_SNAPSHOT_DIR, f"{game_name}.pkl")
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Pickled store from an earlier run, if its levels file hasn't changed since
+def _load_snapshot(game_name, path):
+    snapshot_path = _snapshot_path(game_name)
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, 'rb') as f:
+            signature, snapshot_levels_path, records = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError):
+        return None
+    if signature != _file_signature(path) or snapshot_levels_path != path:
+        return None
+    return LevelStore(game_name, path, records)
+
+
+def _save_snapshot(store):
+    snapshot_path = _snapshot_path(store.game_name)
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((_file_signature(store.path), store.path, store.records), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+_stores = {}
+
+
+def load_level_store(game):
+    """The LevelStore for a GAMES entry, parsed once per process (and snapshotted if LEVEL_SNAPSHOT_DIR is set)."""
+    game_name, path = game["name"], game["levels_path"]
+    store = _stores.get(game_name)
+    if store is not None:
+        return store
+    if LEVEL_SNAPSHOT_DIR:
+        store = _load_snapshot(game_name, path)
+    if store is None:
+        records = parse_json_levels(path, game_name) if path.endswith('.jsonl') else parse_grid_levels(path)
+        store = LevelStore(game_name, path, records)
+        if LEVEL_SNAPSHOT_DIR:
+            _save_snapshot(store)
+    _stores[game_name] = store
+    return store
+
+
+def level_store(game_name):
+    return load_level_store(next(game for game in GAMES if game["name"] == game_name))
@@ -1,78 +1,285 @@
+import os
+import sys
+import time
+import queue
 import torch
 import base64
-from transformers import AutoModelForCausalLM, AutoTokenizer, Blip2Processor, Blip2ForConditionalGeneration, BitsAndBytesConfig
+import asyncio
+import threading
+import tempfile
+from concurrent.futures import Future
+from transformers import AutoModelForCausalLM, AutoTokenizer, Blip2Processor, Blip2ForConditionalGeneration
 from PIL import Image
 from abc import ABC, abstractmethod
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import google.generativeai as genai
+from src.retry import SCHEDULER
+from src.config import LOCAL_MAX_BATCH_SIZE, LOCAL_BATCH_MAX_WAIT, IMAGE_COMPRESS_LEVEL, IMAGE_MAX_SIZE
+from src.images import EncodedImage, encode_png
+
+
+def sampling_kwargs(temperature: float):
+    # Temperature 0 means greedy decoding, as it does for the API models
+    if temperature > 0:
+        return {'do_sample': True, 'temperature': temperature}
+    return {'do_sample': False}
+
+
+class LocalBatchServer:
+    """Collect requests from every level and answer them with padded batch ``generate`` calls.
+
+    One worker thread owns the model. It takes whatever is queued (up to
+    ``batch_size`` requests, waiting at most ``max_wait`` seconds for more to
+    arrive) and runs it through ``generate_batch``. When a batch runs out of
+    memory, ``batch_size`` is halved and the batch is retried. It grows back
+    towards ``max_batch_size`` after a run of successful batches.
+    """
+
+    def __init__(self, generate_batch, max_batch_size=LOCAL_MAX_BATCH_SIZE, max_wait=LOCAL_BATCH_MAX_WAIT):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.successes = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request) -> Future:
+        future = Future()
+        self.requests.put((request, future))
+        return future
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def _next_batch(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.requests.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self.requests.put(None)  # finish this batch, stop on the next one
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # Requests in one generate call must share the sampling settings
+            by_temperature = {}
+            for request, future in batch:
+                by_temperature.setdefault(request[3], []).append((request, future))
+            for group in by_temperature.values():
+                self._generate(group)
+
+    def _generate(self, group):
+        while group:
+            chunk, group = group[:self.batch_size], group[self.batch_size:]
+            try:
+                responses = self.generate_batch([request for request, _ in chunk])
+            except torch.cuda.OutOfMemoryError as e:
+                torch.cuda.empty_cache()
+                self.successes = 0
+                if len(chunk) == 1:
+                    chunk[0][1].set_exception(e)
+                    continue
+                self.batch_size = max(1, len(chunk) // 2)
+                print(f"Out of memory with {len(chunk)} requests per batch, retrying with {self.batch_size}")
+                group = chunk + group
+                continue
+            except Exception as e:
+                for _, future in chunk:
+                    future.set_exception(e)
+                continue
+            for (_, future), response in zip(chunk, responses):
+                future.set_result(response)
+            self.successes += 1
+            if self.successes >= 8 and self.batch_size < self.max_batch_size:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+                self.successes = 0
+
 
 class ModelInferencer(ABC):
-    
+    # fp16 on GPU, fp32 on CPU-only machines
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    # Step images are encoded once with these settings; local models open them from disk
+    image_compress_level = IMAGE_COMPRESS_LEVEL
+    image_max_size = IMAGE_MAX_SIZE
+    reads_image_files = True
+
     @abstractmethod
     def load_model(self):
         pass
 
     @abstractmethod
-    def infer(self, prompt: str, image_path: str) -> str:
+    def generate_batch(self, requests) -> list:
+        """Answer a list of (system_prompt, prompt, image_path, temperature) requests in one pass."""
         pass
 
+    # The batch server is created on first use, in the process that runs inference
+    _server_lock = threading.Lock()
+
+    def _server(self):
+        with self._server_lock:
+            if getattr(self, 'server', None) is None:
+                self.server = LocalBatchServer(self.generate_batch)
+            return self.server
+
+    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
+        return self._server().submit((system_prompt, prompt, image_path, float(temperature))).result()
+
+    async def ainfer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
+        future = self._server().submit((system_prompt, prompt, image_path, float(temperature)))
+        return await asyncio.wrap_future(future)
+
+    def __getstate__(self):
+        # The server's thread and queue stay with the process that owns the model
+        state = self.__dict__.copy()
+        state.pop('server', None)
+        return state
+
     def cleanup(self):
+        if getattr(self, 'server', None) is not None:
+            self.server.stop()
+            self.server = None
         if hasattr(self, 'model'):
             del self.model
         if hasattr(self, 'tokenizer'):
             del self.tokenizer
         elif hasattr(self, 'processor'):
             del self.processor
-        torch.cuda.empty_cache()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
 
 class QwenVLChatInferencer(ModelInferencer):
-    def load_model(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen-VL-Chat-Int4", trust_remote_code=True)
-        self.model = AutoModelForCausalLM.from_pretrained("Qwen/Qwen-VL-Chat-Int4", device_map="cuda", trust_remote_code=True).eval()
+    # The Int4 checkpoint needs a GPU; CPU-only machines load the full model in fp32
+    model_id = "Qwen/Qwen-VL-Chat-Int4" if torch.cuda.is_available() else "Qwen/Qwen-VL-Chat"
 
-    def infer(self, prompt: str, image_path: str) -> str:
-        if image_path == "Null":
-            query = prompt
+    def load_model(self):
+        # Left padding so every prompt in a batch ends right where generation starts
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_id, pad_token='<|endoftext|>', padding_side='left', trust_remote_code=True)
+        if self.device == "cuda":
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_id, device_map="cuda", trust_remote_code=True).eval()
         else:
-            query = self.tokenizer.from_list_format([
-                {'image': image_path},
-                {'text': prompt},
-            ])
-        response, _ = self.model.chat(self.tokenizer, query=query, history=None, max_new_tokens=20)
-        return response
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_id, device_map="cpu", fp32=True, trust_remote_code=True).eval()
+
+    def generate_batch(self, requests) -> list:
+        # make_context/decode_tokens ship with the model's remote code; model.chat uses them for one query
+        qwen = sys.modules[type(self.model).__module__]
+        generation_config = self.model.generation_config
+        raw_texts = []
+        for system_prompt, prompt, image_path, _ in requests:
+            if image_path == "Null":
+                query = prompt
+            else:
+                query = self.tokenizer.from_list_format([
+                    {'image': image_path},
+                    {'text': prompt},
+                ])
+            raw_text, _ = qwen.make_context(
+                self.tokenizer, query, system=system_prompt or "You are a helpful assistant.",
+                max_window_size=generation_config.max_window_size, chat_format=generation_config.chat_format,
+            )
+            raw_texts.append(raw_text)
+        inputs = self.tokenizer(raw_texts, padding='longest', return_tensors='pt').to(self.model.device)
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                inputs.input_ids, attention_mask=inputs.attention_mask, generation_config=generation_config,
+                stop_words_ids=qwen.get_stop_words_ids(generation_config.chat_format, self.tokenizer),
+                pad_token_id=self.tokenizer.pad_token_id, max_new_tokens=20, return_dict_in_generate=False,
+                **sampling_kwargs(requests[0][3]),
+            )
+        responses = []
+        for i, raw_text in enumerate(raw_texts):
+            padding = inputs.input_ids[i].eq(self.tokenizer.pad_token_id).sum().item()
+            responses.append(qwen.decode_tokens(
+                outputs[i][padding:], self.tokenizer, raw_text_len=len(raw_text),
+                context_length=inputs.input_ids.size(1) - padding, chat_format=generation_config.chat_format,
+                verbose=False, errors='replace',
+            ))
+        return responses
 
 class BLIP2Inferencer(ModelInferencer):
+    model_id = "Salesforce/blip2-opt-2.7b"
+
     def load_model(self):
         self.processor = Blip2Processor.from_pretrained("Salesforce/blip2-opt-2.7b")
-        quantization_config = BitsAndBytesConfig(load_in_8bit=True)
-        self.model = Blip2ForConditionalGeneration.from_pretrained("Salesforce/blip2-opt-2.7b", device_map="auto")
+        self.processor.tokenizer.padding_side = 'left'
+        self.model = Blip2ForConditionalGeneration.from_pretrained(
+            "Salesforce/blip2-opt-2.7b", torch_dtype=self.dtype, device_map="auto" if self.device == "cuda" else None
+        ).eval()
 
-    def infer(self, prompt: str, image_path: str) -> str:
-        image_path = "prompts/blank.png"
-        raw_image = Image.open(image_path).convert('RGB')
-        inputs = self.processor(raw_image, prompt, return_tensors="pt").to("cuda", torch.float16)
+    def generate_batch(self, requests) -> list:
+        # BLIP2 is always shown a blank image
+        raw_image = Image.open("prompts/blank.png").convert('RGB')
+        prompts = [f"{system_prompt}\n{prompt}" if system_prompt else prompt for system_prompt, prompt, _, _ in requests]
+        inputs = self.processor(images=[raw_image] * len(prompts), text=prompts, padding=True, return_tensors="pt")
+        inputs = inputs.to(self.model.device, self.dtype)
         with torch.inference_mode():
-            generation = self.model.generate(**inputs, max_new_tokens=300)
-            result = self.processor.decode(generation[0], skip_special_tokens=True).strip()
-        return result
+            generation = self.model.generate(**inputs, max_new_tokens=300, **sampling_kwargs(requests[0][3]))
+        return [result.strip() for result in self.processor.batch_decode(generation, skip_special_tokens=True)]
 
 
 class APIInferencer(ABC):
-    @abstractmethod
-    def infer(self, prompt: str, image_path: str) -> str:
-        pass
+    model_id = None
+    # Step images are encoded once with these settings and sent without touching the disk
+    image_compress_level = IMAGE_COMPRESS_LEVEL
+    image_max_size = IMAGE_MAX_SIZE
+    reads_image_files = False
+
+    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
+        return self.get_correct_response(self.model_id, system_prompt, prompt, image_path, temperature)
+
+    async def ainfer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
+        return await self.async_get_correct_response(self.model_id, system_prompt, prompt, image_path, temperature)
 
+    # One client per process, created lazily so forked workers never share sockets
     def load_client(self):
-        return OpenAI(
-            api_key='xxxx',
-            base_url="xxxx",
-        )
+        if not hasattr(self, 'client'):
+            self.client = OpenAI(
+                api_key='xxxx',
+                base_url="xxxx",
+                max_retries=0,  # retries are handled by SCHEDULER
+            )
+        return self.client
+
+    def load_async_client(self):
+        if not hasattr(self, 'async_client'):
+            self.async_client = AsyncOpenAI(
+                api_key='xxxx',
+                base_url="xxxx",
+                max_retries=0,  # retries are handled by SCHEDULER
+            )
+        return self.async_client
 
     def cleanup(self):
         if hasattr(self, 'client'):
             del self.client
+        if hasattr(self, 'async_client'):
+            del self.async_client
+
+    def __getstate__(self):
+        # Clients are not picklable; each Pool worker builds its own
+        state = self.__dict__.copy()
+        state.pop('client', None)
+        state.pop('async_client', None)
+        return state
 
     def encode_image_to_base64(self, image_path: str) -> str:
+        if isinstance(image_path, EncodedImage):
+            return image_path.base64
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
 
@@ -84,11 +291,38 @@ class APIInferencer(ABC):
                             image_path: str, 
                             temperature: float
                             ) -> str:
-        response = self.model_chat(model_name, system_prompt, user_prompt, image_path, temperature)
-        return response if response else self.get_correct_response(model_name, system_prompt, user_prompt, image_path, temperature)
+        return SCHEDULER.call(
+            model_name,
+            lambda: self.model_chat(model_name, system_prompt, user_prompt, image_path, temperature)
+        )
 
+    async def async_get_correct_response(
+                            self, 
+                            model_name: str, 
+                            system_prompt: str, 
+                            user_prompt: str, 
+                            image_path: str, 
+                            temperature: float
+                            ) -> str:
+        return await SCHEDULER.acall(
+            model_name,
+            lambda: self.async_model_chat(model_name, system_prompt, user_prompt, image_path, temperature)
+        )
+
+    # Single attempt; errors propagate to SCHEDULER, which decides whether to retry
     def model_chat(self, model_name: str, system_prompt: str, user_prompt: str, image_path: str, temperature: float) -> str:
         client = self.load_client()
+        messages = self.build_messages(system_prompt, user_prompt, image_path)
+        completion = client.chat.completions.create(model=model_name, messages=messages, temperature=temperature)
+        return completion.choices[0].message.content
+
+    async def async_model_chat(self, model_name: str, system_prompt: str, user_prompt: str, image_path: str, temperature: float) -> str:
+        client = self.load_async_client()
+        messages = self.build_messages(system_prompt, user_prompt, image_path)
+        completion = await client.chat.completions.create(model=model_name, messages=messages, temperature=temperature)
+        return completion.choices[0].message.content
+
+    def build_messages(self, system_prompt: str, user_prompt: str, image_path: str):
         messages = [
             {
                 "role": "system",
@@ -99,12 +333,7 @@ class APIInferencer(ABC):
                 "content": self.build_message_content(user_prompt, image_path)
             }
         ]
-        messages = [msg for msg in messages if msg]
-        try:
-            completion = client.chat.completions.create(model=model_name, messages=messages, temperature=temperature)
-            return completion.choices[0].message.content
-        except:
-            return self.model_chat(model_name, system_prompt, user_prompt, image_path, temperature)
+        return [msg for msg in messages if msg]
 
     def build_message_content(self, prompt: str, image_path: str):
         if image_path == "Null":
@@ -121,29 +350,23 @@ class APIInferencer(ABC):
         ]
 
 class GPT4oInferencer(APIInferencer):
-    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
-        response = self.get_correct_response('gpt-4o-0513', system_prompt, prompt, image_path, temperature)
-        return response
+    model_id = 'gpt-4o-0513'
 
 
 class GPT4VInference(APIInferencer):
-    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
-        response = self.get_correct_response('gpt-4-vision-preview', system_prompt, prompt, image_path, temperature)
-        return response
+    model_id = 'gpt-4-vision-preview'
 
 class GPT4TurboInference(APIInferencer):
-    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
-        response = self.get_correct_response('gpt-4-turbo-128k', system_prompt, prompt, image_path, temperature)
-        return response
+    model_id = 'gpt-4-turbo-128k'
     
 class GPT4TurboInference(APIInferencer):
-    def infer(self, system_prompt: str, prompt: str, image_path: str, temperature: float) -> str:
-        response = self.get_correct_response('claude3_opus', system_prompt, prompt, image_path, temperature)
-        return response
+    model_id = 'claude3_opus'
 
 
 class GeminiInferencer(APIInferencer):
-    MAX_RETRIES = 10
+    model_id = "gemini-1.5-pro"
+    image_max_size = (1024, 1024)
+    reads_image_files = True  # images are uploaded from their files
 
     def load_model(self):
         """Load the model with the given API key."""
@@ -155,7 +378,7 @@ class GeminiInferencer(APIInferencer):
         
         # Upload the image if provided
         if image_path:
-            image_file = genai.upload_file(path=image_path)
+            image_file = self.upload_image(image_path)
             input_list.append(image_file)
         
         # Upload the audio if provided
@@ -163,33 +386,67 @@ class GeminiInferencer(APIInferencer):
             audio_file = genai.upload_file(path=audio_file_path)
             input_list.append(audio_file)
 
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                response = genai.GenerativeModel(model_name="gemini-1.5-pro").generate_content(
-                    input_list,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=temperature,
-                    ),
-                ).text
-                
-                if response:
-                    return response
-            
-            except Exception as e:
-                print(f"Error occurred: {e}")
-        
-        # If all attempts fail, return an empty string
-        return ""
-        
+        # Uploaded once; only the generation is retried, with the backoff and breaker of the other API models
+        def request():
+            return genai.GenerativeModel(model_name=self.model_id).generate_content(
+                input_list,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=temperature,
+                ),
+            ).text
 
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """Encode the specified image to a base64 string."""
+        return SCHEDULER.call(self.model_id, request)
+
+    async def ainfer(self, *args) -> str:
+        # The Gemini SDK is synchronous; keep it off the event loop
+        return await asyncio.to_thread(self.infer, *args)
+
+    def upload_image(self, image_path: str):
+        """Upload an image file, as a copy shrunk to image_max_size if it is larger."""
+        # Step images are already written at image_max_size; level images are the original files
         with Image.open(image_path) as img:
-            # Resize the image to not exceed 1024x1024
-            max_size = (1024, 1024)
-            img.thumbnail(max_size)
-
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='png', quality=85)  # Use PNG with specified quality
-            img_byte_arr = img_byte_arr.getvalue()
-            return base64.b64encode(img_byte_arr).decode('utf-8')
\ No newline at end of file
+            if img.width <= self.image_max_size[0] and img.height <= self.image_max_size[1]:
+                return genai.upload_file(path=image_path)
+            data = encode_png(img, self.image_compress_level, self.image_max_size)
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
+            f.write(data)
+        try:
+            return genai.upload_file(path=f.name)
+        finally:
+            os.remove(f.name)
+
+
+class CachedInferencer:
+    """Wrap any inferencer so repeated requests are answered from a ResponseCache."""
+
+    def __init__(self, inferencer, cache):
+        self.inferencer = inferencer
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # load_model, cleanup, model_id, ... come from the wrapped inferencer
+        if name == 'inferencer':
+            raise AttributeError(name)
+        return getattr(self.inferencer, name)
+
+    def infer(self, system_prompt, prompt, image_path, temperature):
+        key = self.cache.make_key(self.inferencer.model_id, system_prompt, prompt, image_path, temperature)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.inferencer.infer(system_prompt, prompt, image_path, temperature)
+            if response:
+                self.cache.put(key, response)
+        return response
+
+    async def ainfer(self, system_prompt, prompt, image_path, temperature):
+        key = self.cache.make_key(self.inferencer.model_id, system_prompt, prompt, image_path, temperature)
+        response = self.cache.get(key)
+        if response is None:
+            response = await self.inferencer.ainfer(system_prompt, prompt, image_path, temperature)
+            if response:
+                self.cache.put(key, response)
+        return response
+
+    def cleanup(self):
+        self.inferencer.cleanup()
+        self.cache.close()
@@ -0,0 +1,51 @@
+import os
+import json
+
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS, read_records, rewrite_records
+
+
+# Per-level checkpoint: the last finished step, whether it solved the level,
+# the game state after it and the states of earlier steps (for back_to_step)
+def checkpoint_path(output_dir, model_name, game_name, level):
+    return os.path.join(output_dir, "checkpoints", model_name, game_name, f"level_{level}.json")
+
+
+def save_checkpoint(path, step, is_valid, state, step_states):
+    data = {
+        "step": step,
+        "is_valid": is_valid,
+        "state": state,
+        "step_states": step_states,
+    }
+    # Handed to the sink by the artifact thread once the step's images and text files are written,
+    # so it lands after those and after the step's output records: a resume never finds a
+    # checkpoint ahead of the files it reads or truncates
+    ARTIFACTS.call_after(path, OUTPUTS.replace, path, json.dumps(data))
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        data = json.load(f)
+    data["step_states"] = {int(step): state for step, state in data["step_states"].items()}
+    return data
+
+
+def _truncate_jsonl(path, last_step):
+    rewrite_records(path, [record for record in read_records(path) if record.get("step", 0) <= last_step])
+
+
+def truncate_outputs(output_dir, model_name, game_name, level, last_step):
+    """Drop everything a level wrote after ``last_step`` (the step the checkpoint covers)."""
+    _truncate_jsonl(os.path.join(output_dir, "models", model_name, game_name, f"level_{level}.jsonl"), last_step)
+    _truncate_jsonl(os.path.join(output_dir, "eval", model_name, game_name, f"level_{level}.jsonl"), last_step)
+    if game_name in ["maze", "sokoban"]:
+        level_dir = os.path.join(output_dir, "process_levels", model_name, game_name, f"level_{level}")
+        if os.path.isdir(level_dir):
+            for filename in os.listdir(level_dir):
+                if filename.startswith("step_") and filename.endswith(".txt") and int(filename[5:-4]) > last_step:
+                    os.remove(os.path.join(level_dir, filename))
+    else:
+        _truncate_jsonl(os.path.join(output_dir, "process_levels", model_name, game_name, f"level_{level}.jsonl"), last_step)
@@ -1,17 +1,25 @@
 import os
 import sys
 sys.dont_write_bytecode = True
-import json
 import argparse
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.model import QwenVLChatInferencer, BLIP2Inferencer, GPT4oInferencer, GeminiInferencer, GPT4VInference, GPT4TurboInference
-from src.config import GAMES, START_LEVEL, END_LEVEL, MAX_STEPS, OUTPUT_IMAGE_BASE_DIR, OUTPUT_IMAGE_HIS_DIR, OUTPUT_TEXT_BASE_DIR, OUTPUT_TEXT_HIS_DIR, SYSTEM_PROMPT_SUFFIX, INSTRUCTION_SUFFIX, USER_SUFFIX
+from src.model import QwenVLChatInferencer, BLIP2Inferencer, GPT4oInferencer, GeminiInferencer, GPT4VInference, GPT4TurboInference, CachedInferencer
+from src.config import GAMES, START_LEVEL, END_LEVEL, MAX_STEPS, OUTPUT_IMAGE_BASE_DIR, OUTPUT_IMAGE_HIS_DIR, OUTPUT_TEXT_BASE_DIR, OUTPUT_TEXT_HIS_DIR, SYSTEM_PROMPT_SUFFIX, INSTRUCTION_SUFFIX, USER_SUFFIX, RENDER_BACKEND
 from src.summary import summarize
-from multi_step.prompt_history import add_conversation_history
-from multi_step.prompt_text_level import add_level_to_prompt
-from src.multi_step.score import generate_score
+from multi_step.prompt_history import ConversationHistory
+from multi_step.prompt_text_level import level_to_text
+from src.multi_step.checkpoint import checkpoint_path, save_checkpoint, load_checkpoint, truncate_outputs
+from src.engine import AsyncEngine
+from src.retry import SCHEDULER
+from src.cache import ResponseCache, CacheMiss
+from src.prompts import PROMPTS
+from src.level_store import load_level_store
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS
+from src.level_images import LEVEL_IMAGES
+from game.render import BACKENDS, set_backend
 # game
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from game.maze import maze_ms
@@ -24,43 +32,28 @@ from game.n_puzzle import n_puzzle_ms
 from multiprocessing import Pool
 
 
-# Load levels from a file
-def load_levels(filename):
-    levels = []
-    current_level = []
-
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.rstrip('\n')  # Remove only the trailing newline
-            if line.lstrip().startswith(';'):  # Check for level separator without removing leading spaces
-                if current_level:
-                    levels.append(current_level)
-                    current_level = []
-            elif line or line.isspace():  # Include empty lines that may contain only spaces
-                current_level.append(line)
-        if current_level:
-            levels.append(current_level)
-    
-    return levels
+# Parsed levels of a game, indexed by level number
+def load_levels(game):
+    return load_level_store(game)
 
-# Load the prompt template from a file
-def load_prompt(path):
-    with open(path, 'r', encoding='utf-8') as file:
-        return file.read().strip()
+# Prompt template from the shared registry, checked to have the slots the mode fills in
+def load_prompt(path, *slots):
+    return PROMPTS.get(path, *slots)
 
-# Save the model output to a JSON file
-def save_output(path, model_name, game_name, level, step, output):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    output_data = {
+# The model output of one step, as saved and evaluated
+def step_record(model_name, game_name, level, step, output, prompt_tokens=None):
+    return {
         "model": model_name,
         "game": game_name,
         "level": level,
         "step": step,
-        "output": output
+        "output": output,
+        "prompt_tokens": prompt_tokens,
     }
-    with open(path, 'a', encoding='utf-8') as file:  # Append to the file
-        json.dump(output_data, file, ensure_ascii=False)
-        file.write('\n')
+
+# Append a step record to the level's output file through the run-wide writer
+def save_output(path, record):
+    OUTPUTS.append(path, record)
 
 # Factory function to create inferencers based on model name
 def create_inferencer(model_name):
@@ -76,42 +69,39 @@ def create_inferencer(model_name):
     return inferencer_classes[model_name]()
 
 
-# Process each game level with the specified model inferencer
-
-def inference(args, game, inferencer, levels, use_history, use_text, processes_nums):
+# Build the per-level arguments for a game with the specified model inferencer
+def inference(args, game, inferencer, levels, use_history, use_text):
     model_name, temperature, use_system_prompt = args.model_name, args.temperature, args.use_system_prompt
+    slots = (('text_representation_path',) if use_text else ()) + (('conversation_history_path',) if use_history else ())
     if use_history and use_text:
         output_dir = OUTPUT_TEXT_HIS_DIR
-        system_prompt, prompt = '', load_prompt(game["text_prompt_ms_history_path"].format('_text_history'))
-        if use_system_prompt:
-            system_prompt, prompt = load_prompt(game["text_prompt_ms_history_path"].format(SYSTEM_PROMPT_SUFFIX)), \
-                                            load_prompt(game["text_prompt_ms_history_path"].format(INSTRUCTION_SUFFIX))
+        prompt_path, suffix = game["text_prompt_ms_history_path"], '_text_history'
     elif use_history:
         output_dir = OUTPUT_IMAGE_HIS_DIR
-        system_prompt, prompt = '', load_prompt(game["prompt_ms_history_path"].format('_history'))
-        if use_system_prompt:
-            system_prompt, prompt = load_prompt(game["prompt_ms_history_path"].format(SYSTEM_PROMPT_SUFFIX)), \
-                                            load_prompt(game["prompt_ms_history_path"].format(INSTRUCTION_SUFFIX))
+        prompt_path, suffix = game["prompt_ms_history_path"], '_history'
     elif use_text:
         output_dir = OUTPUT_TEXT_BASE_DIR
-        system_prompt, prompt = '', load_prompt(game["text_prompt_ms_path"].format('_text'))
-        if use_system_prompt:
-            system_prompt, prompt = load_prompt(game["text_prompt_ms_path"].format(SYSTEM_PROMPT_SUFFIX)), \
-                                            load_prompt(game["text_prompt_ms_path"].format(INSTRUCTION_SUFFIX))
+        prompt_path, suffix = game["text_prompt_ms_path"], '_text'
     else:
         output_dir = OUTPUT_IMAGE_BASE_DIR
-        system_prompt, prompt = '', load_prompt(game["prompt_ms_path"].format(''))
-        if use_system_prompt:
-            system_prompt, prompt = load_prompt(game["prompt_ms_path"].format(SYSTEM_PROMPT_SUFFIX)), \
-                                            load_prompt(game["prompt_ms_path"].format(INSTRUCTION_SUFFIX))
+        prompt_path, suffix = game["prompt_ms_path"], ''
 
-    level_states = {}
+    if use_system_prompt:
+        system_prompt, prompt = load_prompt(prompt_path.format(SYSTEM_PROMPT_SUFFIX)).text, \
+                                        load_prompt(prompt_path.format(INSTRUCTION_SUFFIX), *slots)
+    else:
+        system_prompt, prompt = '', load_prompt(prompt_path.format(suffix), *slots)
 
     levels_to_process = list(range(START_LEVEL, END_LEVEL + 1))
-    args_list = [(output_dir, model_name, level, use_text, game, use_history, inferencer, system_prompt, prompt, temperature, level_states, levels) for level in levels_to_process]
+    # Each level gets its own state dict so levels of different games can share one event loop
+    return [(output_dir, model_name, level, use_text, game, use_history, inferencer, system_prompt, prompt, temperature, {}, levels, args.resume) for level in levels_to_process]
+
+
+def run_levels(args_list, processes_nums):
+    level_states = {}
 
     with Pool(processes=processes_nums) as pool:  # You can adjust the number of processes as needed
-        results = pool.starmap(process_level, args_list)
+        results = pool.starmap(run_level, args_list)
 
     for level_state in results:
         for level, updated_level in level_state.items():
@@ -120,57 +110,130 @@ def inference(args, game, inferencer, levels, use_history, use_text, processes_n
     level_states.clear()
 
 
-def process_level(output_dir, model_name, level, use_text, game, use_history, inferencer, system_prompt, prompt, temperature, level_states, levels):
-    step = 1
-    is_valid = False
+# The image drawn after a step, which image modes show at the next one
+def step_image_path(output_dir, model_name, game_name, level, step):
+    return os.path.join(output_dir, "process_images", model_name, game_name, f"level_{level}", f"step_{step}.png")
+
+
+# Build the prompt (and its token count) and image for the next step
+def prepare_step(prompt, game, level, step, use_text, history, output_dir, model_name, state=None):
+    slots = {}
+    if use_text:      # use text
+        slots['text_representation_path'] = level_to_text(game, level, step, output_dir, model_name, state)
+        image_path = "Null"
+    elif step == 1:   # use image
+        image_path = LEVEL_IMAGES.get(game["level_image_path"].format(level))
+    else:
+        # The previous step's image, straight from memory
+        image_path = ARTIFACTS.take_image(step_image_path(output_dir, model_name, game["name"], level, step - 1))
+    if history is not None:
+        slots['conversation_history_path'] = history.text()
+
+    return prompt.render(**slots), prompt.token_count(**slots), image_path
+
+
+# Pick up a level from its checkpoint; returns the first step to run, or None if the level is finished
+def resume_level(output_dir, model_name, game, level, use_text, level_states, step_states):
+    checkpoint = load_checkpoint(checkpoint_path(output_dir, model_name, game["name"], level))
+    last_step = 0
+    if checkpoint:
+        if checkpoint["is_valid"] or checkpoint["step"] >= MAX_STEPS:
+            return None
+        # Image modes go on from the last step's image, which a run only keeps in memory
+        # unless it writes artifacts or its model reads image files
+        image_path = step_image_path(output_dir, model_name, game["name"], level, checkpoint["step"])
+        if not use_text and not os.path.exists(image_path):
+            print(f"Restarting {game['name']} level {level}: {image_path} was not saved")
+            checkpoint = None
+    if checkpoint:
+        last_step = checkpoint["step"]
+        level_states[level] = checkpoint["state"]
+        step_states.update(checkpoint["step_states"])
+    # Anything written after the checkpoint belongs to the step that crashed
+    truncate_outputs(output_dir, model_name, game["name"], level, last_step)
+    return last_step + 1
+
+
+# Save the model output and evaluate the game with it
+def finish_step(output, output_dir, model_name, level, game, step, levels, level_states, step_states, level_output_path, history, prompt_tokens=None):
+    record = step_record(model_name, game["name"], level, step, output, prompt_tokens)
+    save_output(level_output_path, record)
+    if history is not None:
+        history.append(step, output)
+
+    current_level = level_states.get(level) if step > 1 else None
+    is_valid, updated_level = evaluation(game["name"], record, levels, current_level, output_dir, step_states)
+
+    level_states[level] = updated_level
+    step_states[step] = updated_level
+    save_checkpoint(checkpoint_path(output_dir, model_name, game["name"], level), step, is_valid, updated_level, step_states)
+    return is_valid
+
+
+def process_level(output_dir, model_name, level, use_text, game, use_history, inferencer, system_prompt, prompt, temperature, level_states, levels, resume=False):
     level_output_path = os.path.join(output_dir, "models", model_name, game["name"], f"level_{level}.jsonl")
 
     step_states = {}
-    while step <= MAX_STEPS and not is_valid:
-        if step == 1:
-            if use_text:  # use text
-                prompt = add_level_to_prompt(prompt, game, level, step, output_dir, model_name)
-                image_path = "Null"
-            else:         # use image
-                image_path = game["level_image_path"].format(level)
-        else:
-            if use_text:  # use text
-                prompt = add_level_to_prompt(prompt, game, level, step, output_dir, model_name)
-                image_path = "Null"
-            else:         # use image
-                image_path = os.path.join(
-                    output_dir,
-                    "process_images",
-                    model_name,
-                    game["name"],
-                    f"level_{level}",
-                    f"step_{step-1}.png"
-                )
-
-        current_prompt = add_conversation_history(prompt, model_name, game["name"], level) if use_history else prompt
-
+    first_step = resume_level(output_dir, model_name, game, level, use_text, level_states, step_states) if resume else 1
+    if first_step is None:
+        return level_states
+    # Earlier outputs are kept in memory; a resumed level reloads them once from its output file
+    history = None
+    if use_history:
+        history = ConversationHistory.load(level_output_path) if first_step > 1 else ConversationHistory()
+
+    for step in range(first_step, MAX_STEPS + 1):
+        current_prompt, prompt_tokens, image_path = prepare_step(prompt, game, level, step, use_text, history, output_dir, model_name, level_states.get(level))
         output = inferencer.infer(system_prompt, current_prompt, image_path, temperature)
+        if finish_step(output, output_dir, model_name, level, game, step, levels, level_states, step_states, level_output_path, history, prompt_tokens):
+            break
+    
+    # Pool workers must not return before their artifacts are on disk
+    ARTIFACTS.flush()
+    return level_states
 
-        save_output(level_output_path, model_name, game["name"], level, step, output)
 
-        # Evaluate the game with the model output
-        current_level = level_states.get(level) if step > 1 else None
-        is_valid, updated_level = evaluation(game["name"], level, model_name, level_output_path, step, levels, current_level, output_dir, step_states)
+# Same as process_level, but awaits the model so one process can keep many levels in flight
+async def process_level_async(output_dir, model_name, level, use_text, game, use_history, inferencer, system_prompt, prompt, temperature, level_states, levels, resume=False):
+    level_output_path = os.path.join(output_dir, "models", model_name, game["name"], f"level_{level}.jsonl")
+
+    step_states = {}
+    first_step = resume_level(output_dir, model_name, game, level, use_text, level_states, step_states) if resume else 1
+    if first_step is None:
+        return level_states
+    # Earlier outputs are kept in memory; a resumed level reloads them once from its output file
+    history = None
+    if use_history:
+        history = ConversationHistory.load(level_output_path) if first_step > 1 else ConversationHistory()
+
+    for step in range(first_step, MAX_STEPS + 1):
+        current_prompt, prompt_tokens, image_path = prepare_step(prompt, game, level, step, use_text, history, output_dir, model_name, level_states.get(level))
+        output = await inferencer.ainfer(system_prompt, current_prompt, image_path, temperature)
+        if finish_step(output, output_dir, model_name, level, game, step, levels, level_states, step_states, level_output_path, history, prompt_tokens):
+            break
 
-        level_states[level] = updated_level
-        step_states[step] = updated_level
-        
-        if is_valid:
-            return level_states
-            
-        step += 1
-    
     return level_states
 
 
+# In replay mode a level with an uncached request stops there; the other levels carry on, as in the orchestrator
+def run_level(*level_args):
+    try:
+        return process_level(*level_args)
+    except CacheMiss as e:
+        print(f"Error in {level_args[4]['name']} level {level_args[2]}: {e!r}")
+        ARTIFACTS.flush()
+        return level_args[10]
+
+async def run_level_async(*level_args):
+    try:
+        return await process_level_async(*level_args)
+    except CacheMiss as e:
+        print(f"Error in {level_args[4]['name']} level {level_args[2]}: {e!r}")
+        return level_args[10]
+
 
 # Function to evaluate the game using the model output
-def evaluation(game_name, level, model_name, moves_path, step, levels, current_level, output_dir, step_states):
+def evaluation(game_name, record, levels, current_level, output_dir, step_states):
     game_functions = {
         "maze": maze_ms.main,
         "sokoban": sokoban_ms.main,
@@ -180,17 +243,13 @@ def evaluation(game_name, level, model_name, moves_path, step, levels, current_l
         "n_puzzle": n_puzzle_ms.main
     }
 
-    # Read only the last line from the moves file
-    with open(moves_path, 'r') as f:
-        last_move = json.loads(f.readlines()[-1])
-
     # Call the appropriate function based on game_name
     is_valid, updated_level = game_functions[game_name](
-        last_move=last_move,
+        last_move=record,
         output_dir_base=output_dir,
-        model_name=model_name,
-        step=step,
-        levels=levels,
+        model_name=record["model"],
+        step=record["step"],
+        level=levels.get(record["level"]),
         current_level=current_level,
         step_states = step_states,
     )
@@ -210,7 +269,22 @@ def main():
                         help='The hyperparameter of generation')
     parser.add_argument('--processes-nums', type=int, default=4,
                         help='Number of processes to use for parallel inference.')
+    parser.add_argument('--engine', choices=['pool', 'async'], default='pool',
+                        help='pool: one request per worker process; async: one process with many requests in flight')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Maximum number of levels in flight with the async engine.')
+    parser.add_argument('--requests-per-minute', type=float, default=None,
+                        help='Rate limit shared by all workers for API models (default: unlimited).')
+    parser.add_argument('--cache', choices=['off', 'readwrite', 'replay'], default='off',
+                        help='Response cache: readwrite reuses and stores answers, replay serves only cached answers.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue each level from its last checkpoint and skip levels that are already finished.')
+    parser.add_argument('--no-artifacts', action='store_true',
+                        help='Skip the process_levels files (and step images in text modes). Completion scores need them.')
+    parser.add_argument('--render-backend', choices=list(BACKENDS), default=RENDER_BACKEND,
+                        help='Library that draws the game images; numpy and pygame produce the same pixels.')
     args = parser.parse_args()
+    set_backend(args.render_backend)
     
     # for model_name in MODELS:
         # for mode in ['base_image', 'history_image', 'base_text', 'history_text']:
@@ -218,22 +292,47 @@ def main():
     inferencer = create_inferencer(args.model_name)
     if args.model_name in ['qwen_vl_chat', 'blip2']:
         inferencer.load_model()
-    
-    for game in GAMES:
-        levels = load_levels(game["levels_path"])
-        if args.mode == 'base_image':
-            inference(args, game, inferencer, levels, use_history=False, use_text=False, processes_nums=args.processes_nums)
-        elif args.mode == 'history_image':
-            inference(args, game, inferencer, levels, use_history=True, use_text=False, processes_nums=args.processes_nums)
-        elif args.mode == 'base_text':
-            inference(args, game, inferencer, levels, use_history=False, use_text=True, processes_nums=args.processes_nums)
-        elif args.mode == 'history_text':
-            inference(args, game, inferencer, levels, use_history=True, use_text=True, processes_nums=args.processes_nums)
+        # One process owns the model and batches requests from every level
+        if args.engine == 'pool':
+            print("Local models run in a single process; using the async engine")
+            args.engine = 'async'
+    if args.cache != 'off':
+        inferencer = CachedInferencer(inferencer, ResponseCache(mode=args.cache))
+    # Before any worker is forked, so the rate limiter and breaker are shared
+    if getattr(inferencer, 'model_id', None):
+        SCHEDULER.configure(inferencer.model_id, args.requests_per_minute)
+
+    use_history = args.mode in ['history_image', 'history_text']
+    use_text = args.mode in ['base_text', 'history_text']
+    # Image modes hand every step's image to the next step; a resumed level reads its last one from disk
+    ARTIFACTS.configure(enabled=not args.no_artifacts, keep_images=not use_text,
+                        compress_level=inferencer.image_compress_level, max_size=inferencer.image_max_size,
+                        image_files=inferencer.reads_image_files or args.resume)
+    if not use_text:
+        LEVEL_IMAGES.load()  # before the workers fork, so they share it
+    OUTPUTS.start()
+
+    if args.engine == 'async':
+        # Every game's levels share one event loop, so slow games don't hold up the rest
+        args_list = []
+        for game in GAMES:
+            levels = load_levels(game)
+            args_list += inference(args, game, inferencer, levels, use_history=use_history, use_text=use_text)
+        engine = AsyncEngine(concurrency=args.concurrency)
+        engine.starmap(run_level_async, args_list)
+        engine.close()
+    else:
+        for game in GAMES:
+            levels = load_levels(game)
+            args_list = inference(args, game, inferencer, levels, use_history=use_history, use_text=use_text)
+            run_levels(args_list, args.processes_nums)
+    ARTIFACTS.flush()
+    OUTPUTS.flush()
     
     inferencer.cleanup()
+    print(f"API calls: {SCHEDULER.stats.report()}")
 
-    generate_score()
-    summarize()  # also compute one-step
+    summarize()  # scores every setting, one-step included
 
 if __name__ == "__main__":
     main()
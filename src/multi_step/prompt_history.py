@@ -1,20 +1,67 @@
 # src\multi_step\prompts.py
 
-import json
-import os
-
-def add_conversation_history(prompt, model_name, game_name, level):
-    conversation_history_path = os.path.join(
-        "outputs", "multi_step", "history", "models",
-        model_name, game_name, f"level_{level}.jsonl"
-    )
-    
-    history_text = ""
-    
-    if os.path.exists(conversation_history_path):
-        with open(conversation_history_path, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                history_text += f"step {data['step']}: {data['output']}\n"
-    
-    return prompt.replace("{conversation_history_path}", history_text)
\ No newline at end of file
+from collections import deque
+
+from src.config import HISTORY_MAX_TOKENS, HISTORY_WINDOW
+from src.prompts import count_tokens
+from src.output_sink import read_records
+
+
+class ConversationHistory:
+    """The model's earlier outputs for one level, accumulated in memory step by step.
+
+    max_tokens: drop the oldest steps once the history grows past this many tokens.
+    window:     keep only the last ``window`` steps verbatim and fold older ones
+                into a single summary line built by ``summarize(first, last, outputs)``.
+    """
+
+    def __init__(self, max_tokens=HISTORY_MAX_TOKENS, window=HISTORY_WINDOW, summarize=None):
+        self.max_tokens = max_tokens
+        self.window = window
+        self.summarize = summarize or summarize_steps
+        self.lines = deque()    # (step, output, line, tokens)
+        self.tokens = 0
+        self.folded = []        # outputs pushed out of the window
+        self.first_folded = None
+        self.summary = ""
+        self._text = ""
+
+    @classmethod
+    def load(cls, level_output_path, **kwargs):
+        """Rebuild the history from a level's saved model outputs (used when resuming)."""
+        history = cls(**kwargs)
+        for data in read_records(level_output_path):
+            history.append(data['step'], data['output'])
+        return history
+
+    def append(self, step, output):
+        line = f"step {step}: {output}\n"
+        tokens = count_tokens(line)
+        self.lines.append((step, output, line, tokens))
+        self.tokens += tokens
+
+        if self.window is not None and len(self.lines) > self.window:
+            self._drop_oldest()
+        if self.max_tokens is not None:
+            while len(self.lines) > 1 and self.tokens + count_tokens(self.summary) > self.max_tokens:
+                self._drop_oldest()
+        self._text = None
+
+    def _drop_oldest(self):
+        step, output, _, tokens = self.lines.popleft()
+        self.tokens -= tokens
+        if self.window is not None:
+            if self.first_folded is None:
+                self.first_folded = step
+            self.folded.append(output)
+            self.summary = self.summarize(self.first_folded, step, self.folded)
+
+    def text(self):
+        if self._text is None:
+            self._text = self.summary + "".join(line for _, _, line, _ in self.lines)
+        return self._text
+
+
+# Default summary for steps outside the window: just say what was left out
+def summarize_steps(first_step, last_step, outputs):
+    return f"steps {first_step}-{last_step}: {len(outputs)} earlier moves not shown\n"
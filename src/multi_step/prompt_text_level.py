@@ -1,24 +1,23 @@
 import os
 import json
+from src.level_store import level_store
+from src.output_sink import read_records
 
-def add_level_to_prompt(prompt, game, level, step, output_dir, model_name):
+# Text shown in the {text_representation_path} slot for the given step. After step 1 it is
+# rendered from the live state the previous step left behind; the process_levels files are
+# only read when no state is at hand.
+def level_to_text(game, level, step, output_dir, model_name, state=None):
+    if step > 1 and state is not None:
+        return state_to_text(game["name"], state)
     if game["name"] in ["maze", "sokoban"]:
-        level_text = load_txt_level(game, level, step, output_dir, model_name)
+        return load_txt_level(game, level, step, output_dir, model_name)
     elif game["name"] in ["hanoi", "n_puzzle", "n_queens", "sudoku"]:
-        level_text = load_json_level(game, level, step, output_dir, model_name)
-
-    return prompt.replace("{text_representation_path}", level_text)
+        return load_json_level(game, level, step, output_dir, model_name)
 
 
 def load_txt_level(game, level_number, step, output_dir, model_name):
     if step == 1:
-        with open(game["levels_path"], 'r') as file:
-            data = file.read()
-        levels = data.split(';')
-        for level in levels:
-            level_info = level.strip().split('\n')
-            if level_info and level_info[0].strip() == str(level_number):
-                return '\n'.join(level_info[1:])
+        return level_store(game["name"]).get(level_number).text
     else:
         file_path = os.path.join(
             output_dir,
@@ -34,11 +33,7 @@ def load_txt_level(game, level_number, step, output_dir, model_name):
 
 def load_json_level(game, level_number, step, output_dir, model_name):
     if step == 1:
-        with open(game["levels_path"], 'r') as file:
-            for line in file:
-                data = json.loads(line)
-                if data["level"] == level_number:
-                    return json.dumps(data["position"])  # to string
+        return level_store(game["name"]).get(level_number).text
     else:
         file_path = os.path.join(
             output_dir,
@@ -58,18 +53,28 @@ def load_json_level(game, level_number, step, output_dir, model_name):
         elif game["name"] == "n_queens":
             combined_moves = []
             json_file_path = os.path.join(file_path, f"level_{level_number}.jsonl")
-            with open(json_file_path, 'r') as file:
-                for line in file:
-                    data = json.loads(line)
-                    if data["step"] == step-1:
-                        combined_moves.append(data["position"])
-                        combined_moves.extend(data["output"])
+            for data in read_records(json_file_path):
+                if data["step"] == step-1:
+                    combined_moves.append(data["position"])
+                    combined_moves.extend(data["output"])
             return json.dumps(combined_moves)
         
         elif game["name"] in ["sudoku", "hanoi", "n_puzzle"]:
             json_file_path = os.path.join(file_path, f"level_{level_number}.jsonl")
-            with open(json_file_path, 'r') as file:
-                for line in file:
-                    data = json.loads(line)
-                    if data["step"] == step-1:
-                        return json.dumps(data["position"])
\ No newline at end of file
+            for data in read_records(json_file_path):
+                if data["step"] == step-1:
+                    return json.dumps(data["position"])
+
+
+# Same text the process_levels files hold, straight from a game module's state
+def state_to_text(game_name, state):
+    if game_name in ["maze", "sokoban"]:
+        return ''.join(''.join(row) + '\n' for row in state)
+    elif game_name == "hanoi":
+        return json.dumps({rod: state[rod] for rod in 'ABCD'})
+    elif game_name == "n_queens":
+        return json.dumps(state['queens'])
+    elif game_name == "n_puzzle":
+        return json.dumps(state['position'])
+    elif game_name == "sudoku":
+        return json.dumps(state['position'])
@@ -1,14 +1,21 @@
 import os
 import sys
 sys.dont_write_bytecode = True
-import json
 import argparse
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.model import QwenVLChatInferencer, BLIP2Inferencer, GPT4oInferencer, GeminiInferencer, GPT4VInference, GPT4TurboInference
-from src.config import GAMES, START_LEVEL, END_LEVEL, OUTPUT_OS_DIR, OUTPUT_TEXT_OS_DIR
-from src.multi_step.prompt_text_level import add_level_to_prompt
+from src.model import QwenVLChatInferencer, BLIP2Inferencer, GPT4oInferencer, GeminiInferencer, GPT4VInference, GPT4TurboInference, CachedInferencer
+from src.config import GAMES, START_LEVEL, END_LEVEL, OUTPUT_OS_DIR, OUTPUT_TEXT_OS_DIR, RENDER_BACKEND
+from src.multi_step.prompt_text_level import level_to_text
 from src.one_step.score import generate_score
+from src.engine import AsyncEngine
+from src.retry import SCHEDULER
+from src.cache import ResponseCache, CacheMiss
+from src.prompts import PROMPTS
+from src.level_store import load_level_store
+from src.level_images import LEVEL_IMAGES
+from src.output_sink import OUTPUTS, read_records, rewrite_records
+from game.render import BACKENDS, set_backend
 # game
 from game.maze import maze_os
 from game.sokoban import sokoban_os
@@ -18,29 +25,13 @@ from game.hanoi import hanoi_os
 from game.n_puzzle import n_puzzle_os
 from multiprocessing import Pool
 
-# Load levels from a file
-def load_levels(filename):
-    levels = []
-    current_level = []
-
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.rstrip('\n')  # Remove only the trailing newline
-            if line.lstrip().startswith(';'):  # Check for level separator without removing leading spaces
-                if current_level:
-                    levels.append(current_level)
-                    current_level = []
-            elif line or line.isspace():  # Include empty lines that may contain only spaces
-                current_level.append(line)
-        if current_level:
-            levels.append(current_level)
-    
-    return levels
-
-# Load the prompt template from a file
-def load_prompt(path):
-    with open(path, 'r', encoding='utf-8') as file:
-        return file.read().strip()
+# Parsed levels of a game, indexed by level number
+def load_levels(game):
+    return load_level_store(game)
+
+# Prompt template from the shared registry, checked to have the slots the mode fills in
+def load_prompt(path, *slots):
+    return PROMPTS.get(path, *slots)
 
 # Factory function to create inferencers based on model name
 def create_inferencer(model_name):
@@ -56,34 +47,90 @@ def create_inferencer(model_name):
     return inferencer_classes[model_name]()
 
 
-# Save the model output to a JSON file
-def save_output(path, model_name, game_name, level, output):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    output_data = {
+# The model output for a level, as saved and evaluated
+def level_record(model_name, game_name, level, output, prompt_tokens=None):
+    return {
         "model": model_name,
         "game": game_name,
         "level": level,
-        "output": output
+        "output": output,
+        "prompt_tokens": prompt_tokens,
     }
-    with open(path, 'a', encoding='utf-8') as file:  # Append to the file
-        json.dump(output_data, file, ensure_ascii=False)
-        file.write('\n')
-
-def process_level(prompt, output_dir, model_name, game, use_text, inferencer, level, levels):
 
-    level_output_path = os.path.join(output_dir, "models", model_name, f"{game['name']}.jsonl")
+# Append a level record to the game's output file through the run-wide writer
+def save_output(path, record):
+    OUTPUTS.append(path, record)
 
+# Build the prompt (and its token count) and image for a level
+def prepare_level(prompt, output_dir, model_name, game, use_text, level):
+    slots = {}
     if use_text:
-        prompt = add_level_to_prompt(prompt, game, level, 1, output_dir, model_name)
+        slots['text_representation_path'] = level_to_text(game, level, 1, output_dir, model_name)
         image_path = "Null"
     else:
-        image_path = game["level_image_path"].format(level)
+        image_path = LEVEL_IMAGES.get(game["level_image_path"].format(level))
+    return prompt.render(**slots), prompt.token_count(**slots), image_path
 
+# Save the model output and evaluate the game with it
+def finish_level(output, output_dir, model_name, game, level, levels, prompt_tokens=None):
+    level_output_path = os.path.join(output_dir, "models", model_name, f"{game['name']}.jsonl")
+    record = level_record(model_name, game["name"], level, output, prompt_tokens)
+    save_output(level_output_path, record)
+    return evaluation(game["name"], record, levels, output_dir)
+
+def process_level(prompt, output_dir, model_name, game, use_text, inferencer, level, levels, eval_record=None):
+    # Evaluated in an earlier run (see resume_levels)
+    if eval_record is not None:
+        return eval_record
+    prompt, prompt_tokens, image_path = prepare_level(prompt, output_dir, model_name, game, use_text, level)
     output = inferencer.infer('', prompt, image_path, 0)
-    save_output(level_output_path, model_name, game["name"], level, output)
-    evaluation(game["name"], level, model_name, level_output_path, levels, output_dir)
-
-def inference(game, model_name, inferencer, levels, use_text, processes_nums):
+    return finish_level(output, output_dir, model_name, game, level, levels, prompt_tokens)
+
+# Same as process_level, but awaits the model so one process can keep many levels in flight
+async def process_level_async(prompt, output_dir, model_name, game, use_text, inferencer, level, levels, eval_record=None):
+    if eval_record is not None:
+        return eval_record
+    prompt, prompt_tokens, image_path = prepare_level(prompt, output_dir, model_name, game, use_text, level)
+    output = await inferencer.ainfer('', prompt, image_path, 0)
+    return finish_level(output, output_dir, model_name, game, level, levels, prompt_tokens)
+
+# In replay mode a level with an uncached request is skipped; the other levels carry on, as in the orchestrator
+def run_level(*level_args):
+    try:
+        return process_level(*level_args)
+    except CacheMiss as e:
+        print(f"Error in {level_args[3]['name']} level {level_args[6]}: {e!r}")
+
+async def run_level_async(*level_args):
+    try:
+        return await process_level_async(*level_args)
+    except CacheMiss as e:
+        print(f"Error in {level_args[3]['name']} level {level_args[6]}: {e!r}")
+
+# Keep the records of the levels in ``finished``, one per level
+def _keep_levels(path, finished):
+    seen = set()
+    records = []
+    for record in read_records(path):
+        if record["level"] in finished and record["level"] not in seen:
+            seen.add(record["level"])
+            records.append(record)
+    rewrite_records(path, records)
+
+# Pick up a game from an earlier run; returns the eval record of every level that was evaluated.
+# The eval record is a level's last write, so records of levels cut off before it are dropped
+# (they run again), as are repeats, so every level is scored once.
+def resume_levels(output_dir, model_name, game_name):
+    finished = {}
+    for record in read_records(os.path.join(output_dir, "eval", model_name, f"{game_name}.jsonl")):
+        finished.setdefault(record["level"], record)
+    _keep_levels(os.path.join(output_dir, "eval", model_name, f"{game_name}.jsonl"), finished)
+    _keep_levels(os.path.join(output_dir, "models", model_name, f"{game_name}.jsonl"), finished)
+    _keep_levels(os.path.join(output_dir, "process_levels", model_name, f"{game_name}.jsonl"), finished)
+    return finished
+
+# Build the per-level arguments for a game
+def inference(game, model_name, inferencer, levels, use_text, resume=False):
     if use_text:
         output_dir = OUTPUT_TEXT_OS_DIR
         prompt_path = game["text_prompt_path"]
@@ -91,16 +138,18 @@ def inference(game, model_name, inferencer, levels, use_text, processes_nums):
         output_dir = OUTPUT_OS_DIR
         prompt_path = game["prompt_path"]
 
-    prompt = load_prompt(prompt_path)
+    prompt = load_prompt(prompt_path, *(('text_representation_path',) if use_text else ()))
 
+    finished = resume_levels(output_dir, model_name, game["name"]) if resume else {}
     levels_to_process = list(range(START_LEVEL, END_LEVEL + 1))
-    args_list = [(prompt, output_dir, model_name, game, use_text, inferencer, level, levels) for level in levels_to_process]
+    return [(prompt, output_dir, model_name, game, use_text, inferencer, level, levels, finished.get(level)) for level in levels_to_process]
 
+def run_levels(args_list, processes_nums):
     with Pool(processes=processes_nums) as pool:  # You can adjust the number of processes as needed
-        results = pool.starmap(process_level, args_list)
+        results = pool.starmap(run_level, args_list)
 
-# Function to evaluate the game using the model output
-def evaluation(game_name, level_number, model_name, moves_path, levels, output_dir):
+# Function to evaluate the game using the model output; returns the level's eval record
+def evaluation(game_name, record, levels, output_dir):
     game_functions = {
         "maze": maze_os.main,
         "sokoban": sokoban_os.main,
@@ -110,18 +159,11 @@ def evaluation(game_name, level_number, model_name, moves_path, levels, output_d
         "n_puzzle": n_puzzle_os.main,
     }
 
-    # Read only the last line from the moves file
-    with open(moves_path, 'r') as f:
-        for line in f:
-            data = json.loads(line)
-            if data["level"] == level_number:
-               move = data
-
-    game_functions[game_name](
-        move=move,
+    return game_functions[game_name](
+        move=record,
         output_dir_base=output_dir,
-        model_name=model_name,
-        levels=levels,
+        model_name=record["model"],
+        level=levels.get(record["level"]),
     )
 
 
@@ -133,20 +175,56 @@ def main():
                         help='Inference mode: base_image (default), history_image, base_text, or history_text')
     parser.add_argument('--processes-nums', type=int, default=4,
                         help='Number of processes to use for parallel inference.')
+    parser.add_argument('--engine', choices=['pool', 'async'], default='pool',
+                        help='pool: one request per worker process; async: one process with many requests in flight')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Maximum number of levels in flight with the async engine.')
+    parser.add_argument('--requests-per-minute', type=float, default=None,
+                        help='Rate limit shared by all workers for API models (default: unlimited).')
+    parser.add_argument('--cache', choices=['off', 'readwrite', 'replay'], default='off',
+                        help='Response cache: readwrite reuses and stores answers, replay serves only cached answers.')
+    parser.add_argument('--render-backend', choices=list(BACKENDS), default=RENDER_BACKEND,
+                        help='Library that draws the game images; numpy and pygame produce the same pixels.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip levels that an earlier run already evaluated.')
     args = parser.parse_args()
+    set_backend(args.render_backend)
 
     inferencer = create_inferencer(args.model_name)
     if args.model_name in ['qwen_vl_chat', 'blip2']:
         inferencer.load_model()
-
-    for game in GAMES:
-        levels = load_levels(game["levels_path"])
-
-        if args.mode == 'image':
-            inference(game, args.model_name, inferencer, levels, use_text=False, processes_nums=args.processes_nums)
-        elif args.mode == 'text':
-            inference(game, args.model_name, inferencer, levels, use_text=True, processes_nums=args.processes_nums)
-
+        # One process owns the model and batches requests from every level
+        if args.engine == 'pool':
+            print("Local models run in a single process; using the async engine")
+            args.engine = 'async'
+    if args.cache != 'off':
+        inferencer = CachedInferencer(inferencer, ResponseCache(mode=args.cache))
+    # Before any worker is forked, so the rate limiter and breaker are shared
+    if getattr(inferencer, 'model_id', None):
+        SCHEDULER.configure(inferencer.model_id, args.requests_per_minute)
+
+    use_text = args.mode == 'text'
+    if not use_text:
+        LEVEL_IMAGES.load()  # before the workers fork, so they share it
+    OUTPUTS.start()
+
+    if args.engine == 'async':
+        args_list = []
+        for game in GAMES:
+            levels = load_levels(game)
+            args_list += inference(game, args.model_name, inferencer, levels, use_text=use_text, resume=args.resume)
+        engine = AsyncEngine(concurrency=args.concurrency)
+        engine.starmap(run_level_async, args_list)
+        engine.close()
+    else:
+        for game in GAMES:
+            levels = load_levels(game)
+            args_list = inference(game, args.model_name, inferencer, levels, use_text=use_text, resume=args.resume)
+            run_levels(args_list, args.processes_nums)
+    OUTPUTS.flush()
+
+    inferencer.cleanup()
+    print(f"API calls: {SCHEDULER.stats.report()}")
     generate_score()
 
 if __name__ == "__main__":
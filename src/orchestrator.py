@@ -0,0 +1,196 @@
+import os
+import sys
+sys.dont_write_bytecode = True
+import csv
+import time
+import argparse
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config import GAMES, RENDER_BACKEND
+from src.engine import AsyncEngine
+from src.retry import SCHEDULER
+from src.cache import ResponseCache
+from src.artifacts import ARTIFACTS
+from src.output_sink import OUTPUTS
+from game.render import BACKENDS, set_backend
+from src.model import CachedInferencer
+from src.summary import summarize
+from src.multi_step import infer as multi_infer
+from src.multi_step.score import process_jsonl as multi_step_result
+from src.one_step import infer as one_infer
+
+# mode: (use_history, use_text)
+MULTI_STEP_MODES = {
+    'base_image': (False, False),
+    'history_image': (True, False),
+    'base_text': (False, True),
+    'history_text': (True, True),
+}
+# mode: use_text
+ONE_STEP_MODES = {
+    'image': False,
+    'text': True,
+}
+
+LIVE_SCORES_PATH = "outputs/summary/live_{}.csv"
+LIVE_SCORES_INTERVAL = 10.0   # seconds between refreshes of the live scores
+
+
+# Build every (mode, game, level) work item up front
+def build_work_items(args, inferencer):
+    items = []
+    for game in GAMES:
+        levels = multi_infer.load_levels(game)
+        for mode in args.modes:
+            if mode in MULTI_STEP_MODES:
+                use_history, use_text = MULTI_STEP_MODES[mode]
+                level_args = multi_infer.inference(args, game, inferencer, levels, use_history=use_history, use_text=use_text)
+                items += [(mode, game["name"], level_arg[2], multi_infer.process_level_async, level_arg) for level_arg in level_args]
+            else:
+                level_args = one_infer.inference(game, args.model_name, inferencer, levels, use_text=ONE_STEP_MODES[mode], resume=args.resume)
+                items += [(mode, game["name"], level_arg[6], one_infer.process_level_async, level_arg) for level_arg in level_args]
+    # Interleave modes and games so every setting makes progress at the same pace
+    items.sort(key=lambda item: item[2])
+    return items
+
+
+# One level failing (e.g. an evaluator choking on a malformed output) must not stop the sweep.
+# Returns whether the level finished and what it returned (the eval record for one-step levels).
+async def run_work_item(mode, game_name, level, func, level_args):
+    try:
+        return True, await func(*level_args)
+    except Exception as e:
+        print(f"Error in {mode} {game_name} level {level}: {e!r}")
+        return False, None
+
+
+class ScoreBoard:
+    """Running acc/eff per (mode, game). Finished levels are scored in batches, every
+    ``interval`` seconds and once all are in, with one flush of the output sink per batch."""
+
+    def __init__(self, model_name, total, interval=LIVE_SCORES_INTERVAL):
+        self.model_name = model_name
+        self.total = total
+        self.interval = interval
+        self.pending = []
+        self.last_refresh = time.monotonic()
+        self.finished = 0
+        self.levels = defaultdict(int)
+        self.valid = defaultdict(int)
+        self.active = defaultdict(float)
+        self.moves = defaultdict(int)
+
+    def record(self, item, outcome):
+        self.pending.append((item, outcome))
+        if self.finished + len(self.pending) >= self.total or time.monotonic() - self.last_refresh >= self.interval:
+            self.refresh()
+
+    def refresh(self):
+        if not self.pending:
+            return
+        # Multi-step levels are scored from their eval files, whose records may still be queued
+        OUTPUTS.flush()
+        for item, outcome in self.pending:
+            self.score_level(item, outcome)
+        self.pending = []
+        self.last_refresh = time.monotonic()
+        self.write()
+
+    def score_level(self, item, outcome):
+        mode, game_name, level, _, level_args = item
+        finished, result = outcome
+        key = (mode, game_name)
+        if not finished:
+            valid = 0
+        elif mode in MULTI_STEP_MODES:
+            game_dir = os.path.join(level_args[0], "eval", self.model_name, game_name)
+            valid, active_count, move_count = multi_step_result(os.path.join(game_dir, f"level_{level}.jsonl"))
+            self.active[key] += active_count
+            self.moves[key] += move_count
+        else:
+            data = result or {}
+            valid = 1 if data.get("is_valid", False) else 0
+            self.active[key] += data.get("is_active", 0)
+            self.moves[key] += 100  # one-step is_active is already a percentage
+        self.levels[key] += 1
+        self.valid[key] += valid
+        self.finished += 1
+
+        acc, eff = self.scores(key)
+        print(f"[{self.finished}/{self.total}] {mode} {game_name} level {level}: "
+              f"{'solved' if valid else 'unsolved'} (acc {acc}, eff {eff} over {self.levels[key]} levels)")
+
+    def scores(self, key):
+        acc = round(self.valid[key] / self.levels[key] * 100, 1)
+        eff = round(self.active[key] / self.moves[key] * 100, 1) if self.moves[key] else 0
+        return acc, eff
+
+    def write(self):
+        path = LIVE_SCORES_PATH.format(self.model_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['mode', 'game', 'levels', 'acc', 'eff'])
+            for key in sorted(self.levels):
+                writer.writerow(list(key) + [self.levels[key]] + list(self.scores(key)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every multi-step and one-step mode from one process")
+    parser.add_argument('--modes', nargs='+', choices=list(MULTI_STEP_MODES) + list(ONE_STEP_MODES),
+                        default=list(MULTI_STEP_MODES) + list(ONE_STEP_MODES),
+                        help='Modes to run (default: all four multi-step and both one-step modes)')
+    parser.add_argument('--model-name', choices=['qwen_vl_chat', 'gpt4o', 'claude35', 'gpt4v', 'qwen_vl_max', 'gemini_15_pro', 'blip2'], default='claude35',
+                        help='Model to evaluate')
+    parser.add_argument('--use-system-prompt', default=False,
+                        help='Whether use system prompt for closed source models')
+    parser.add_argument('--temperature', default=0,
+                        help='The hyperparameter of generation')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Maximum number of levels in flight across all modes and games.')
+    parser.add_argument('--requests-per-minute', type=float, default=None,
+                        help='Rate limit for the model (default: unlimited).')
+    parser.add_argument('--cache', choices=['off', 'readwrite', 'replay'], default='off',
+                        help='Response cache: readwrite reuses and stores answers, replay serves only cached answers.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue multi-step levels from their last checkpoint and skip one-step levels that are already evaluated.')
+    parser.add_argument('--no-artifacts', action='store_true',
+                        help='Skip the multi-step process_levels files (and step images in text modes). Completion scores need them.')
+    parser.add_argument('--render-backend', choices=list(BACKENDS), default=RENDER_BACKEND,
+                        help='Library that draws the game images; numpy and pygame produce the same pixels.')
+    args = parser.parse_args()
+    set_backend(args.render_backend)
+
+    inferencer = multi_infer.create_inferencer(args.model_name)
+    if args.model_name in ['qwen_vl_chat', 'blip2']:
+        inferencer.load_model()
+    if args.cache != 'off':
+        inferencer = CachedInferencer(inferencer, ResponseCache(mode=args.cache))
+    if getattr(inferencer, 'model_id', None):
+        SCHEDULER.configure(inferencer.model_id, args.requests_per_minute)
+
+    # Image modes hand every step's image to the next step; a resumed level reads its last one from disk
+    keep_images = any(mode in MULTI_STEP_MODES and not MULTI_STEP_MODES[mode][1] for mode in args.modes)
+    ARTIFACTS.configure(enabled=not args.no_artifacts, keep_images=keep_images,
+                        compress_level=inferencer.image_compress_level, max_size=inferencer.image_max_size,
+                        image_files=inferencer.reads_image_files or args.resume)
+
+    OUTPUTS.start()
+    items = build_work_items(args, inferencer)
+    board = ScoreBoard(args.model_name, len(items))
+
+    engine = AsyncEngine(concurrency=args.concurrency)
+    engine.starmap(run_work_item, items, callback=board.record)
+    engine.close()
+    board.refresh()
+    ARTIFACTS.flush()
+    OUTPUTS.flush()
+
+    inferencer.cleanup()
+    print(f"API calls: {SCHEDULER.stats.report()}")
+
+    summarize()
+
+if __name__ == "__main__":
+    main()
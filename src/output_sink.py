@@ -0,0 +1,256 @@
+import io
+import os
+import gzip
+import json
+import time
+import atexit
+import threading
+import multiprocessing
+from collections import OrderedDict, defaultdict
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed for OUTPUT_COMPRESSION = "zstd"
+    zstandard = None
+
+from src.config import OUTPUT_COMPRESSION, OUTPUT_BATCH_SIZE, OUTPUT_FSYNC_INTERVAL, MAX_OPEN_STREAMS
+
+# Suffix each format adds to a stream's .jsonl path. Compressed streams are a run of
+# independent frames, one per batch, which both formats read back as a single stream.
+CODECS = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def compress(codec, data):
+    if codec == 'gzip':
+        return gzip.compress(data)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _open_text(path, codec):
+    if codec == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if codec == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _stream_file(path):
+    """The file a stream was written to and its format, or (None, None) if it doesn't exist."""
+    for codec, suffix in CODECS.items():
+        if os.path.exists(path + suffix):
+            return path + suffix, codec
+    return None, None
+
+
+def stream_path(file_path):
+    """The plain .jsonl name of a stream file, whatever its format."""
+    for suffix in CODECS.values():
+        if suffix and file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+    return file_path
+
+
+def stream_exists(path):
+    return _stream_file(path)[0] is not None
+
+
+def read_records(path):
+    """The records of the JSONL stream at ``path`` (its plain .jsonl name), whichever format it was written in."""
+    file_path, codec = _stream_file(path)
+    if file_path is None:
+        return
+    with _open_text(file_path, codec) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def rewrite_records(path, records):
+    """Replace a stream's records, keeping its format."""
+    file_path, codec = _stream_file(path)
+    if file_path is None:
+        return
+    data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(compress(codec, data) if data else b'')
+    os.replace(tmp_path, file_path)
+
+
+class OutputSink:
+    """Run-wide writer for the JSONL streams under outputs/ (models/, eval/, process_levels/).
+
+    ``start()`` runs in the main process before any worker is forked. Records from every
+    process then go through one queue to a single writer thread, so lines from different
+    workers never interleave. The writer batches records, keeps a handle open per stream
+    (up to ``max_open``), flushes after every batch and fsyncs every ``fsync_interval`` seconds.
+
+    ``replace()`` rewrites a whole file (e.g. a checkpoint) through the same queue, after the
+    records appended before it, so it never gets ahead of the streams it describes.
+
+    ``flush()`` waits until every record appended so far, from any process, has reached its
+    file. Before ``start()`` (e.g. a game module run on its own) records are written directly.
+    """
+
+    def __init__(self, compression=OUTPUT_COMPRESSION, batch_size=OUTPUT_BATCH_SIZE,
+                 fsync_interval=OUTPUT_FSYNC_INTERVAL, max_open=MAX_OPEN_STREAMS):
+        self.compression = compression
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_open = max_open
+        self.queue = None
+        self.thread = None
+        self.handles = OrderedDict()   # file path -> open binary handle, least recently used first
+        self.dirty = set()             # handles written since the last fsync
+        self._owner = None
+
+    def start(self):
+        if self.queue is not None:
+            return
+        if self.compression not in CODECS:
+            raise ValueError(f"Unknown output compression: {self.compression!r}")
+        if self.compression == 'zstd' and zstandard is None:
+            raise ImportError("OUTPUT_COMPRESSION = 'zstd' needs the zstandard package")
+        # Shared with the forked workers: records go through the pipe and the counters let any process wait for them
+        self.queue = multiprocessing.SimpleQueue()
+        self.lock = multiprocessing.Lock()
+        self.queued = multiprocessing.RawValue('Q', 0)
+        self.written = multiprocessing.RawValue('Q', 0)
+        self.done = multiprocessing.Condition()
+        self._owner = os.getpid()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def append(self, path, record):
+        """Append ``record`` as one line to the stream at ``path`` (its plain .jsonl name)."""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        if self.queue is None:
+            self._write_direct(path, line)
+            return
+        self._put((path, line, False))
+
+    def replace(self, path, text):
+        """Replace the plain file at ``path`` with ``text`` once everything appended before has been written."""
+        if self.queue is None:
+            self._replace_file(path, text)
+            return
+        self._put((path, text, True))
+
+    def _put(self, item):
+        with self.lock:
+            self.queued.value += 1
+            self.queue.put(item)
+
+    def flush(self):
+        if self.queue is None:
+            return
+        with self.lock:
+            target = self.queued.value
+        with self.done:
+            self.done.wait_for(lambda: self.written.value >= target)
+
+    def close(self):
+        """Write everything still queued, fsync and close every stream. Only the process that started the sink closes it."""
+        if self.queue is None or os.getpid() != self._owner:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.queue = None
+        self.thread = None
+
+    def _write_direct(self, path, line):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + CODECS[self.compression], 'ab') as f:
+            f.write(compress(self.compression, line.encode('utf-8')))
+
+    def _replace_file(self, path, text):
+        # Write then rename, so a crash never leaves a half-written file
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _handle(self, file_path):
+        f = self.handles.pop(file_path, None)
+        if f is None:
+            if len(self.handles) >= self.max_open:
+                _, oldest = self.handles.popitem(last=False)
+                self._close_handle(oldest)
+            os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+            f = open(file_path, 'ab')
+        self.handles[file_path] = f
+        return f
+
+    def _close_handle(self, f):
+        if f in self.dirty:
+            f.flush()
+            os.fsync(f.fileno())
+            self.dirty.discard(f)
+        f.close()
+
+    def _run(self):
+        last_sync = time.monotonic()
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get())
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+            self._write(batch)
+            with self.done:
+                self.written.value += len(batch)
+                self.done.notify_all()
+            if not running or time.monotonic() - last_sync >= self.fsync_interval:
+                self._sync()
+                last_sync = time.monotonic()
+        for f in self.handles.values():
+            f.close()
+        self.handles.clear()
+
+    def _write(self, batch):
+        lines = defaultdict(list)
+        replaced = []
+        for path, data, replace in batch:
+            if replace:
+                replaced.append((path, data))
+            else:
+                lines[path].append(data)
+        suffix = CODECS[self.compression]
+        for path, path_lines in lines.items():
+            try:
+                f = self._handle(path + suffix)
+                f.write(compress(self.compression, ''.join(path_lines).encode('utf-8')))
+                f.flush()
+                self.dirty.add(f)
+            except Exception as e:
+                print(f"Error writing {path}: {e!r}")
+        # After the batch's records, which include everything queued before each replace
+        for path, text in replaced:
+            try:
+                self._replace_file(path, text)
+            except Exception as e:
+                print(f"Error writing {path}: {e!r}")
+
+    def _sync(self):
+        for f in self.dirty:
+            try:
+                os.fsync(f.fileno())
+            except OSError as e:
+                print(f"Error syncing {f.name}: {e!r}")
+        self.dirty.clear()
+
+
+# Shared by the inference entry points, the game modules and the artifact writer
+OUTPUTS = OutputSink()
+atexit.register(OUTPUTS.close)
@@ -0,0 +1,91 @@
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character-based estimate
+    tiktoken = None
+
+from src.config import PROMPTS_DIR, PROMPT_TOKEN_ENCODING
+
+# The only placeholders we fill in. Prompts also contain literal braces
+# ({row}, {rod_x}, JSON examples) that must be left alone.
+SLOTS = ("text_representation_path", "conversation_history_path")
+SLOT_PATTERN = re.compile(r"\{(" + "|".join(SLOTS) + r")\}")
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+class PromptTemplate:
+    """A prompt file split once into literal chunks and named slots."""
+
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        parts = SLOT_PATTERN.split(text)
+        self.literals = parts[0::2]
+        self.slots = parts[1::2]
+        self._literal_tokens = None
+
+    def require(self, *slots):
+        missing = [slot for slot in slots if slot not in self.slots]
+        if missing:
+            raise ValueError(f"Prompt {self.path} has no {', '.join('{' + slot + '}' for slot in missing)} slot")
+        return self
+
+    def render(self, **values):
+        # Slots without a value are kept as written
+        if not self.slots:
+            return self.text
+        chunks = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            chunks.append(values.get(slot, "{" + slot + "}"))
+            chunks.append(literal)
+        return "".join(chunks)
+
+    def token_count(self, **values):
+        """Tokens in the rendered prompt; literal chunks are counted once and cached."""
+        if self._literal_tokens is None:
+            self._literal_tokens = sum(count_tokens(literal) for literal in self.literals if literal)
+        return self._literal_tokens + sum(count_tokens(values.get(slot, "{" + slot + "}")) for slot in self.slots)
+
+
+class PromptRegistry:
+    """Every prompt under ``root``, read and split on first use and then shared."""
+
+    def __init__(self, root=PROMPTS_DIR):
+        self.root = root
+        self.templates = None
+
+    def load(self):
+        templates = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.txt'):
+                    path = os.path.normpath(os.path.join(dirpath, filename))
+                    with open(path, 'r', encoding='utf-8') as file:
+                        templates[path] = PromptTemplate(path, file.read().strip())
+        self.templates = templates
+        return self
+
+    def get(self, path, *slots):
+        """The template for ``path``, checked to have every slot in ``slots``."""
+        if self.templates is None:
+            self.load()
+        template = self.templates.get(os.path.normpath(path))
+        if template is None:
+            raise FileNotFoundError(f"No prompt at {path}")
+        return template.require(*slots)
+
+
+# Loaded once per process; forked workers inherit the parsed templates
+PROMPTS = PromptRegistry()
@@ -0,0 +1,399 @@
+import os
+import sys
+import csv
+import json
+import signal
+from collections import defaultdict
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from src.config import (START_LEVEL, END_LEVEL, COMPLETION_CACHE_PATH, COMPLETION_PROCESSES, COMPLETION_TIMEOUT,
+                        SOKOBAN_MAX_NODES, SOKOBAN_TIME_LIMIT, N_PUZZLE_MAX_NODES, N_PUZZLE_TIME_LIMIT, SOLVER_VERSIONS)
+from src.cache import CompletionCache
+from src.output_sink import read_records, stream_exists, stream_path
+from solver import sudoku_solver, sokoban_solver, maze_solver, hanoi_solver, n_puzzle_solver, n_queens_solver
+
+GAME_NAMES = ['maze', 'sokoban', 'n_queens', 'n_puzzle', 'hanoi', 'sudoku']
+TEXT_GAMES = ['maze', 'sokoban']   # final states are the grids in the .txt files
+METRICS = ('acc', 'eff', 'comp')
+# Output directory of each track
+TRACKS = {
+    'multi_step': 'outputs/multi_step',
+    'one_step': 'outputs/one_step',
+}
+
+DENOMINATOR = END_LEVEL - START_LEVEL + 1
+ONE_STEP_TOTAL = 50   # one-step acc/eff are out of all 50 levels
+
+EVAL_COLUMNS = [('track', 'U'), ('mode', 'U'), ('model', 'U'), ('game', 'U'),
+                ('level', 'i4'), ('step', 'i4'), ('is_valid', '?'), ('is_active', 'f8')]
+STATE_COLUMNS = [('track', 'U'), ('mode', 'U'), ('model', 'U'), ('game', 'U'),
+                 ('level', 'i4'), ('state', 'O')]
+# One score per (track, mode, model, game)
+CELL = ('track', 'mode', 'model', 'game')
+
+# Fields of a JSONL final state its completion degree depends on
+STATE_FIELDS = {
+    'sudoku': ('level', 'position'),
+    'hanoi': ('position',),
+    'n_puzzle': ('position',),
+    'n_queens': ('output', 'position'),
+}
+# Search budgets that change a solver's answer, part of the cache key
+SOLVER_SETTINGS = {
+    'sokoban': [SOKOBAN_MAX_NODES, SOKOBAN_TIME_LIMIT],
+    'n_puzzle': [N_PUZZLE_MAX_NODES, N_PUZZLE_TIME_LIMIT],
+}
+
+
+# ---------------------------- Completion degree ----------------------------
+def state_degree(game, final_state):
+    """Completion degree (0-100) of a level's final state; None (no state saved) scores 0."""
+    degree = 100
+    if final_state is None:
+        return 0
+    if game == 'sudoku':
+        degree = sudoku_solver.sudoku_solver(final_state)
+    elif game == 'hanoi':
+        step_num = hanoi_solver.hanoi_solver(final_state['position'])
+        degree -= step_num*12.5
+    elif game == 'n_puzzle':
+        step_num = n_puzzle_solver.n_puzzle_solver(final_state['position'])
+        degree -= step_num*12.5
+    elif game == 'n_queens':
+        comb_state = final_state['output'] + [final_state['position']]
+        step_num = n_queens_solver.n_queens_solver(comb_state)
+        degree -= step_num*14.3
+    elif game == 'sokoban':
+        step_num = sokoban_solver.sokoban_solver(final_state)
+        degree -= step_num*12.5
+    elif game == 'maze':
+        step_num = maze_solver.maze_solver(final_state)
+        degree -= step_num*12.5
+    return degree if degree >= 0 else 0
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+def _timed_out(signum, frame):
+    raise SolveTimeout()
+
+
+def timed_degree(task):
+    """state_degree in a pool worker, or None if it takes longer than ``timeout`` seconds."""
+    game, final_state, timeout = task
+    if timeout is None:
+        return state_degree(game, final_state)
+    signal.signal(signal.SIGALRM, _timed_out)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return state_degree(game, final_state)
+    except SolveTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def canonical_state(game, final_state):
+    """The part of a final state its degree depends on, as a string: the grid for maze/sokoban, JSON otherwise."""
+    if game in TEXT_GAMES:
+        return final_state
+    return json.dumps({field: final_state.get(field) for field in STATE_FIELDS[game]}, sort_keys=True, separators=(',', ':'))
+
+
+def completion_degrees(states, cache_path=COMPLETION_CACHE_PATH, processes=COMPLETION_PROCESSES, timeout=COMPLETION_TIMEOUT):
+    """Completion degree of every row of a states table; NaN where the solver ran out of time.
+
+    Each distinct (game, final state) is solved once, over a process pool, and kept in the
+    completion cache for later runs.
+    """
+    keys = []
+    tasks = {}
+    for game, final_state in zip(states['game'].tolist(), states['state']):
+        if final_state is None:
+            keys.append(None)
+            continue
+        key = CompletionCache.make_key(game, SOLVER_VERSIONS[game], canonical_state(game, final_state), SOLVER_SETTINGS.get(game))
+        keys.append(key)
+        tasks.setdefault(key, (game, final_state, timeout))
+    cache = CompletionCache(cache_path) if cache_path else None
+    known = cache.get_many(tasks, timeout) if cache else {}
+    pending = [key for key in tasks if key not in known]
+    if pending:
+        pool = Pool(processes=min(processes or os.cpu_count(), len(pending)))
+        try:
+            solved = pool.map(timed_degree, [tasks[key] for key in pending], chunksize=1)
+        finally:
+            # Workers leave on close(); terminate() relies on SIGTERM, which pygame's SDL handler swallows
+            pool.close()
+            pool.join()
+        known.update(zip(pending, solved))
+        if cache:
+            cache.put_many([(key, tasks[key][0], degree, timeout) for key, degree in zip(pending, solved)])
+    if cache:
+        cache.close()
+    unknown = sum(known[key] is None for key in tasks)
+    if unknown:
+        print(f"Completion degree unknown for {unknown} final states (solver took over {timeout}s); they score 0")
+    return np.array([0 if key is None else np.nan if known[key] is None else known[key] for key in keys], dtype=np.float64)
+
+
+# ---------------------------- Loading ----------------------------
+def level_number(name):
+    # level_12.jsonl, level_12.jsonl.gz, level_12.txt or the level_12 directory
+    return int(name.split('.')[0][len('level_'):])
+
+
+def by_level(names):
+    return sorted((name for name in names if name.startswith('level_')), key=level_number)
+
+
+def read_text(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def final_step(level_dir):
+    """The last step_*.txt grid a multi-step maze/sokoban level wrote, or None."""
+    steps = [name for name in os.listdir(level_dir) if name.startswith("step_") and name.endswith(".txt")]
+    if not steps:
+        return None
+    return read_text(os.path.join(level_dir, max(steps, key=lambda name: int(name[5:-4]))))
+
+
+def settings(track, base_dir):
+    """(mode, directory) of every setting in a track: <s1>_<s2> for multi-step, <s1> for one-step."""
+    for setting1 in sorted(os.listdir(base_dir)):       # ["image_text", "text_only"]
+        setting1_path = os.path.join(base_dir, setting1)
+        if not os.path.isdir(setting1_path) or setting1 == 'final':
+            continue
+        if track == 'one_step':
+            yield setting1, setting1_path
+            continue
+        for setting2 in sorted(os.listdir(setting1_path)):   # ["base", "history"]
+            setting2_path = os.path.join(setting1_path, setting2)
+            if os.path.isdir(setting2_path):
+                yield f"{setting1}_{setting2}", setting2_path
+
+
+def game_path(track, source, model_path, game):
+    """Where a model's outputs for a game live, or None if it has none."""
+    if track == 'multi_step' or (source == 'process_levels' and game in TEXT_GAMES):
+        path = os.path.join(model_path, game)
+        return path if os.path.isdir(path) else None
+    path = os.path.join(model_path, f"{game}.jsonl")
+    return path if stream_exists(path) else None
+
+
+def eval_rows(track, mode, model, game, path):
+    cell = (track, mode, model, game)
+    if track == 'one_step':
+        for record in read_records(path):
+            yield cell + (record.get('level', 0), 1, bool(record.get('is_valid', False)), float(record.get('is_active', 0)))
+        return
+    for name in by_level(os.listdir(path)):
+        level = level_number(name)
+        for i, record in enumerate(read_records(stream_path(os.path.join(path, name)))):
+            yield cell + (level, record.get('step', i + 1), bool(record.get('is_valid', False)), float(bool(record.get('is_active', False))))
+
+
+def state_rows(track, mode, model, game, path):
+    cell = (track, mode, model, game)
+    if track == 'one_step':
+        if game in TEXT_GAMES:
+            for name in by_level(os.listdir(path)):
+                yield cell + (level_number(name), read_text(os.path.join(path, name)))
+        else:
+            for record in read_records(path):
+                yield cell + (record.get('level', 0), record)
+        return
+    for name in by_level(os.listdir(path)):
+        level_path = os.path.join(path, name)
+        if game in TEXT_GAMES:
+            yield cell + (level_number(name), final_step(level_path))
+        else:
+            final_state = None
+            for final_state in read_records(stream_path(level_path)):
+                pass
+            yield cell + (level_number(name), final_state)
+
+
+def table(rows, columns):
+    """Structured array from row tuples; string columns are as wide as their longest value."""
+    fields = list(zip(*rows)) or [()] * len(columns)
+    arrays = []
+    for values, (_, dtype) in zip(fields, columns):
+        if dtype == 'O':
+            arrays.append(np.fromiter(values, dtype=object, count=len(values)))
+        else:
+            arrays.append(np.array(values, dtype=str if dtype == 'U' else dtype))
+    result = np.empty(len(rows), dtype=[(name, array.dtype) for (name, _), array in zip(columns, arrays)])
+    for (name, _), array in zip(columns, arrays):
+        result[name] = array
+    return result
+
+
+def load_results(tracks=TRACKS):
+    """Read every eval record and final state under the tracks' output directories once."""
+    evals, states = [], []
+    cells = {}
+    for track, base_dir in tracks.items():
+        if not os.path.isdir(base_dir):
+            continue
+        for mode, setting_path in settings(track, base_dir):
+            for source, rows, out in (('eval', eval_rows, evals), ('process_levels', state_rows, states)):
+                source_path = os.path.join(setting_path, source)
+                if not os.path.isdir(source_path):
+                    continue
+                models = cells[(source, track, mode)] = {}
+                for model in sorted(os.listdir(source_path)):   # ["model1", "model2"]
+                    models[model] = []
+                    for game in GAME_NAMES:
+                        path = game_path(track, source, os.path.join(source_path, model), game)
+                        if path is not None:
+                            models[model].append(game)
+                            out.extend(rows(track, mode, model, game, path))
+    return Results(table(evals, EVAL_COLUMNS), table(states, STATE_COLUMNS), cells, tracks)
+
+
+# ---------------------------- Scoring ----------------------------
+def group_ids(rows, fields):
+    """Group id of every row by the values of ``fields``, and the first row of each group."""
+    key = np.zeros(len(rows), dtype=np.int64)
+    for name in fields:
+        values, codes = np.unique(rows[name], return_inverse=True)
+        key = key * len(values) + codes.reshape(-1)
+    _, first, ids = np.unique(key, return_index=True, return_inverse=True)
+    return ids.reshape(-1), first
+
+
+def group_sums(rows, fields, weights=None):
+    """{group key: sum of ``weights`` (or row count)} over the rows grouped by ``fields``."""
+    if not len(rows):
+        return {}
+    ids, first = group_ids(rows, fields)
+    sums = np.bincount(ids, weights=weights, minlength=len(first))
+    keys = zip(*(rows[name][first].tolist() for name in fields))
+    return dict(zip(keys, sums.tolist()))
+
+
+def last_rows(rows, fields):
+    """The last row of every group of ``fields``, in table order."""
+    if not len(rows):
+        return rows
+    ids, first = group_ids(rows, fields)
+    last = np.full(len(first), -1, dtype=np.int64)
+    np.maximum.at(last, ids, np.arange(len(rows)))
+    return rows[last]
+
+
+def overall(game_scores):
+    return round(sum(0 if score == '-' else score for score in game_scores.values()) / len(game_scores), 1)
+
+
+class Results:
+    """Every eval record and final state of a set of runs as columnar tables.
+
+    evals:  one row per eval record (track, mode, model, game, level, step, is_valid, is_active)
+    states: one row per saved final state (track, mode, model, game, level, state)
+    cells:  (source, track, mode) -> {model: games with outputs}, for the '-' entries
+
+    Scores come from group-bys over the tables; the CSV files are only an export.
+    """
+
+    def __init__(self, evals, states, cells, tracks=TRACKS):
+        self.evals = evals
+        self.states = states
+        self.cells = cells
+        self.tracks = tracks
+        self._degrees = None
+
+    def degrees(self):
+        if self._degrees is None:
+            self._degrees = completion_degrees(self.states)
+        return self._degrees
+
+    def sums(self, metric):
+        """The per-cell totals a metric's score is computed from."""
+        evals = self.evals
+        if metric == 'comp':
+            # Unknown degrees (solver timed out) count as 0
+            return group_sums(self.states, CELL, np.nan_to_num(self.degrees()))
+        # Multi-step counts only the benchmark's levels, one-step every record
+        multi = evals[(evals['track'] == 'multi_step') & (evals['level'] >= START_LEVEL) & (evals['level'] <= END_LEVEL)]
+        one = evals[evals['track'] == 'one_step']
+        if metric == 'acc':
+            # A multi-step level is solved if its last step solved it
+            finals = last_rows(multi, CELL + ('level',))
+            sums = group_sums(finals, CELL, finals['is_valid'].astype(np.float64))
+            sums.update(group_sums(one, CELL, one['is_valid'].astype(np.float64)))
+            return sums
+        active = group_sums(multi, CELL, multi['is_active'])
+        moves = group_sums(multi, CELL)
+        sums = {key: (active[key], moves[key]) for key in moves}
+        sums.update(group_sums(one, CELL, one['is_active']))
+        return sums
+
+    def scores(self, metrics=METRICS):
+        """{metric: {(track, mode): {model: {game: score or '-'}}}}, rounded as in the CSV files."""
+        scores = {}
+        for metric in metrics:
+            source = 'process_levels' if metric == 'comp' else 'eval'
+            sums = self.sums(metric)
+            scores[metric] = {}
+            for (cell_source, track, mode), models in self.cells.items():
+                if cell_source != source:
+                    continue
+                setting = scores[metric][(track, mode)] = {}
+                for model, games in models.items():
+                    setting[model] = {game: score(metric, track, sums.get((track, mode, model, game)))
+                                      if game in games else '-' for game in GAME_NAMES}
+        return scores
+
+    def export(self, scores):
+        """Write every setting's scores to <track>/final/<metric>_<mode>.csv."""
+        for metric, settings in scores.items():
+            for (track, mode), models in settings.items():
+                output_dir = os.path.join(self.tracks[track], 'final')
+                os.makedirs(output_dir, exist_ok=True)
+                output_file = os.path.join(output_dir, f'{metric}_{mode}.csv')
+                with open(output_file, 'w', newline='') as csvfile:
+                    writer = csv.writer(csvfile)
+                    writer.writerow([''] + GAME_NAMES + ['overall'])
+                    for model, game_scores in models.items():
+                        writer.writerow([model] + [game_scores[game] for game in GAME_NAMES] + [overall(game_scores)])
+                print(f"Generated {output_file}")
+
+
+def score(metric, track, total):
+    """A cell's score from its totals (None if it has no records)."""
+    if metric == 'comp':
+        return round((total or 0) / DENOMINATOR, 1)
+    if track == 'one_step':
+        if metric == 'acc':
+            return round((total or 0) / ONE_STEP_TOTAL * 100, 1)
+        return round((total or 0) / ONE_STEP_TOTAL, 1)
+    if metric == 'acc':
+        return round((total or 0) / DENOMINATOR * 100, 1)
+    active, moves = total or (0, 0)
+    return round(active / moves * 100, 1) if moves > 0 else 0
+
+
+def average_scores(scores):
+    """{metric: {model: {game or 'overall': mean over the settings that have it}}}"""
+    averages = {}
+    for metric, settings in scores.items():
+        collected = defaultdict(lambda: defaultdict(list))
+        for models in settings.values():
+            for model, game_scores in models.items():
+                for game, value in list(game_scores.items()) + [('overall', overall(game_scores))]:
+                    if value != '-':
+                        collected[model][game].append(value)
+        averages[metric] = {model: {game: sum(values) / len(values) for game, values in games.items()}
+                            for model, games in sorted(collected.items())}
+    return averages
@@ -0,0 +1,250 @@
+import time
+import random
+import asyncio
+import multiprocessing
+from email.utils import parsedate_to_datetime
+
+from src.config import MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CIRCUIT_PROBE_POLL
+
+# Counters, buckets and breakers live in shared memory, so everything created in the
+# parent before the Pool forks is shared by all workers. time.monotonic() is
+# system-wide on Linux, so timestamps can be compared across processes.
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter."""
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def retry_after(error) -> float:
+    """Seconds the server asked us to wait, read from the error's response headers."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:  # HTTP-date form
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Requests-per-minute limit shared by every process forked after it is created."""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self._lock = multiprocessing.Lock()
+        self._tokens = multiprocessing.Value('d', float(burst), lock=False)
+        self._updated = multiprocessing.Value('d', time.monotonic(), lock=False)
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self._tokens.value + (now - self._updated.value) * self.rate) - 1
+            self._tokens.value = tokens
+            self._updated.value = now
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+
+class CircuitBreaker:
+    """Stop sending requests for a while after too many consecutive failures.
+
+    Once ``reset_timeout`` has passed the breaker is half-open: one request goes through as a
+    probe while the others keep waiting. The probe's success closes the breaker and its failure
+    opens it again. A probe that never reports back (e.g. its worker died) is replaced after
+    another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT, probe_poll=CIRCUIT_PROBE_POLL):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_poll = probe_poll
+        self._lock = multiprocessing.Lock()
+        self._failures = multiprocessing.Value('i', 0, lock=False)
+        self._opened_at = multiprocessing.Value('d', 0.0, lock=False)
+        self._probe_at = multiprocessing.Value('d', 0.0, lock=False)
+
+    def wait_time(self) -> float:
+        """How long to wait before asking again; 0 means go ahead (as the probe if the breaker is half-open)."""
+        with self._lock:
+            if not self._opened_at.value:
+                return 0.0
+            now = time.monotonic()
+            wait = self._opened_at.value + self.reset_timeout - now
+            if wait > 0:
+                return wait
+            if self._probe_at.value and now - self._probe_at.value < self.reset_timeout:
+                return min(self.probe_poll, self._probe_at.value + self.reset_timeout - now)
+            self._probe_at.value = now
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self._failures.value = 0
+            self._opened_at.value = 0.0
+            self._probe_at.value = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures.value += 1
+            if self._failures.value >= self.failure_threshold:
+                self._opened_at.value = time.monotonic()
+                self._probe_at.value = 0.0
+
+
+class RetryStats:
+    """Run-wide counters showing where wall-clock time goes."""
+
+    FIELDS = {
+        'requests': 'i',          # attempts sent to the API
+        'retries': 'i',           # attempts that failed or returned nothing
+        'failures': 'i',          # calls that gave up after max_retries
+        'backoff_seconds': 'd',   # time slept between retries
+        'throttled_seconds': 'd', # time waiting on the rate limiter or an open breaker
+    }
+
+    def __init__(self):
+        self._lock = multiprocessing.Lock()
+        self._values = {name: multiprocessing.Value(code, 0, lock=False) for name, code in self.FIELDS.items()}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self._values[name].value += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {name: value.value for name, value in self._values.items()}
+
+    def report(self):
+        stats = self.snapshot()
+        return (f"requests: {stats['requests']}, retries: {stats['retries']}, failures: {stats['failures']}, "
+                f"backoff: {stats['backoff_seconds']:.1f}s, throttled: {stats['throttled_seconds']:.1f}s")
+
+
+class RetryScheduler:
+    """Retry API calls with backoff, Retry-After, per-model rate limits and circuit breakers.
+
+    Call ``configure`` for each model before the Pool forks so that every worker
+    shares the same bucket and breaker.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or RetryPolicy()
+        self.stats = RetryStats()
+        self.limiters = {}
+        self.breakers = {}
+
+    def configure(self, model_name, requests_per_minute=None, burst=1):
+        if requests_per_minute:
+            self.limiters[model_name] = TokenBucket(requests_per_minute, burst)
+        self._breaker(model_name)
+
+    def _breaker(self, model_name):
+        if model_name not in self.breakers:
+            self.breakers[model_name] = CircuitBreaker()
+        return self.breakers[model_name]
+
+    def _breaker_wait(self, model_name) -> float:
+        wait = self._breaker(model_name).wait_time()
+        if wait:
+            self.stats.add('throttled_seconds', wait)
+        return wait
+
+    def _limiter_wait(self, model_name) -> float:
+        limiter = self.limiters.get(model_name)
+        wait = limiter.reserve() if limiter else 0.0
+        if wait:
+            self.stats.add('throttled_seconds', wait)
+        self.stats.add('requests')
+        return wait
+
+    def _record_failure(self, model_name):
+        self._breaker(model_name).record_failure()
+        self.stats.add('retries')
+
+    def _backoff(self, error, attempt) -> float:
+        delay = retry_after(error)
+        if delay is None:
+            delay = self.policy.backoff(attempt)
+        self.stats.add('backoff_seconds', delay)
+        return delay
+
+    def _give_up(self, model_name, error):
+        self.stats.add('failures')
+        print(f"Giving up on {model_name} after {self.policy.max_retries} retries: {error or 'empty response'}")
+        return ""
+
+    def call(self, model_name, request):
+        """Call ``request()`` until it returns a non-empty response or the retries run out."""
+        error = None
+        for attempt in range(self.policy.max_retries + 1):
+            # Held while the breaker is open or another request is probing it
+            while True:
+                wait = self._breaker_wait(model_name)
+                if not wait:
+                    break
+                time.sleep(wait)
+            wait = self._limiter_wait(model_name)
+            if wait:
+                time.sleep(wait)
+            try:
+                response, error = request(), None
+            except Exception as e:
+                response, error = None, e
+            if response:
+                self._breaker(model_name).record_success()
+                return response
+            # Every failure counts towards the breaker, the last one included
+            self._record_failure(model_name)
+            if attempt < self.policy.max_retries:
+                time.sleep(self._backoff(error, attempt))
+        return self._give_up(model_name, error)
+
+    async def acall(self, model_name, request):
+        """Async version of ``call``; ``request()`` returns an awaitable."""
+        error = None
+        for attempt in range(self.policy.max_retries + 1):
+            while True:
+                wait = self._breaker_wait(model_name)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            wait = self._limiter_wait(model_name)
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                response, error = await request(), None
+            except Exception as e:
+                response, error = None, e
+            if response:
+                self._breaker(model_name).record_success()
+                return response
+            self._record_failure(model_name)
+            if attempt < self.policy.max_retries:
+                await asyncio.sleep(self._backoff(error, attempt))
+        return self._give_up(model_name, error)
+
+
+# Shared by every APIInferencer in the process (and its forked workers)
+SCHEDULER = RetryScheduler()
@@ -1,69 +1,73 @@
-from typing import Dict, List, Tuple
+from array import array
 from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-class State:
-    def __init__(self, rods: Dict[str, List[str]], moves: List[Tuple[str, str]] = None):
-        self.rods = rods
-        self.moves = moves if moves is not None else []
-
-    def __eq__(self, other):
-        return self.rods == other.rods
-
-    def __hash__(self):
-        return hash(tuple(tuple(v) for v in self.rods.values()))
-
-def is_valid_move(from_rod: List[str], to_rod: List[str]) -> bool:
-    if not from_rod:
-        return False
-    if not to_rod or from_rod[-1] > to_rod[-1]:
-        return True
-    return False
-
-def get_neighbors(state: State) -> List[State]:
-    neighbors = []
-    for from_rod in state.rods:
-        for to_rod in state.rods:
-            if from_rod != to_rod and is_valid_move(state.rods[from_rod], state.rods[to_rod]):
-                new_rods = {k: v[:] for k, v in state.rods.items()}
-                disk = new_rods[from_rod].pop()
-                new_rods[to_rod].append(disk)
-                new_moves = state.moves + [(from_rod, to_rod)]
-                neighbors.append(State(new_rods, new_moves))
-    return neighbors
+# Rods in the benchmark's order; every disk has to end up on the last one
+RODS = 'ABCD'
 
-def is_goal_state(state: State) -> bool:
-    return all(len(rods) == 0 for rod, rods in state.rods.items() if rod != 'D') and len(state.rods['D']) == sum(len(rods) for rods in state.rods.values())
+# Disks are letters, 'a' the largest: a rod lists its disks bottom to top, so they go up in letter order.
+# A state is encoded in base len(rods), one digit per disk, the smallest disk in the lowest digit:
+# digit i holds the rod of disk i. Every such code is a legal position, since each rod's stack order
+# is fixed by the disk sizes.
 
-def solve_tower_of_hanoi(initial_state: Dict[str, List[str]]) -> Tuple[List[Tuple[str, str]], int]:
-    start_state = State(initial_state)
-    queue = deque([start_state])
-    visited = set([start_state])
-    states_explored = 0
+def neighbors(code: int, disks: int, rods: int) -> List[int]:
+    """Positions one move away from ``code``."""
+    tops = [None] * rods   # smallest disk on each rod
+    place = 1
+    places = []
+    for disk in range(disks):
+        rod = code // place % rods
+        if tops[rod] is None:
+            tops[rod] = disk
+        places.append(place)
+        place *= rods
+    result = []
+    for rod, disk in enumerate(tops):
+        if disk is None:
+            continue
+        for target in range(rods):
+            # The top disk moves onto an empty rod or one whose top disk is larger
+            if target != rod and (tops[target] is None or tops[target] > disk):
+                result.append(code + (target - rod) * places[disk])
+    return result
 
+@lru_cache(maxsize=None)
+def distance_table(disks: int, rods: int = len(RODS)) -> array:
+    """Moves from every position to the goal (all disks on the last rod), by one reverse BFS over all rods**disks positions."""
+    distances = array('H', [0xFFFF]) * (rods ** disks)
+    goal = rods ** disks - 1   # every digit is the last rod
+    distances[goal] = 0
+    queue = deque([goal])
     while queue:
-        current_state = queue.popleft()
-        states_explored += 1
-
-        if is_goal_state(current_state):
-            return current_state.moves, states_explored
-
-        for neighbor in get_neighbors(current_state):
-            if neighbor not in visited:
-                visited.add(neighbor)
+        code = queue.popleft()
+        for neighbor in neighbors(code, disks, rods):
+            if distances[neighbor] == 0xFFFF:
+                distances[neighbor] = distances[code] + 1
                 queue.append(neighbor)
+    return distances
 
-    return [], states_explored  # No solution found
+def encode(position: Dict[str, List[str]], rods: str = RODS) -> Tuple[int, int]:
+    """The code of a position and its number of disks; ValueError if a rod holds a disk on a smaller one."""
+    disk_rods = {}
+    for index, rod in enumerate(rods):
+        stack = position.get(rod, [])
+        if list(stack) != sorted(stack):
+            raise ValueError(f"Disks out of order on rod {rod}: {stack}")
+        for disk in stack:
+            disk_rods[disk] = index
+    code = 0
+    # Smallest disk (last letter) first, in the lowest digit
+    for disk in sorted(disk_rods):
+        code = code * len(rods) + disk_rods[disk]
+    return code, len(disk_rods)
 
-def hanoi_solver(initial_state: str) -> int:
-    # print(f"Solving Tower of Hanoi...")
-    solution, states_explored = solve_tower_of_hanoi(initial_state)
+def solve_tower_of_hanoi(initial_state: Dict[str, List[str]]) -> int:
+    code, disks = encode(initial_state)
+    return distance_table(disks)[code]
 
-    if solution:
-        # print(f"  Solution moves: {len(solution)}")
-        # print(f"  Solution: {solution}")
-        # print(f"  States explored: {states_explored}")
-        return len(solution)
-    else:
-        # print(f"  States explored: {states_explored}")
-        # print(f"  No solution found")
-        return 99999
\ No newline at end of file
+def hanoi_solver(initial_state: Dict[str, List[str]]) -> int:
+    try:
+        return solve_tower_of_hanoi(initial_state)
+    except ValueError:
+        return 99999
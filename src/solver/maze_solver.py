@@ -1,91 +1,90 @@
-from typing import List, Tuple
+from array import array
 from collections import deque
+from functools import lru_cache
+from typing import Tuple
 
-class State:
-    def __init__(self, position: Tuple[int, int], path: str = ""):
-        self.position = position
-        self.path = path
+# Offsets of the moves in a flat grid of the given width
+def move_offsets(width: int):
+    return ((-1, 'L'), (1, 'R'), (-width, 'U'), (width, 'D'))
 
-def parse_maze(maze_str: str) -> Tuple[List[List[str]], Tuple[int, int], Tuple[int, int]]:
-    maze = [list(row.strip()) for row in maze_str.strip().split('\n') if row.strip()]
-    if not maze:
+def parse_maze(maze_str: str) -> Tuple[str, int, int, int]:
+    """The maze as one flat string of equal-width rows, with its width and the indices of S and X (-1 if missing)."""
+    rows = [row for row in maze_str.split('\n') if row.strip()]
+    if not rows:
         raise ValueError("Empty maze")
-    
-    max_width = max(len(row) for row in maze)
-    maze = [row + [' '] * (max_width - len(row)) for row in maze]
-    
-    start = None
-    end = None
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            if cell == 'S':
-                start = (x, y)
-            elif cell == 'X':
-                end = (x, y)
-    
-    if start is None or end is None:
-        raise ValueError("Start (S) or end (X) position not found in the maze")
-    
-    return maze, start, end
+    width = max(len(row) for row in rows)
+    cells = ''.join(row.ljust(width) for row in rows)
+    return cells, width, cells.find('S'), cells.find('X')
 
-def is_valid_move(pos: Tuple[int, int], maze: List[List[str]]) -> bool:
-    x, y = pos
-    if 0 <= y < len(maze) and 0 <= x < len(maze[y]):
-        return maze[y][x] != '+'
-    return False
+def neighbors(index: int, cells: str, width: int):
+    x = index % width
+    for offset, move in move_offsets(width):
+        new_index = index + offset
+        if (offset == -1 and x == 0) or (offset == 1 and x == width - 1) or not 0 <= new_index < len(cells):
+            continue
+        if cells[new_index] != '+':
+            yield new_index, move
 
-def get_neighbors(state: State, maze: List[List[str]]) -> List[State]:
-    x, y = state.position
-    directions = [(-1, 0, 'L'), (1, 0, 'R'), (0, -1, 'U'), (0, 1, 'D')]
-    neighbors = []
-    for dx, dy, move in directions:
-        new_pos = (x + dx, y + dy)
-        if is_valid_move(new_pos, maze):
-            neighbors.append(State(new_pos, state.path + move))
-    return neighbors
+@lru_cache(maxsize=256)
+def distance_field(layout: str, width: int) -> array:
+    """Moves from every cell to the exit X (-1 where it is unreachable), by one reverse BFS.
+
+    ``layout`` is the maze without S, which every state of a level shares, so the
+    field is computed once per level.
+    """
+    distances = array('i', [-1]) * len(layout)
+    end = layout.find('X')
+    if end < 0:
+        return distances
+    distances[end] = 0
+    queue = deque([end])
+    while queue:
+        index = queue.popleft()
+        for new_index, _ in neighbors(index, layout, width):
+            if distances[new_index] < 0:
+                distances[new_index] = distances[index] + 1
+                queue.append(new_index)
+    return distances
 
 def solve_maze(maze_str: str) -> Tuple[str, int]:
-    try:
-        maze, start, end = parse_maze(maze_str)
-    except ValueError as e:
-        print(f"Error parsing maze: {e}")
-        return "", 0
-    
-    if start == end:
+    """A shortest path from S to X and the number of states explored; ("", 0) if S is missing or already at X."""
+    cells, width, start, end = parse_maze(maze_str)
+    if start < 0 or end < 0 or start == end:
         return "", 0
-    
-    initial_state = State(start)
-    queue = deque([initial_state])
-    visited = set([start])
+
+    parents = array('i', [-1]) * len(cells)
+    moves = bytearray(len(cells))
+    parents[start] = start
+    queue = deque([start])
     states_explored = 0
 
     while queue:
-        current_state = queue.popleft()
+        index = queue.popleft()
         states_explored += 1
 
-        if current_state.position == end:
-            return current_state.path, states_explored
+        if index == end:
+            path = []
+            while index != start:
+                path.append(chr(moves[index]))
+                index = parents[index]
+            return ''.join(reversed(path)), states_explored
 
-        for neighbor in get_neighbors(current_state, maze):
-            if neighbor.position not in visited:
-                visited.add(neighbor.position)
-                queue.append(neighbor)
+        for new_index, move in neighbors(index, cells, width):
+            if parents[new_index] < 0:
+                parents[new_index] = index
+                moves[new_index] = ord(move)
+                queue.append(new_index)
 
     return "", states_explored  # No solution found
 
 def maze_solver(maze: str) -> int:
-    # print(f"Solving maze...")
-    solution, states_explored = solve_maze(maze)
-
-    if solution == "" and states_explored == 0:
-        # print("  S is already at X or maze is invalid")
+    """Moves left from the maze state to the exit: 0 once S has reached X, 99999 if X can't be reached."""
+    try:
+        cells, width, start, end = parse_maze(maze)
+    except ValueError:
+        return 0
+    if start < 0 or end < 0:
+        # S disappears when it steps onto X
         return 0
-    elif solution:
-        # print(f"  Solution moves: {len(solution)}")
-        # print(f"  Solution: {solution}")
-        # print(f"  States explored: {states_explored}")
-        return len(solution)
-    else:
-        # print(f"  States explored: {states_explored}")
-        # print(f"  No solution found")
-        return 99999
\ No newline at end of file
+    distance = distance_field(cells.replace('S', ' '), width)[start]
+    return distance if distance >= 0 else 99999
@@ -1,93 +1,267 @@
-from typing import List, Tuple
-import heapq
-
-class State:
-    def __init__(self, board: List[List[int]], g: int, parent=None, move: str = ""):
-        self.board = board
-        self.g = g  # Cost to reach this state
-        self.h = self.calculate_heuristic()  # Heuristic cost to goal
-        self.f = self.g + self.h  # Total estimated cost
-        self.parent = parent
-        self.move = move
-
-    def __lt__(self, other):
-        return self.f < other.f
-
-    def __eq__(self, other):
-        return self.board == other.board
-
-    def __hash__(self):
-        return hash(tuple(map(tuple, self.board)))
-
-    def calculate_heuristic(self) -> int:
-        goal = [[1,2,3,4], [5,6,7,8], [9,10,11,12], [13,14,15,0]]
-        distance = 0
-        for i in range(4):
-            for j in range(4):
-                if self.board[i][j] != 0:
-                    x, y = divmod(self.board[i][j] - 1, 4)
-                    distance += abs(x - i) + abs(y - j)
-        return distance
-
-def get_blank_position(board: List[List[int]]) -> Tuple[int, int]:
-    for i in range(4):
-        for j in range(4):
-            if board[i][j] == 0:
-                return i, j
-
-def get_neighbors(state: State) -> List[State]:
-    neighbors = []
-    i, j = get_blank_position(state.board)
-    directions = [(-1, 0, "D"), (1, 0, "U"), (0, -1, "R"), (0, 1, "L")]
-
-    for di, dj, move in directions:
-        ni, nj = i + di, j + dj
-        if 0 <= ni < 4 and 0 <= nj < 4:
-            new_board = [row[:] for row in state.board]
-            new_board[i][j], new_board[ni][nj] = new_board[ni][nj], new_board[i][j]
-            neighbors.append(State(new_board, state.g + 1, state, move))
-
-    return neighbors
-
-def is_goal_state(state: State) -> bool:
-    return state.board == [[1,2,3,4], [5,6,7,8], [9,10,11,12], [13,14,15,0]]
-
-def solve_n_puzzle(initial_board: List[List[int]]) -> Tuple[List[str], int]:
-    initial_state = State(initial_board, 0)
-    heap = [initial_state]
-    visited = set()
-    states_explored = 0
-
-    while heap:
-        current_state = heapq.heappop(heap)
-        states_explored += 1
-
-        if is_goal_state(current_state):
-            moves = []
-            while current_state.parent:
-                moves.append(current_state.move)
-                current_state = current_state.parent
-            return moves[::-1], states_explored
-
-        visited.add(hash(current_state))
-
-        for neighbor in get_neighbors(current_state):
-            if hash(neighbor) not in visited:
-                heapq.heappush(heap, neighbor)
-
-    return [], states_explored  # No solution found
-
-def n_puzzle_solver(initial_state: str) -> int:
-    # print(f"Solving N-Puzzle...")
-    # print(initial_state)
-    solution, states_explored = solve_n_puzzle(initial_state)
-
-    if solution:
-        # print(f"  Solution moves: {len(solution)}")
-        # print(f"  Solution: {solution}")
-        # print(f"  States explored: {states_explored}")
-        return len(solution)
-    else:
-        # print(f"  States explored: {states_explored}")
-        # print(f"  No solution found")
-        return 99999
\ No newline at end of file
+import os
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.config import N_PUZZLE_MAX_NODES, N_PUZZLE_TIME_LIMIT, N_PUZZLE_PDB_DIR
+
+# Boards are packed into one int, four bits per cell in row-major order (cell i at bits 4i..4i+3),
+# which holds every board up to 4x4. The goal is 1, 2, ..., n*n - 1 with the blank (0) last.
+MAX_CELLS = 16
+
+# Additive pattern databases for the 4x4 board; each counts only the moves of its own tiles
+PDB_PATTERNS = ((1, 5, 6, 9, 10), (2, 3, 4, 7, 8), (11, 12, 13, 14, 15))
+
+
+def pack(board: List[List[int]]) -> int:
+    packed = 0
+    for i, tile in enumerate(tile for row in board for tile in row):
+        packed |= tile << (4 * i)
+    return packed
+
+
+def tile_at(packed: int, cell: int) -> int:
+    return (packed >> (4 * cell)) & 15
+
+
+@lru_cache(maxsize=None)
+def neighbor_cells(n: int) -> tuple:
+    """For each cell, the cells next to it, as (cell, along a row) pairs."""
+    table = []
+    for cell in range(n * n):
+        row, col = divmod(cell, n)
+        table.append(tuple((r * n + c, r == row) for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1))
+                           if 0 <= r < n and 0 <= c < n))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def line_conflicts(goals: tuple) -> int:
+    """Tiles to take out of a line so the rest are in goal order (len - LIS), for tiles whose goal is in that line."""
+    longest = [1] * len(goals)
+    for i in range(len(goals)):
+        for j in range(i):
+            if goals[j] < goals[i]:
+                longest[i] = max(longest[i], longest[j] + 1)
+    return len(goals) - max(longest, default=0)
+
+
+class Heuristic:
+    """Manhattan distance plus linear conflicts, with the pattern databases on 4x4 boards when built."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.pdbs = load_pattern_databases() if n == 4 else None
+
+    def manhattan(self, tile: int, cell: int) -> int:
+        goal = tile - 1
+        return abs(goal // self.n - cell // self.n) + abs(goal % self.n - cell % self.n)
+
+    def row_conflicts(self, packed: int, row: int) -> int:
+        n = self.n
+        tiles = (tile_at(packed, row * n + col) for col in range(n))
+        return line_conflicts(tuple((t - 1) % n for t in tiles if t and (t - 1) // n == row))
+
+    def column_conflicts(self, packed: int, col: int) -> int:
+        n = self.n
+        tiles = (tile_at(packed, row * n + col) for row in range(n))
+        return line_conflicts(tuple((t - 1) // n for t in tiles if t and (t - 1) % n == col))
+
+    def conflicts(self, packed: int) -> int:
+        return sum(self.row_conflicts(packed, i) + self.column_conflicts(packed, i) for i in range(self.n))
+
+    def pattern_indices(self, packed: int) -> List[int]:
+        cells = {tile_at(packed, cell): cell for cell in range(MAX_CELLS)}
+        return [sum(cells[tile] << (4 * k) for k, tile in enumerate(pattern)) for pattern in PDB_PATTERNS]
+
+
+def solvable(packed: int, n: int) -> bool:
+    """Whether the goal is reachable: the permutation parity must match the blank's distance from its goal cell."""
+    cells = [tile_at(packed, cell) for cell in range(n * n)]
+    target = [(tile - 1) % (n * n) for tile in cells]   # goal cell of each tile, the blank's is the last
+    seen = [False] * len(cells)
+    transpositions = 0
+    for start in range(len(cells)):
+        length = 0
+        cell = start
+        while not seen[cell]:
+            seen[cell] = True
+            cell = target[cell]
+            length += 1
+        transpositions += max(length - 1, 0)
+    blank = cells.index(0)
+    blank_distance = (n - 1 - blank // n) + (n - 1 - blank % n)
+    return transpositions % 2 == blank_distance % 2
+
+
+def solve_n_puzzle(initial_board: List[List[int]], max_nodes: int = N_PUZZLE_MAX_NODES,
+                   time_limit: float = N_PUZZLE_TIME_LIMIT) -> Tuple[Optional[int], int, bool]:
+    """IDA* from the board to the goal.
+
+    Returns (moves, states explored, exact). Past the node or time budget, moves is the
+    last completed threshold, a proven lower bound. None if the board can't be solved.
+    """
+    n = len(initial_board)
+    if n * n > MAX_CELLS or sorted(tile for row in initial_board for tile in row) != list(range(n * n)):
+        return None, 0, True
+    packed = pack(initial_board)
+    if not solvable(packed, n):
+        return None, 0, True
+
+    heuristic = Heuristic(n)
+    neighbors = neighbor_cells(n)
+    pdbs = heuristic.pdbs
+    blank = next(cell for cell in range(n * n) if tile_at(packed, cell) == 0)
+    manhattan = sum(heuristic.manhattan(tile_at(packed, cell), cell) for cell in range(n * n) if tile_at(packed, cell))
+    conflicts = heuristic.conflicts(packed)
+    indices = heuristic.pattern_indices(packed) if pdbs else None
+    pattern_of = {tile: k for k, pattern in enumerate(PDB_PATTERNS) for tile in pattern}
+    deadline = time.monotonic() + time_limit
+    explored = 0
+
+    def estimate(manhattan, conflicts):
+        h = manhattan + 2 * conflicts
+        if pdbs:
+            h = max(h, sum(pdb[index] for pdb, index in zip(pdbs, indices)))
+        return h
+
+    class Budget(Exception):
+        pass
+
+    # Depth-first search below the threshold; returns the moves to the goal or the smallest f past it
+    def search(packed, blank, previous, g, threshold, manhattan, conflicts):
+        nonlocal explored
+        f = g + estimate(manhattan, conflicts)
+        if f > threshold:
+            return None, f
+        if manhattan == 0:
+            return g, f
+        explored += 1
+        if explored > max_nodes or (explored & 1023 == 0 and time.monotonic() > deadline):
+            raise Budget
+        smallest = float('inf')
+        for cell, along_row in neighbors[blank]:
+            if cell == previous:
+                continue
+            tile = tile_at(packed, cell)
+            moved = packed - (tile << (4 * cell)) + (tile << (4 * blank))
+            new_manhattan = manhattan - heuristic.manhattan(tile, cell) + heuristic.manhattan(tile, blank)
+            # Moving along a row changes the tile's column, so only those two columns' conflicts change
+            if along_row:
+                lines = (heuristic.column_conflicts, cell % n, blank % n)
+            else:
+                lines = (heuristic.row_conflicts, cell // n, blank // n)
+            count, old_line, new_line = lines
+            new_conflicts = (conflicts - count(packed, old_line) - count(packed, new_line)
+                             + count(moved, old_line) + count(moved, new_line))
+            if pdbs and tile in pattern_of:
+                k = pattern_of[tile]
+                shift = 4 * PDB_PATTERNS[k].index(tile)
+                indices[k] += (blank - cell) << shift
+            result, bound = search(moved, cell, blank, g + 1, threshold, new_manhattan, new_conflicts)
+            if pdbs and tile in pattern_of:
+                indices[k] -= (blank - cell) << shift
+            if result is not None:
+                return result, bound
+            smallest = min(smallest, bound)
+        return None, smallest
+
+    threshold = estimate(manhattan, conflicts)
+    while True:
+        try:
+            result, bound = search(packed, blank, -1, 0, threshold, manhattan, conflicts)
+        except Budget:
+            return threshold, explored, False
+        if result is not None:
+            return result, explored, True
+        threshold = bound
+
+
+def n_puzzle_solver(initial_state: List[List[int]]) -> int:
+    # Past the search budget the lower bound stands in; the score is 0 from 8 moves on anyway
+    moves, states_explored, exact = solve_n_puzzle(initial_state)
+    if moves is None:
+        return 99999
+    return moves
+
+
+# ---------------------------- Pattern databases ----------------------------
+def pdb_path(pattern) -> str:
+    return os.path.join(N_PUZZLE_PDB_DIR, f"pdb_{'_'.join(map(str, pattern))}.npy")
+
+
+@lru_cache(maxsize=None)
+def load_pattern_databases():
+    """The 4x4 pattern databases as memoryviews over memory-mapped arrays, or None if they aren't built."""
+    if not N_PUZZLE_PDB_DIR or not all(os.path.exists(pdb_path(pattern)) for pattern in PDB_PATTERNS):
+        return None
+    return tuple(memoryview(np.load(pdb_path(pattern), mmap_mode='r')) for pattern in PDB_PATTERNS)
+
+
+def build_pattern_database(pattern) -> np.ndarray:
+    """Moves of the pattern's tiles needed to bring them home, for every placement of them.
+
+    A placement is indexed by its cells packed four bits per tile, like the boards. The
+    search runs level by level over (placement, blank cell): the blank moves freely
+    through the other cells and each swap with a pattern tile costs one move.
+    """
+    size = len(pattern)
+    shifts = 4 * np.arange(1, size + 1, dtype=np.int64)
+    # State: blank cell in the low four bits, the pattern tiles' cells above it
+    distances = np.full(MAX_CELLS ** (size + 1), 255, dtype=np.uint8)
+    start = MAX_CELLS - 1 + sum((tile - 1) << (4 * (k + 1)) for k, tile in enumerate(pattern))
+    distances[start] = 0
+    steps = np.full((MAX_CELLS, 4), -1, dtype=np.int64)
+    for cell, cells in enumerate(neighbor_cells(4)):
+        steps[cell, :len(cells)] = [to for to, _ in cells]
+
+    frontier = np.array([start], dtype=np.int64)
+    depth = 0
+    while frontier.size:
+        # Free blank moves keep the cost
+        level = [frontier]
+        while frontier.size:
+            blank = frontier & 15
+            tiles = (frontier[:, None] >> shifts) & 15
+            reached = []
+            for direction in range(4):
+                to = steps[blank, direction]
+                free = (to >= 0) & ~(tiles == to[:, None]).any(axis=1)
+                states = (frontier[free] & ~15) | to[free]
+                states = np.unique(states[distances[states] == 255])
+                distances[states] = depth
+                reached.append(states)
+            frontier = np.concatenate(reached)
+            level.append(frontier)
+        states = np.concatenate(level)
+
+        # Swapping the blank with a pattern tile costs one move
+        blank = states & 15
+        tiles = (states[:, None] >> shifts) & 15
+        reached = []
+        for direction in range(4):
+            to = steps[blank, direction]
+            hit = (tiles == to[:, None]) & (to >= 0)[:, None]
+            rows, k = np.nonzero(hit)
+            moved = states[rows]
+            moved = moved - (to[rows] << shifts[k]) + (blank[rows] << shifts[k])
+            moved = (moved & ~15) | to[rows]
+            reached.append(moved[distances[moved] == 255])
+        frontier = np.unique(np.concatenate(reached))
+        depth += 1
+        distances[frontier] = depth
+    return distances.reshape(-1, MAX_CELLS).min(axis=1)
+
+
+def build_pattern_databases():
+    os.makedirs(N_PUZZLE_PDB_DIR, exist_ok=True)
+    for pattern in PDB_PATTERNS:
+        np.save(pdb_path(pattern), build_pattern_database(pattern))
+        print(f"Pattern database written to {pdb_path(pattern)}")
+    load_pattern_databases.cache_clear()
+
+
+if __name__ == "__main__":
+    build_pattern_databases()
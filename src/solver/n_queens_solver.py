@@ -1,73 +1,76 @@
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
 
-def is_safe(board: List[List[int]], row: int, col: int) -> bool:
-    # Check the column
-    for i in range(8):
-        if board[i][col] == 1:
-            return False
+import numpy as np
 
-    # Check this row on left side
-    for i in range(col):
-        if board[row][i] == 1:
-            return False
+# Boards up to this size keep every solution in a table; larger ones are searched per placement
+TABLE_MAX_SIZE = 10
 
-    # Check upper diagonal on left side
-    for i, j in zip(range(row, -1, -1), range(col, -1, -1)):
-        if board[i][j] == 1:
-            return False
+def solutions(n: int, fixed: Optional[Dict[int, int]] = None) -> Iterator[tuple]:
+    """Every solution of the n-queens problem as the column of the queen in each row, by bitmask backtracking.
 
-    # Check lower diagonal on left side
-    for i, j in zip(range(row, 8, 1), range(col, -1, -1)):
-        if board[i][j] == 1:
-            return False
+    ``fixed`` maps rows to the column their queen must take.
+    """
+    fixed = fixed or {}
+    full = (1 << n) - 1
+    columns = [0] * n
 
-    return True
+    def place(row, cols, left, right):
+        if row == n:
+            yield tuple(columns)
+            return
+        free = full & ~(cols | left | right)
+        if row in fixed:
+            free &= 1 << fixed[row]
+        while free:
+            bit = free & -free
+            free ^= bit
+            columns[row] = bit.bit_length() - 1
+            yield from place(row + 1, cols | bit, ((left | bit) << 1) & full, (right | bit) >> 1)
 
-def solve_n_queens_util(board: List[List[int]], col: int) -> bool:
-    if col >= 8:
-        return True
+    yield from place(0, 0, 0, 0)
 
-    for i in range(8):
-        if is_safe(board, i, col):
-            board[i][col] = 1
-            if solve_n_queens_util(board, col + 1):
-                return True
-            board[i][col] = 0
+@lru_cache(maxsize=None)
+def solution_table(n: int) -> np.ndarray:
+    """All solutions for an n x n board, one row per solution (92 for n = 8)."""
+    return np.array(list(solutions(n)), dtype=np.uint8).reshape(-1, n)
 
-    return False
+def placement(queens: List[List[int]], n: int) -> Optional[Dict[int, int]]:
+    """The queens as row -> column, or None if one is off the board or two attack each other."""
+    rows = {}
+    cols = left = right = 0
+    for queen in queens:
+        try:
+            row, col = (int(x) for x in queen)
+        except (TypeError, ValueError):
+            return None
+        if not (0 <= row < n and 0 <= col < n) or row in rows:
+            return None
+        if cols >> col & 1 or left >> (row + col) & 1 or right >> (row - col + n) & 1:
+            return None
+        rows[row] = col
+        cols |= 1 << col
+        left |= 1 << (row + col)
+        right |= 1 << (row - col + n)
+    return rows
 
-def solve_n_queens(initial_queens: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
-    board = [[0 for _ in range(8)] for _ in range(8)]
+def extendable(fixed: Dict[int, int], n: int) -> bool:
+    """Whether the placement is part of some solution."""
+    if n <= TABLE_MAX_SIZE:
+        table = solution_table(n)
+        if not fixed:
+            return len(table) > 0
+        rows = list(fixed)
+        return bool(np.all(table[:, rows] == [fixed[row] for row in rows], axis=1).any())
+    return next(solutions(n, fixed), None) is not None
 
-    # Place initial queens
-    for row, col in initial_queens:
-        if not is_safe(board, row, col):
-            return []  # Invalid initial configuration
-        board[row][col] = 1
+def queens_to_add(queens: List[List[int]], n: int = 8) -> Optional[int]:
+    """Queens still missing from a full solution, or None if the placed queens can't be completed."""
+    fixed = placement(queens, n)
+    if fixed is None or not extendable(fixed, n):
+        return None
+    return n - len(fixed)
 
-    # Start solving from the next column
-    start_col = len(initial_queens)
-    if solve_n_queens_util(board, start_col):
-        solution = initial_queens[:]
-        for col in range(start_col, 8):
-            for row in range(8):
-                if board[row][col] == 1:
-                    solution.append((row, col))
-                    break
-        return solution
-    else:
-        return []  # No solution found
-
-def n_queens_solver(initial_state: str) -> int:
-    # print(f"Solving N-Queens...")
-    # print(initial_state)
-    solution = solve_n_queens(initial_state)
-
-    if solution:
-        # print(f"  Solution: {solution}")
-        moves = len(solution) - len(initial_state)
-        # print(f"  Queens added: {moves}")
-        return moves
-    else:
-        # print(f"  No solution found")
-        return 99999
\ No newline at end of file
+def n_queens_solver(initial_state: List[List[int]], n: int = 8) -> int:
+    moves = queens_to_add(initial_state, n)
+    return 99999 if moves is None else moves
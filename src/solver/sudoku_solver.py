@@ -1,19 +1,211 @@
-import json
-from config import GAMES
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from src.level_store import level_store
+
+# Boards are 81-character strings read row by row, '0' for an empty cell
+ALL = 0x3FE   # candidate bits 1..9
+ROWS = [[r * 9 + c for c in range(9)] for r in range(9)]
+COLUMNS = [[r * 9 + c for r in range(9)] for c in range(9)]
+BOXES = [[(br + r) * 9 + bc + c for r in range(3) for c in range(3)] for br in (0, 3, 6) for bc in (0, 3, 6)]
+UNITS = ROWS + COLUMNS + BOXES
+PEERS = [sorted({p for unit in UNITS if i in unit for p in unit} - {i}) for i in range(81)]
+# Cells of every unit, as a (27, 9) index array for the vectorized checks
+UNIT_INDEX = np.array(UNITS)
+
+
+def candidate_masks(cells: List[int]) -> Optional[List[int]]:
+    """The digits each empty cell can still take, as bit masks (0 for filled cells); None if two givens clash."""
+    masks = [0] * 81
+    for i, digit in enumerate(cells):
+        if digit:
+            if any(cells[p] == digit for p in PEERS[i]):
+                return None
+        else:
+            masks[i] = ALL
+            for p in PEERS[i]:
+                masks[i] &= ~(1 << cells[p])
+    return masks
+
+
+def assign(cells: List[int], masks: List[int], i: int, digit: int) -> bool:
+    cells[i] = digit
+    masks[i] = 0
+    bit = 1 << digit
+    for p in PEERS[i]:
+        if masks[p] & bit:
+            masks[p] &= ~bit
+            if not masks[p]:
+                return False
+    return True
+
+
+def propagate(cells: List[int], masks: List[int]) -> int:
+    """Fill naked singles (one candidate left) and hidden singles (one place left in a unit) until none remain.
+
+    Returns the number of cells filled, or -1 if the board turns out to have no solution.
+    """
+    filled = 0
+    progress = True
+    while progress:
+        progress = False
+        for i in range(81):
+            mask = masks[i]
+            if not cells[i] and not mask:
+                return -1
+            if mask and not mask & (mask - 1):
+                if not assign(cells, masks, i, mask.bit_length() - 1):
+                    return -1
+                filled += 1
+                progress = True
+        for unit in UNITS:
+            for digit in range(1, 10):
+                bit = 1 << digit
+                places = [i for i in unit if masks[i] & bit]
+                if len(places) == 1:
+                    if not assign(cells, masks, places[0], digit):
+                        return -1
+                    filled += 1
+                    progress = True
+                elif not places and all(cells[i] != digit for i in unit):
+                    return -1
+    return filled
+
+
+# ---------------------------- Exact cover (Algorithm X) ----------------------------
+def exact_cover(cells: List[int], masks: List[int]) -> Optional[List[int]]:
+    """Fill the rest of the board by Algorithm X over the cell/row/column/box constraints."""
+    constraints = {}
+    choices = {}
+    for i in range(81):
+        for digit in ([cells[i]] if cells[i] else [d for d in range(1, 10) if masks[i] >> d & 1]):
+            r, c = divmod(i, 9)
+            choices[(i, digit)] = [('cell', i), ('row', r, digit), ('column', c, digit), ('box', r // 3 * 3 + c // 3, digit)]
+    for choice, covered in choices.items():
+        for constraint in covered:
+            constraints.setdefault(constraint, set()).add(choice)
+    if len(constraints) != 4 * 81:
+        return None   # some constraint can't be met by any choice
+
+    def select(choice):
+        removed = []
+        for constraint in choices[choice]:
+            for other in constraints[constraint]:
+                for other_constraint in choices[other]:
+                    if other_constraint != constraint:
+                        constraints[other_constraint].remove(other)
+            removed.append(constraints.pop(constraint))
+        return removed
+
+    def deselect(choice, removed):
+        for constraint in reversed(choices[choice]):
+            constraints[constraint] = removed.pop()
+            for other in constraints[constraint]:
+                for other_constraint in choices[other]:
+                    if other_constraint != constraint:
+                        constraints[other_constraint].add(other)
+
+    def search(partial):
+        if not constraints:
+            return partial
+        constraint = min(constraints, key=lambda key: len(constraints[key]))
+        for choice in list(constraints[constraint]):
+            removed = select(choice)
+            found = search(partial + [choice])
+            if found is not None:
+                return found
+            deselect(choice, removed)
+        return None
+
+    for i in range(81):
+        if cells[i]:
+            select((i, cells[i]))
+    found = search([])
+    if found is None:
+        return None
+    solved = cells[:]
+    for i, digit in found:
+        solved[i] = digit
+    return solved
+
+
+# ---------------------------- Boards ----------------------------
+def parse(board: str) -> List[int]:
+    if len(board) != 81 or not board.isdigit():
+        raise ValueError(f"Not a sudoku board: {board!r}")
+    return [int(ch) for ch in board]
+
+
+@lru_cache(maxsize=1024)
+def solve(board: str) -> Optional[str]:
+    """The solution of a (partially filled) board, or None if it has none."""
+    cells = parse(board)
+    masks = candidate_masks(cells)
+    if masks is None or propagate(cells, masks) < 0:
+        return None
+    if all(cells):
+        return ''.join(map(str, cells))
+    solved = exact_cover(cells, masks)
+    return ''.join(map(str, solved)) if solved else None
+
+
+def is_solvable(board: str) -> bool:
+    return solve(board) is not None
+
+
+def forced_moves(board: str) -> Optional[int]:
+    """Empty cells that singles alone fill, or None if the board has no solution."""
+    cells = parse(board)
+    masks = candidate_masks(cells)
+    if masks is None:
+        return None
+    filled = propagate(cells, masks)
+    return None if filled < 0 or not is_solvable(board) else filled
+
+
+def consistent(boards: np.ndarray) -> np.ndarray:
+    """For an (n, 81) array of boards, whether no digit repeats within a row, column or box."""
+    units = boards[:, UNIT_INDEX]                                   # (n, 27, 9)
+    counts = (units[..., None] == np.arange(1, 10)).sum(axis=2)     # (n, 27, 9 digits)
+    return (counts <= 1).all(axis=(1, 2))
+
+
+class SudokuTable:
+    """Every sudoku level's position and solution as (levels, 81) digit arrays, checked together once.
+
+    Stored solutions that are incomplete, inconsistent or that contradict the givens, and
+    levels without one, are solved by the engine.
+    """
+
+    def __init__(self, store):
+        records = sorted(store, key=lambda record: record.level)
+        self.rows = {record.level: row for row, record in enumerate(records)}
+        self.positions = np.array([parse(record.position) for record in records], dtype=np.uint8).reshape(-1, 81)
+        stored = [record.solutions or '0' * 81 for record in records]
+        self.solutions = np.array([parse(solution) for solution in stored], dtype=np.uint8).reshape(-1, 81)
+        valid = ((self.solutions > 0).all(axis=1) & consistent(self.solutions)
+                 & ((self.positions == 0) | (self.positions == self.solutions)).all(axis=1))
+        for row in np.flatnonzero(~valid):
+            solved = solve(records[row].position)
+            if solved is not None:
+                self.solutions[row] = parse(solved)
+
+    def solution(self, level: int) -> str:
+        return ''.join(map(str, self.solutions[self.rows[level]]))
+
+    def mismatches(self, level: int, board: str) -> int:
+        """Cells of ``board`` that differ from the level's solution."""
+        cells = np.frombuffer(board.encode('ascii'), dtype=np.uint8) - ord('0')
+        return int(np.count_nonzero(cells != self.solutions[self.rows[level]][:len(cells)]))
+
+
+@lru_cache(maxsize=None)
+def sudoku_table() -> SudokuTable:
+    return SudokuTable(level_store('sudoku'))
+
 
 def sudoku_solver(final_state):
-    degree = 100
-    # finish state
-    init_level_path = next((game['levels_path'] for game in GAMES if game['name'] == 'sudoku'), None)
-    with open(init_level_path, 'r') as f:
-        for line in f:
-            obj = json.loads(line)
-            if obj["level"] == final_state["level"]:
-                init_state = obj
-
-    # comparison
-    for i in range(len(final_state['position'])):
-        if final_state['position'][i] != init_state['solutions'][i]:
-                degree -= 10
-
-    return degree
\ No newline at end of file
+    # 10 points off for every cell that differs from the solution
+    return 100 - 10 * sudoku_table().mismatches(final_state["level"], final_state['position'])
@@ -1,51 +1,10 @@
 import os
 import csv
 import sys
-from collections import defaultdict
 sys.dont_write_bytecode = True
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.one_step import score as one_score
-from src.one_step import completion as one_completion
-from src.multi_step import score as multi_score
-from src.multi_step import completion as multi_completion
-
-def process_csv_files(directories):
-    metrics = ['acc', 'eff', 'comp']
-    all_scores = {metric: defaultdict(lambda: defaultdict(list)) for metric in metrics}
-    tasks = ["maze", "sokoban", "n_queens", "n_puzzle", "hanoi", "sudoku", "overall"]
-
-    for directory in directories:
-        for filename in os.listdir(directory):
-            if filename.endswith('.csv'):
-                metric = next((m for m in metrics if filename.startswith(f"{m}_")), None)
-                if metric is None:
-                    continue  # Skip files that don't match our metric prefixes
-
-                file_path = os.path.join(directory, filename)
-                with open(file_path, 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        model = row['']  # Assuming the model name is in the first unnamed column
-                        for task in tasks:
-                            if row[task] != '-':
-                                try:
-                                    score = float(row[task])
-                                    all_scores[metric][model][task].append(score)
-                                except ValueError:
-                                    pass  # Ignore non-numeric values
-
-    # Compute averages
-    averages = {metric: defaultdict(dict) for metric in metrics}
-    for metric in metrics:
-        for model, task_scores in all_scores[metric].items():
-            for task, scores in task_scores.items():
-                if scores:
-                    averages[metric][model][task] = sum(scores) / len(scores)
-                else:
-                    averages[metric][model][task] = '-'
-
-    return averages
+from src.results import load_results, average_scores
 
 def write_results(averages, output_directory):
     tasks = ["maze", "sokoban", "n_queens", "n_puzzle", "hanoi", "sudoku", "overall"]
@@ -70,14 +29,12 @@ def write_results(averages, output_directory):
 
 
 def summarize():
-    one_score.generate_score()
-    one_completion.completion_degree()
-    multi_score.generate_score()
-    multi_completion.completion_degree()
-    directories = ["outputs/multi_step/final", "outputs/one_step/final"]
+    # Every track's records are read once; the per-setting CSVs and the summary come from the same scores
+    results = load_results()
+    scores = results.scores()
+    results.export(scores)
     output_directory = "outputs/summary"
-    averages = process_csv_files(directories)
-    write_results(averages, output_directory)
+    write_results(average_scores(scores), output_directory)
 
 if __name__ == "__main__":
     summarize()
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import src.level_store
+
+# Tests read the bundled levels but don't leave snapshots under outputs/
+src.level_store.LEVEL_SNAPSHOT_DIR = None
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # Paths in src/config.py (data/, outputs/) are relative to the repository root
+    monkeypatch.chdir(ROOT)
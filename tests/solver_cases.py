@@ -0,0 +1,30 @@
+import os
+import json
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Cases in tests/data/<game>_solver_cases.json are states from the bundled levels: each starting
+# state plus a few seeded variations (moved players, random moves, extra queens, edited boards).
+# "baseline" is the answer of the solver before the rewrite and "expected" the answer now. They
+# only differ where the old solver was wrong; "fixed" then names the bug and "expected" comes from
+# a brute-force search over the state space instead.
+FIXES = {
+    'rows-stripped': "maze rows starting with spaces were stripped, shifting them left",
+    'backward-search-pushes': "the bidirectional sokoban search missed or miscounted solutions",
+    'solved-state': "a state that is already solved scored 99999 instead of 0",
+    'leftmost-columns': "n_queens assumed the queens filled the leftmost columns",
+}
+
+
+def load_cases(game_name):
+    with open(os.path.join(DATA_DIR, f"{game_name}_solver_cases.json")) as f:
+        return json.load(f)
+
+
+def case_id(case):
+    return f"level{case['level']}"
+
+
+def undocumented_differences(cases):
+    return [case for case in cases
+            if case['baseline'] != case['expected'] and case.get('fixed') not in FIXES]
@@ -0,0 +1,110 @@
+import os
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+
+import pytest
+
+# The inference entry points import every model backend (torch, transformers, openai, google-generativeai)
+multi_infer = pytest.importorskip('src.multi_step.infer')
+
+from src.artifacts import ARTIFACTS
+from src.config import GAMES
+from src.images import EncodedImage
+from src.multi_step.checkpoint import checkpoint_path, load_checkpoint
+from src.output_sink import read_records
+
+STEPS = 4
+HANOI = next(game for game in GAMES if game['name'] == 'hanoi')
+
+
+class FakeInferencer:
+    """Never solves the level; fails like the API would if it was sent a missing image file."""
+
+    def infer(self, system_prompt, prompt, image_path, temperature):
+        # Frames handed over in memory are EncodedImages; anything else is read from its file
+        if not isinstance(image_path, EncodedImage):
+            assert os.path.exists(image_path), f"{image_path} was never written"
+        return '{"output": "XY"}'
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_infer, 'OUTPUT_IMAGE_BASE_DIR', str(tmp_path))
+    monkeypatch.setattr(multi_infer, 'START_LEVEL', 1)
+    monkeypatch.setattr(multi_infer, 'END_LEVEL', 1)
+    monkeypatch.setattr(multi_infer, 'MAX_STEPS', STEPS)
+    monkeypatch.setattr(ARTIFACTS, 'enabled', True)
+    monkeypatch.setattr(ARTIFACTS, 'keep_images', True)
+    monkeypatch.setattr(ARTIFACTS, 'write_images', True)
+    return str(tmp_path)
+
+
+def level_args(resume):
+    args = argparse.Namespace(model_name='fake', temperature=0, use_system_prompt=False, resume=resume)
+    levels = multi_infer.load_levels(HANOI)
+    [level_arg] = multi_infer.inference(args, HANOI, FakeInferencer(), levels, use_history=False, use_text=False)
+    return level_arg
+
+
+def crash_after_checkpoint(write_images, stall_image):
+    """Run the level and die as soon as step 2's checkpoint is handed over, while step 2's image may still be drawing."""
+    ARTIFACTS.write_images = write_images
+    store_image = ARTIFACTS._store_image
+    stalling = threading.Event()
+
+    def stalled(path, canvas):
+        if stall_image and path.endswith('step_2.png'):
+            stalling.set()
+            time.sleep(60)
+        store_image(path, canvas)
+
+    save_checkpoint = multi_infer.save_checkpoint
+
+    def save_then_die(path, step, *args):
+        save_checkpoint(path, step, *args)
+        if step == 2:
+            # Everything handed over before step 2's image (step 1's checkpoint included) is on disk
+            if stall_image:
+                stalling.wait(10)
+            os.kill(os.getpid(), signal.SIGKILL)
+
+    ARTIFACTS._store_image = stalled
+    multi_infer.save_checkpoint = save_then_die
+    multi_infer.process_level(*level_args(resume=False))
+
+
+def crash(write_images, stall_image):
+    run = multiprocessing.get_context('fork').Process(target=crash_after_checkpoint, args=(write_images, stall_image))
+    run.start()
+    run.join()
+    assert run.exitcode == -signal.SIGKILL
+
+
+def resume_and_check(output_dir):
+    multi_infer.process_level(*level_args(resume=True))
+    ARTIFACTS.flush()
+    models_path = os.path.join(output_dir, 'models', 'fake', 'hanoi', 'level_1.jsonl')
+    eval_path = os.path.join(output_dir, 'eval', 'fake', 'hanoi', 'level_1.jsonl')
+    assert [record['step'] for record in read_records(models_path)] == list(range(1, STEPS + 1))
+    assert [record['step'] for record in read_records(eval_path)] == list(range(1, STEPS + 1))
+    assert load_checkpoint(checkpoint_path(output_dir, 'fake', 'hanoi', 1))['step'] == STEPS
+
+
+def test_checkpoint_waits_for_the_step_image(output_dir):
+    crash(write_images=True, stall_image=True)
+    # Step 2's image never reached the disk, so neither did its checkpoint
+    checkpoint = load_checkpoint(checkpoint_path(output_dir, 'fake', 'hanoi', 1))
+    assert checkpoint['step'] == 1
+    assert os.path.exists(multi_infer.step_image_path(output_dir, 'fake', 'hanoi', 1, 1))
+    assert not os.path.exists(multi_infer.step_image_path(output_dir, 'fake', 'hanoi', 1, 2))
+    resume_and_check(output_dir)
+
+
+def test_level_restarts_without_its_step_image(output_dir):
+    # Frames only kept in memory (no artifacts, model doesn't read files) die with the run
+    crash(write_images=False, stall_image=False)
+    assert not os.path.exists(multi_infer.step_image_path(output_dir, 'fake', 'hanoi', 1, 1))
+    resume_and_check(output_dir)
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+import src.results as results
+from src.cache import CompletionCache
+
+# One move from the goal: 87.5
+STATE = {'game': 'hanoi', 'level': 1, 'position': {'A': [], 'B': [], 'C': ['e'], 'D': ['a', 'b', 'c', 'd']}}
+
+
+def states_table():
+    return results.table([('multi_step', 'text_only_base', 'model', 'hanoi', 1, STATE)], results.STATE_COLUMNS)
+
+
+def cache_key():
+    return CompletionCache.make_key('hanoi', results.SOLVER_VERSIONS['hanoi'], results.canonical_state('hanoi', STATE))
+
+
+def degree(cache_path, timeout):
+    return results.completion_degrees(states_table(), cache_path=cache_path, processes=1, timeout=timeout)[0]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'completion.sqlite')
+
+
+def test_unknown_degree_is_kept_for_the_same_timeout(cache_path):
+    cache = CompletionCache(cache_path)
+    cache.put_many([(cache_key(), 'hanoi', None, 1.0)])
+    cache.close()
+    assert math.isnan(degree(cache_path, 1.0))
+
+
+@pytest.mark.parametrize('timeout', [2.0, None])
+def test_unknown_degree_is_solved_again_with_more_time(cache_path, timeout):
+    cache = CompletionCache(cache_path)
+    cache.put_many([(cache_key(), 'hanoi', None, 1.0)])
+    cache.close()
+    assert degree(cache_path, timeout) == 87.5
+    # The new answer replaces the unknown one
+    cache = CompletionCache(cache_path)
+    assert cache.get_many([cache_key()], 1.0) == {cache_key(): 87.5}
+    cache.close()
+
+
+def test_new_solver_version_is_solved_again(cache_path, monkeypatch):
+    cache = CompletionCache(cache_path)
+    cache.put_many([(cache_key(), 'hanoi', 50.0, 60.0)])
+    cache.close()
+    assert degree(cache_path, 60.0) == 50.0
+    monkeypatch.setitem(results.SOLVER_VERSIONS, 'hanoi', results.SOLVER_VERSIONS['hanoi'] + 1)
+    assert degree(cache_path, 60.0) == 87.5
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+from PIL import Image
+
+# The model module imports every backend (torch, transformers, openai, google-generativeai)
+model = pytest.importorskip('src.model')
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    uploads = []
+
+    def upload_file(path):
+        with Image.open(path) as img:
+            uploads.append((path, img.size))
+        return path
+
+    monkeypatch.setattr(model.genai, 'upload_file', upload_file)
+    return uploads
+
+
+def image_file(tmp_path, size):
+    path = str(tmp_path / f'{size[0]}x{size[1]}.png')
+    Image.new('RGB', size, 'white').save(path)
+    return path
+
+
+def test_small_image_is_uploaded_from_its_file(tmp_path, uploads):
+    path = image_file(tmp_path, (800, 600))
+    model.GeminiInferencer().upload_image(path)
+    assert uploads == [(path, (800, 600))]
+
+
+def test_large_image_is_shrunk_before_upload(tmp_path, uploads):
+    path = image_file(tmp_path, (2048, 1024))
+    model.GeminiInferencer().upload_image(path)
+    [(uploaded, size)] = uploads
+    assert uploaded != path and size == (1024, 512)
+    assert not os.path.exists(uploaded)
@@ -0,0 +1,22 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.solver.hanoi_solver import hanoi_solver
+
+CASES = load_cases('hanoi')
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert hanoi_solver(case['state']) == case['expected']
+
+
+def test_differences_from_baseline_are_fixes():
+    assert not undocumented_differences(CASES)
+
+
+@pytest.mark.parametrize('disks, moves', [(3, 5), (5, 13)])
+def test_tower_on_first_rod(disks, moves):
+    # Frame-Stewart numbers for four rods
+    position = {'A': list('abcde'[:disks]), 'B': [], 'C': [], 'D': []}
+    assert hanoi_solver(position) == moves
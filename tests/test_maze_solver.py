@@ -0,0 +1,26 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.solver.maze_solver import maze_solver
+
+CASES = load_cases('maze')
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert maze_solver(case['state']) == case['expected']
+
+
+def test_differences_from_baseline_are_fixes():
+    assert not undocumented_differences(CASES)
+    assert {case['fixed'] for case in CASES if 'fixed' in case} == {'rows-stripped'}
+
+
+def test_leading_spaces_keep_their_column():
+    # The exit is straight below the start; stripping the second row would move it
+    text = "+++++\n+S  +\n X  +\n+++++\n"
+    assert maze_solver(text) == 1
+
+
+def test_walled_in_start():
+    assert maze_solver("+++++\n+S+X+\n+++++\n") == 99999
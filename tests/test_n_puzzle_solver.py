@@ -0,0 +1,27 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.solver.n_puzzle_solver import n_puzzle_solver
+
+CASES = load_cases('n_puzzle')
+GOAL = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 0]]
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert n_puzzle_solver(case['state']) == case['expected']
+
+
+def test_differences_from_baseline_are_fixes():
+    assert not undocumented_differences(CASES)
+
+
+def test_solved_board():
+    assert n_puzzle_solver(GOAL) == 0
+
+
+def test_unsolvable_board():
+    # Swapping two tiles flips the permutation parity; the old search never returned
+    board = [row[:] for row in GOAL]
+    board[0][0], board[0][1] = board[0][1], board[0][0]
+    assert n_puzzle_solver(board) == 99999
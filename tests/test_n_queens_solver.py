@@ -0,0 +1,29 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.solver.n_queens_solver import n_queens_solver
+
+CASES = load_cases('n_queens')
+SOLUTION = [[0, 0], [1, 4], [2, 7], [3, 5], [4, 2], [5, 6], [6, 1], [7, 3]]
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert n_queens_solver(case['state']) == case['expected']
+
+
+def test_differences_from_baseline_are_fixes():
+    assert not undocumented_differences(CASES)
+
+
+def test_full_solution():
+    assert n_queens_solver([q[:] for q in SOLUTION]) == 0
+
+
+def test_queens_outside_leftmost_columns():
+    # Rows 1 and 2 of a solution leave columns 0..3 empty, which the old solver gave up on
+    assert n_queens_solver([[1, 4], [2, 7]]) == 6
+
+
+def test_attacking_queens():
+    assert n_queens_solver([[0, 0], [1, 1]]) == 99999
@@ -0,0 +1,76 @@
+import os
+import argparse
+
+import pytest
+
+# The inference entry points import every model backend (torch, transformers, openai, google-generativeai)
+orchestrator = pytest.importorskip('src.orchestrator')
+
+from src.artifacts import ARTIFACTS
+from src.config import GAMES
+from src.engine import AsyncEngine
+from src.one_step import infer as one_infer
+from src.output_sink import read_records
+
+LEVELS = 3
+
+
+class FakeInferencer:
+    async def ainfer(self, system_prompt, prompt, image_path, temperature):
+        return '{"output": "L"}'
+
+
+@pytest.fixture
+def output_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(one_infer, 'OUTPUT_OS_DIR', str(tmp_path / 'image_text'))
+    monkeypatch.setattr(one_infer, 'OUTPUT_TEXT_OS_DIR', str(tmp_path / 'text_only'))
+    monkeypatch.setattr(one_infer, 'END_LEVEL', LEVELS)
+    return [str(tmp_path / 'image_text'), str(tmp_path / 'text_only')]
+
+
+def run(resume):
+    args = argparse.Namespace(modes=list(orchestrator.ONE_STEP_MODES), model_name='fake', resume=resume)
+    items = orchestrator.build_work_items(args, FakeInferencer())
+    engine = AsyncEngine(concurrency=8)
+    outcomes = engine.starmap(orchestrator.run_work_item, items)
+    engine.close()
+    ARTIFACTS.flush()
+    return outcomes
+
+
+def streams(output_dirs):
+    """Levels recorded in every models/, eval/ and process_levels/ stream, in file order."""
+    levels = {}
+    for output_dir in output_dirs:
+        for kind in ('models', 'eval', 'process_levels'):
+            for game in GAMES:
+                path = os.path.join(output_dir, kind, 'fake', f"{game['name']}.jsonl")
+                if os.path.exists(path):
+                    levels[path] = [record['level'] for record in read_records(path)]
+    return levels
+
+
+def test_resume_does_not_repeat_finished_levels(output_dirs):
+    first = run(resume=False)
+    finished = streams(output_dirs)
+    assert all(sorted(levels) == list(range(1, LEVELS + 1)) for levels in finished.values())
+
+    for _ in range(2):
+        # Finished levels are skipped but still return their eval record for the live scores
+        assert run(resume=True) == first
+        assert streams(output_dirs) == finished
+
+
+def test_resume_reruns_levels_cut_off_before_their_evaluation(output_dirs):
+    run(resume=False)
+    finished = streams(output_dirs)
+    # A crash after the model output of level 2 was saved but before it was evaluated
+    for output_dir in output_dirs:
+        for game in GAMES:
+            eval_path = os.path.join(output_dir, 'eval', 'fake', f"{game['name']}.jsonl")
+            records = [record for record in read_records(eval_path) if record['level'] != 2]
+            one_infer.rewrite_records(eval_path, records)
+
+    run(resume=True)
+    assert {path: sorted(levels) for path, levels in streams(output_dirs).items()} == \
+           {path: sorted(levels) for path, levels in finished.items()}
@@ -0,0 +1,102 @@
+import os
+import json
+import multiprocessing
+
+import pytest
+
+from src.output_sink import OutputSink, read_records, stream_exists, stream_path
+
+WORKERS = 4
+RECORDS = 300
+
+
+def write_records(sink, shared_path, own_path, worker):
+    for i in range(RECORDS):
+        sink.append(shared_path, {'worker': worker, 'i': i})
+        sink.append(own_path, {'i': i, 'text': 'é' * (i % 7)})
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_forked_writers_keep_per_stream_order(tmp_path, compression):
+    sink = OutputSink(compression=compression, batch_size=16)
+    sink.start()
+    shared_path = str(tmp_path / 'eval' / 'shared.jsonl')
+    own_paths = [str(tmp_path / 'models' / f'worker_{w}.jsonl') for w in range(WORKERS)]
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=write_records, args=(sink, shared_path, own_paths[w], w))
+               for w in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    sink.close()
+
+    shared = list(read_records(shared_path))
+    assert len(shared) == WORKERS * RECORDS
+    for w in range(WORKERS):
+        assert [record['i'] for record in shared if record['worker'] == w] == list(range(RECORDS))
+        assert list(read_records(own_paths[w])) == [{'i': i, 'text': 'é' * (i % 7)} for i in range(RECORDS)]
+    suffix = '.gz' if compression else ''
+    assert os.path.exists(shared_path + suffix)
+    assert stream_path(shared_path + suffix) == shared_path
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_direct_writes_before_start_round_trip(tmp_path, compression):
+    sink = OutputSink(compression=compression)
+    path = str(tmp_path / 'one.jsonl')
+    records = [{'level': level, 'output': 'ü\n'} for level in range(5)]
+    for record in records:
+        sink.append(path, record)
+    assert stream_exists(path)
+    assert list(read_records(path)) == records
+
+
+def test_missing_stream_reads_empty(tmp_path):
+    path = str(tmp_path / 'missing.jsonl')
+    assert not stream_exists(path)
+    assert list(read_records(path)) == []
+
+
+def test_replace_waits_for_earlier_records(tmp_path):
+    sink = OutputSink(batch_size=8)
+    path = str(tmp_path / 'steps.jsonl')
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    seen = []
+    replace_file = sink._replace_file
+
+    def record_then_replace(file_path, text):
+        # Records written when the checkpoint lands, which must cover everything it counts
+        seen.append((json.loads(text)['steps'], len(list(read_records(path)))))
+        replace_file(file_path, text)
+
+    sink._replace_file = record_then_replace
+    sink.start()
+    for step in range(1, 101):
+        sink.append(path, {'step': step})
+        if step % 10 == 0:
+            sink.replace(checkpoint, json.dumps({'steps': step}))
+    sink.close()
+
+    assert [steps for steps, _ in seen] == list(range(10, 101, 10))
+    assert all(written >= steps for steps, written in seen)
+    with open(checkpoint) as f:
+        assert json.load(f) == {'steps': 100}
+    assert not os.path.exists(checkpoint + '.tmp')
+
+
+def test_flush_waits_for_queued_records(tmp_path):
+    sink = OutputSink()
+    sink.start()
+    path = str(tmp_path / 'flushed.jsonl')
+    for i in range(50):
+        sink.append(path, {'i': i})
+    sink.flush()
+    assert [record['i'] for record in read_records(path)] == list(range(50))
+    sink.close()
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        OutputSink(compression='lz4').start()
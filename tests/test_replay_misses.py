@@ -0,0 +1,73 @@
+import os
+import shutil
+import argparse
+
+import pytest
+
+# The inference entry points import every model backend (torch, transformers, openai, google-generativeai)
+multi_infer = pytest.importorskip('src.multi_step.infer')
+
+from src.cache import ResponseCache
+from src.config import GAMES
+from src.model import CachedInferencer
+from src.one_step import infer as one_infer
+from src.output_sink import read_records
+
+LEVELS = 3
+HANOI = next(game for game in GAMES if game['name'] == 'hanoi')
+
+
+class FakeInferencer:
+    model_id = 'fake'
+
+    def infer(self, system_prompt, prompt, image_path, temperature):
+        return '{"output": "XY"}'
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'responses.sqlite')
+
+
+def with_inferencer(args_list, index, inferencer):
+    return [args[:index] + (inferencer,) + args[index + 1:] for args in args_list]
+
+
+def replay(args_list, index, level_index, run_levels, process_level, cache_path, output_dir):
+    """Answer every level but the second from the cache, then replay all of them over a pool."""
+    cache = ResponseCache(cache_path)
+    for args in with_inferencer(args_list, index, CachedInferencer(FakeInferencer(), cache)):
+        if args[level_index] != 2:
+            process_level(*args)
+    cache.close()
+    shutil.rmtree(output_dir)
+    run_levels(with_inferencer(args_list, index, CachedInferencer(FakeInferencer(), ResponseCache(cache_path, mode='replay'))), 2)
+
+
+def test_multi_step_replay_skips_uncached_levels(tmp_path, cache_path, monkeypatch):
+    output_dir = str(tmp_path / 'multi_step')
+    monkeypatch.setattr(multi_infer, 'OUTPUT_TEXT_BASE_DIR', output_dir)
+    monkeypatch.setattr(multi_infer, 'START_LEVEL', 1)
+    monkeypatch.setattr(multi_infer, 'END_LEVEL', LEVELS)
+    monkeypatch.setattr(multi_infer, 'MAX_STEPS', 2)
+    args = argparse.Namespace(model_name='fake', temperature=0, use_system_prompt=False, resume=False)
+    args_list = multi_infer.inference(args, HANOI, None, multi_infer.load_levels(HANOI), use_history=False, use_text=True)
+
+    replay(args_list, 6, 2, multi_infer.run_levels, multi_infer.process_level, cache_path, output_dir)
+
+    eval_dir = os.path.join(output_dir, 'eval', 'fake', 'hanoi')
+    assert sorted(os.listdir(eval_dir)) == ['level_1.jsonl', 'level_3.jsonl']
+    for name in os.listdir(eval_dir):
+        assert [record['step'] for record in read_records(os.path.join(eval_dir, name))] == [1, 2]
+
+
+def test_one_step_replay_skips_uncached_levels(tmp_path, cache_path, monkeypatch):
+    output_dir = str(tmp_path / 'one_step')
+    monkeypatch.setattr(one_infer, 'OUTPUT_TEXT_OS_DIR', output_dir)
+    monkeypatch.setattr(one_infer, 'END_LEVEL', LEVELS)
+    args_list = one_infer.inference(HANOI, 'fake', None, one_infer.load_levels(HANOI), use_text=True)
+
+    replay(args_list, 5, 6, one_infer.run_levels, one_infer.process_level, cache_path, output_dir)
+
+    eval_path = os.path.join(output_dir, 'eval', 'fake', 'hanoi.jsonl')
+    assert sorted(record['level'] for record in read_records(eval_path)) == [1, 3]
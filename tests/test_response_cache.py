@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+import src.cache
+from src.cache import ResponseCache, CacheMiss
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(src.cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'responses.sqlite')
+
+
+def access_times(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT key, last_access FROM responses"))
+    finally:
+        conn.close()
+
+
+def test_hits_write_access_times_in_batches(cache_path, clock):
+    cache = ResponseCache(cache_path, touch_batch=3)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    stored = access_times(cache_path)
+
+    assert [cache.get(key) for key in 'ab'] == ['A', 'B']
+    assert access_times(cache_path) == stored
+    assert cache.get('c') == 'C'
+    touched = access_times(cache_path)
+    assert all(touched[key] > stored[key] for key in 'abc')
+
+    # A miss isn't a hit; the pending hit is written on close
+    assert cache.get('d') is None
+    assert cache.get('a') == 'A'
+    assert access_times(cache_path) == touched
+    cache.close()
+    assert access_times(cache_path)['a'] > touched['a']
+
+
+def test_eviction_sees_pending_hits(cache_path, clock):
+    cache = ResponseCache(cache_path, max_bytes=25, touch_batch=100)
+    cache.put('a', 'A' * 10)
+    cache.put('b', 'B' * 10)
+    assert cache.get('a') == 'A' * 10
+    # Past max_bytes: the least recently used entry goes, which is b since a was just read
+    cache.put('c', 'C' * 10)
+    assert set(access_times(cache_path)) == {'a', 'c'}
+    cache.close()
+
+
+def test_replay_miss_raises(cache_path, clock):
+    cache = ResponseCache(cache_path)
+    cache.put('a', 'A')
+    cache.close()
+    replay = ResponseCache(cache_path, mode='replay')
+    assert replay.get('a') == 'A'
+    with pytest.raises(CacheMiss):
+        replay.get('b')
+    replay.close()
+    assert set(access_times(cache_path)) == {'a'}
@@ -0,0 +1,216 @@
+import asyncio
+import multiprocessing
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+import src.retry as retry
+from src.retry import CircuitBreaker, RetryPolicy, RetryScheduler, TokenBucket, retry_after
+
+
+class FakeClock:
+    """Stands in for the time module in src.retry; sleeping just moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000.0 + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+
+    async def sleep(seconds):
+        clock.sleep(seconds)
+        await asyncio.sleep(0)  # still lets other coroutines run
+
+    monkeypatch.setattr(retry, 'time', clock)
+    monkeypatch.setattr(retry, 'asyncio', SimpleNamespace(sleep=sleep))
+    return clock
+
+
+class APIError(Exception):
+    def __init__(self, headers=None):
+        super().__init__('rate limited')
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def failing(responses):
+    """A request that raises each APIError in ``responses`` (or returns each other value) in turn."""
+    responses = iter(responses)
+
+    def request():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return request
+
+
+def test_retry_after_headers(clock):
+    assert retry_after(APIError({'retry-after': '7'})) == 7.0
+    assert retry_after(APIError({'retry-after-ms': '1500', 'retry-after': '7'})) == 1.5
+    assert retry_after(APIError({'retry-after': formatdate(clock.time() + 20, usegmt=True)})) == pytest.approx(20, abs=1)
+    assert retry_after(APIError({'retry-after': 'soon'})) is None
+    assert retry_after(APIError()) is None
+    assert retry_after(ValueError()) is None
+
+
+def test_call_honours_retry_after(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=3))
+    request = failing([APIError({'retry-after': '3'}), APIError({'retry-after-ms': '250'}), 'ok'])
+    assert scheduler.call('model', request) == 'ok'
+    assert clock.sleeps == [3.0, 0.25]
+    stats = scheduler.stats.snapshot()
+    assert (stats['requests'], stats['retries'], stats['failures']) == (3, 2, 0)
+    assert stats['backoff_seconds'] == pytest.approx(3.25)
+
+
+def test_acall_honours_retry_after(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=3))
+    responses = failing([APIError({'retry-after': '2'}), '', 'ok'])
+
+    async def request():
+        return responses()
+
+    assert asyncio.run(scheduler.acall('model', request)) == 'ok'
+    # The empty response has no Retry-After and falls back to the capped backoff
+    assert clock.sleeps[0] == 2.0
+    assert 0 <= clock.sleeps[1] <= 2.0
+
+
+def test_backoff_without_retry_after(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=4, base_delay=1.0, max_delay=5.0))
+    assert scheduler.call('model', failing([APIError()] * 5)) == ""
+    assert len(clock.sleeps) == 4
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(5.0, 2 ** attempt)
+    assert scheduler.stats.snapshot()['failures'] == 1
+
+
+def test_last_failure_counts(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=2))
+    breaker = scheduler.breakers['model'] = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    assert scheduler.call('model', failing([APIError({'retry-after': '1'})] * 3)) == ""
+    # No sleep after the last attempt, but its failure still opens the breaker
+    assert clock.sleeps == [1.0, 1.0]
+    assert breaker.wait_time() == 30.0
+    stats = scheduler.stats.snapshot()
+    assert (stats['requests'], stats['retries'], stats['failures']) == (3, 3, 1)
+
+
+def test_breaker_opens_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.wait_time() == 0.0
+    breaker.record_failure()
+    assert breaker.wait_time() == 30.0
+    clock.now += 10
+    assert breaker.wait_time() == 20.0
+    # Half-open after the timeout: a probe goes through, and failing it opens the breaker again
+    clock.now += 20
+    assert breaker.wait_time() == 0.0
+    breaker.record_failure()
+    assert breaker.wait_time() == 30.0
+    clock.now += 30
+    breaker.record_success()
+    assert breaker.wait_time() == 0.0
+    # A success resets the count, so it takes the full threshold to open again
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.wait_time() == 0.0
+
+
+def test_half_open_breaker_holds_others_until_the_probe_reports(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, probe_poll=1.0)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.wait_time() == 0.0   # the probe
+    assert breaker.wait_time() == 1.0   # everyone else checks again later
+    clock.now += 5
+    assert breaker.wait_time() == 1.0
+    breaker.record_success()
+    assert breaker.wait_time() == 0.0
+    assert breaker.wait_time() == 0.0
+
+
+def test_lost_probe_is_replaced(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, probe_poll=1.0)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.wait_time() == 0.0
+    clock.now += 29.5
+    assert breaker.wait_time() == 0.5
+    clock.now += 0.5
+    assert breaker.wait_time() == 0.0   # a new probe
+    assert breaker.wait_time() == 1.0
+
+
+def test_concurrent_calls_send_one_probe(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=0))
+    breaker = scheduler.breakers['model'] = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30
+    events = []
+
+    async def request():
+        events.append('sent')
+        await asyncio.sleep(0)
+        events.append('answered')
+        return 'ok'
+
+    async def calls():
+        return await asyncio.gather(*(scheduler.acall('model', request) for _ in range(5)))
+
+    assert asyncio.run(calls()) == ['ok'] * 5
+    # Nothing else went out until the probe came back and closed the breaker
+    assert events[:2] == ['sent', 'answered']
+    assert events.count('sent') == 5
+
+
+def test_scheduler_waits_for_open_breaker(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_retries=10))
+    scheduler.configure('model')
+    breaker = scheduler.breakers['model']
+    threshold = breaker.failure_threshold
+    request = failing([APIError({'retry-after': '1'})] * threshold + ['ok'])
+    assert scheduler.call('model', request) == 'ok'
+    # The breaker opened with the last failure, before its one-second Retry-After sleep
+    assert clock.sleeps == [1.0] * threshold + [breaker.reset_timeout - 1.0]
+    assert scheduler.stats.snapshot()['throttled_seconds'] == breaker.reset_timeout - 1.0
+    assert breaker.wait_time() == 0.0
+
+
+def record_failures(breaker, count):
+    for _ in range(count):
+        breaker.record_failure()
+
+
+def test_breaker_is_shared_with_forked_workers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    worker = multiprocessing.get_context('fork').Process(target=record_failures, args=(breaker, 2))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert breaker.wait_time() > 0
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(requests_per_minute=60, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.now += 3
+    assert bucket.reserve() == 0.0
@@ -0,0 +1,27 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.solver.sokoban_solver import sokoban_solver
+
+CASES = load_cases('sokoban')
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert sokoban_solver(case['state']) == case['expected']
+
+
+def test_differences_from_baseline_are_fixes():
+    assert not undocumented_differences(CASES)
+
+
+def test_solved_board():
+    assert sokoban_solver("#####\n#@ *#\n#####\n") == 0
+
+
+def test_box_in_corner():
+    assert sokoban_solver("#####\n#$ .#\n# @ #\n#####\n") == 99999
+
+
+def test_single_push():
+    assert sokoban_solver("######\n#@$ .#\n######\n") == 2
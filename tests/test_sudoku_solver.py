@@ -0,0 +1,26 @@
+import pytest
+
+from solver_cases import load_cases, case_id, undocumented_differences
+from src.level_store import level_store
+from src.solver.sudoku_solver import sudoku_solver
+
+CASES = load_cases('sudoku')
+
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_matches_baseline(case):
+    assert sudoku_solver(case['state']) == case['expected']
+
+
+def test_no_differences_from_baseline():
+    assert not undocumented_differences(CASES)
+    assert all(case['baseline'] == case['expected'] for case in CASES)
+
+
+def test_ten_points_per_wrong_cell():
+    level = level_store('sudoku').get(1)
+    cells = list(level.solutions)
+    cells[0] = '1' if cells[0] != '1' else '2'
+    cells[80] = '0'
+    assert sudoku_solver({'level': 1, 'position': level.solutions}) == 100
+    assert sudoku_solver({'level': 1, 'position': ''.join(cells)}) == 80